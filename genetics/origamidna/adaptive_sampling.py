@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Adaptive sequential sampling with confidence-interval stopping.
+
+Beginner picture:
+Instead of spending a fixed number of Monte Carlo samples on every candidate,
+draw a small batch, look at how wide the 95% confidence interval around the
+mean still is, and stop once it is narrow enough. When several candidates
+compete, one whose best plausible value (upper CI bound) is below the k-th
+best candidate's worst plausible value (lower CI bound) can no longer make
+the top k, so it is dropped early. This is "racing".
+
+Samples must be independent replicates of the quantity being estimated, for
+example one capture score per receptor realization or one 0/1 capture outcome
+per trajectory. Intervals use the normal approximation, except for 0/1
+samples, which use the Wilson score interval. A run of all-zero or all-one
+outcomes has zero sample variance, but its Wilson interval still has width,
+so it cannot look converged after a single batch.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+Z_95 = 1.959963984540054
+
+BatchSampler = Callable[[int], np.ndarray]
+
+
+@dataclass(frozen=True)
+class StoppingRule:
+    """When to stop drawing: a target CI half-width and a batch budget."""
+
+    half_width: float
+    batch_size: int
+    min_batches: int = 2
+    max_batches: int = 16
+    z: float = Z_95
+
+    def __post_init__(self) -> None:
+        if self.half_width <= 0:
+            raise ValueError(f"Target half-width must be positive, got {self.half_width}")
+        if self.batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1, got {self.batch_size}")
+        if not 1 <= self.min_batches <= self.max_batches:
+            raise ValueError(
+                f"Need 1 <= min_batches <= max_batches, got {self.min_batches} and {self.max_batches}"
+            )
+
+
+@dataclass(frozen=True)
+class AdaptiveEstimate:
+    """Mean and CI half-width of one candidate, plus why sampling stopped.
+
+    ``status`` is ``"converged"`` (half-width reached the target),
+    ``"eliminated"`` (raced out of the top k) or ``"budget"`` (hit
+    ``max_batches`` first).
+    """
+
+    mean: float
+    half_width: float
+    evaluations: int
+    status: str
+
+
+def ci_bounds(samples: np.ndarray, z: float = Z_95) -> tuple[float, float]:
+    """CI around the sample mean: Wilson score for 0/1 samples, normal approximation otherwise.
+
+    Unbounded below two samples.
+    """
+    samples = np.asarray(samples, dtype=float)
+    n = len(samples)
+    if n < 2:
+        return -math.inf, math.inf
+    mean = float(np.mean(samples))
+    if np.all((samples == 0.0) | (samples == 1.0)):
+        scale = 1.0 + z * z / n
+        center = (mean + z * z / (2 * n)) / scale
+        spread = z * math.sqrt(mean * (1.0 - mean) / n + z * z / (4 * n * n)) / scale
+        return center - spread, center + spread
+    spread = float(z * np.std(samples, ddof=1) / math.sqrt(n))
+    return mean - spread, mean + spread
+
+
+def ci_half_width(samples: np.ndarray, z: float = Z_95) -> float:
+    """Half the width of ``ci_bounds``; infinite below two samples."""
+    low, high = ci_bounds(samples, z)
+    return (high - low) / 2.0
+
+
+def race(samplers: dict[str, BatchSampler], rule: StoppingRule, top_k: int) -> dict[str, AdaptiveEstimate]:
+    """Sample every candidate in rounds until each one converges, is raced out, or runs out of budget.
+
+    ``samplers[name](batch_index)`` must return ``rule.batch_size`` fresh
+    samples. Candidates are only eliminated once ``min_batches`` rounds are in,
+    and never while there are no more than ``top_k`` of them.
+    """
+    if top_k < 1:
+        raise ValueError(f"top_k must be at least 1, got {top_k}")
+    samples: dict[str, list[float]] = {name: [] for name in samplers}
+    status = {name: "sampling" for name in samplers}
+    for batch_index in range(rule.max_batches):
+        active = [name for name in samplers if status[name] == "sampling"]
+        if not active:
+            break
+        for name in active:
+            samples[name].extend(np.asarray(samplers[name](batch_index), dtype=float).tolist())
+        if batch_index + 1 < rule.min_batches:
+            continue
+
+        bounds = {name: ci_bounds(values, rule.z) for name, values in samples.items()}
+        if len(samplers) > top_k:
+            lower_bounds = sorted((bounds[name][0] for name in samplers), reverse=True)
+            kth_lower = lower_bounds[top_k - 1]
+            for name in active:
+                if bounds[name][1] < kth_lower:
+                    status[name] = "eliminated"
+        for name in active:
+            low, high = bounds[name]
+            if status[name] == "sampling" and (high - low) / 2.0 <= rule.half_width:
+                status[name] = "converged"
+
+    return {
+        name: AdaptiveEstimate(
+            mean=float(np.mean(values)),
+            half_width=ci_half_width(values, rule.z),
+            evaluations=len(values),
+            status="budget" if status[name] == "sampling" else status[name],
+        )
+        for name, values in samples.items()
+    }
+
+
+def sample_until(sampler: BatchSampler, rule: StoppingRule) -> AdaptiveEstimate:
+    """Draw batches of one quantity until its CI half-width reaches the target."""
+    return race({"estimate": sampler}, rule, top_k=1)["estimate"]
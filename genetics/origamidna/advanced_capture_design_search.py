@@ -27,7 +27,7 @@ from robustness_sensitivity_screen import (
     PATTERN_PROBABILITIES,
     draw_scenario,
     sample_receptor_count,
-    simulate_one_ev,
+    simulate_evs,
 )
 from score_ev_capture_geometry import load_linker_models
 
@@ -210,10 +210,7 @@ def main() -> None:
                 anchors = np.asarray(
                     [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in active_layout]
                 )
-                captures = [
-                    simulate_one_ev(anchors, receptors, diameter, scenario, linker_models, rng)
-                    for diameter, receptors in evs
-                ]
+                captures = simulate_evs(anchors, evs, scenario, linker_models, rng)
                 single_capture = float(np.mean(captures))
                 candidates = [
                     (zones,) + staged_score(single_capture, zones, len(layout), scenario)
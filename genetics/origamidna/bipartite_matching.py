@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Maximum one-to-one aptamer/CD133 matching shared by every capture scorer.
+
+Beginner picture:
+Each aptamer can hold at most one receptor, and each receptor can be held by
+at most one aptamer. The number of simultaneous contacts is therefore the size
+of the largest set of aptamer/receptor pairs that never reuse either side.
+
+The matcher below is Hopcroft-Karp on bit-packed adjacency rows. A greedy
+first pass usually finds most of the matching, and the search stops as soon
+as the count reaches the largest value still possible.
+
+``min_cost_assignment`` solves the weighted version used for lattice mapping:
+every left node gets its own right node at the lowest total cost, using only
+the listed candidate pairs.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+
+import numpy as np
+
+INFINITE_LAYER = 1 << 30
+
+
+def pack_adjacency(edges: np.ndarray) -> list[int]:
+    """Pack each row of a boolean matrix into one integer bit mask."""
+    n_columns = edges.shape[1]
+    if n_columns <= 62:
+        weights = np.left_shift(np.int64(1), np.arange(n_columns, dtype=np.int64))
+        return (edges.astype(np.int64) @ weights).tolist()
+    packed = np.packbits(edges, axis=1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+def hopcroft_karp(adjacency: list[int], n_right: int) -> int:
+    """Return the maximum matching size for bit-packed left-side adjacency rows."""
+    n_left = len(adjacency)
+    reachable = 0
+    active_left = 0
+    for mask in adjacency:
+        if mask:
+            reachable |= mask
+            active_left += 1
+    limit = min(active_left, reachable.bit_count())
+    if limit == 0:
+        return 0
+
+    match_left = [-1] * n_left
+    match_right = [-1] * n_right
+    matches = 0
+
+    # Greedy warm start: rows with the fewest options pick first.
+    free_right = reachable
+    for u in sorted(range(n_left), key=lambda i: adjacency[i].bit_count()):
+        options = adjacency[u] & free_right
+        if options:
+            low = options & -options
+            v = low.bit_length() - 1
+            match_left[u] = v
+            match_right[v] = u
+            free_right ^= low
+            matches += 1
+    if matches == limit:
+        return matches
+
+    dist = [INFINITE_LAYER] * n_left
+
+    def layered() -> int:
+        queue = []
+        for u in range(n_left):
+            if match_left[u] == -1 and adjacency[u]:
+                dist[u] = 0
+                queue.append(u)
+            else:
+                dist[u] = INFINITE_LAYER
+        shortest = INFINITE_LAYER
+        for u in queue:
+            if dist[u] >= shortest:
+                continue
+            options = adjacency[u]
+            while options:
+                low = options & -options
+                options ^= low
+                w = match_right[low.bit_length() - 1]
+                if w == -1:
+                    shortest = min(shortest, dist[u] + 1)
+                elif dist[w] == INFINITE_LAYER:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        return shortest
+
+    def augment(u: int, shortest: int) -> bool:
+        options = adjacency[u]
+        while options:
+            low = options & -options
+            options ^= low
+            v = low.bit_length() - 1
+            w = match_right[v]
+            if (w == -1 and dist[u] + 1 == shortest) or (
+                w != -1 and dist[w] == dist[u] + 1 and augment(w, shortest)
+            ):
+                match_left[u] = v
+                match_right[v] = u
+                return True
+        dist[u] = INFINITE_LAYER
+        return False
+
+    while matches < limit:
+        shortest = layered()
+        if shortest == INFINITE_LAYER:
+            break
+        for u in range(n_left):
+            if match_left[u] == -1 and dist[u] == 0 and augment(u, shortest):
+                matches += 1
+                if matches == limit:
+                    break
+    return matches
+
+
+def max_bipartite_matches(edges: np.ndarray) -> int:
+    """Return the largest one-to-one matching in an anchors x receptors edge matrix."""
+    edges = np.asarray(edges, dtype=bool)
+    if edges.size == 0:
+        return 0
+    # Search from the smaller side; the larger side becomes the bit mask.
+    if edges.shape[0] > edges.shape[1]:
+        edges = edges.T
+    return hopcroft_karp(pack_adjacency(edges), edges.shape[1])
+
+
+def batch_max_bipartite_matches(edges: np.ndarray) -> np.ndarray:
+    """Return the maximum matching size of every matrix in a ``(..., anchors, receptors)`` stack.
+
+    The bound min(anchors with an edge, receptors with an edge) is computed for
+    the whole stack at once and is exact whenever it is 0 or 1. The remaining
+    matrices are deduplicated before running the exact matcher, so repeated
+    trial outcomes (common with sparse receptors) are solved only once.
+    """
+    edges = np.asarray(edges, dtype=bool)
+    batch_shape = edges.shape[:-2]
+    if edges.shape[-2] == 0 or edges.shape[-1] == 0:
+        return np.zeros(batch_shape, dtype=int)
+    flat = edges.reshape((-1,) + edges.shape[-2:])
+    sizes = np.minimum(
+        np.count_nonzero(flat.any(axis=2), axis=1),
+        np.count_nonzero(flat.any(axis=1), axis=1),
+    )
+    unresolved = np.flatnonzero(sizes > 1)
+    if len(unresolved):
+        packed = np.packbits(flat[unresolved].reshape(len(unresolved), -1), axis=1)
+        _, first_index, inverse = np.unique(packed, axis=0, return_index=True, return_inverse=True)
+        unique_sizes = np.asarray(
+            [max_bipartite_matches(flat[unresolved[index]]) for index in first_index],
+            dtype=sizes.dtype,
+        )
+        sizes[unresolved] = unique_sizes[inverse.reshape(-1)]
+    return sizes.reshape(batch_shape)
+
+
+def min_cost_assignment(candidates: list[list[tuple[int, float]]], n_right: int) -> list[int]:
+    """Minimum-cost one-to-one assignment over sparse candidate edges.
+
+    ``candidates[u]`` lists the ``(v, cost)`` pairs left node ``u`` may take.
+    Returns the right node assigned to each left node, or -1 for left nodes
+    left over. As many left nodes as possible are assigned, and among those
+    assignments the cheapest is returned.
+
+    Left nodes are added one at a time, each along the cheapest augmenting
+    path found by Dijkstra with node potentials (the Hungarian method on a
+    sparse graph). Every left node also gets a private overflow node that
+    costs more than any chain of real reassignments, so an assignment always
+    exists and overflow is used only when no real one is possible. Time and
+    memory follow the number of candidate edges, not ``n_left x n_right``.
+    """
+    n_left = len(candidates)
+    costs = [cost for row in candidates for _, cost in row]
+    if not costs:
+        return [-1] * n_left
+    # Shifting every cost by one constant keeps the optimum and makes them non-negative.
+    offset = min(costs)
+    overflow_cost = 1.0 + (n_left + 1) * (max(costs) - offset)
+    edges = [
+        [(v, cost - offset) for v, cost in row] + [(n_right + u, overflow_cost)] for u, row in enumerate(candidates)
+    ]
+    match_left = [-1] * n_left
+    match_right = [-1] * (n_right + n_left)
+    potential_left = [0.0] * n_left
+    potential_right = [0.0] * (n_right + n_left)
+
+    for source in range(n_left):
+        # Heap entries are (distance, side, node); side 0 is left, 1 is right.
+        dist_left = {source: 0.0}
+        dist_right: dict[int, float] = {}
+        previous: dict[int, int] = {}
+        # Settled nodes are final. Round-off can make a later path look a hair
+        # shorter, and reopening a settled node would corrupt ``previous``.
+        settled_left: dict[int, None] = {}
+        settled_right: dict[int, None] = {}
+        heap = [(0.0, 0, source)]
+        while True:
+            d, side, node = heapq.heappop(heap)
+            if side == 0:
+                if node in settled_left or d > dist_left[node]:
+                    continue
+                settled_left[node] = None
+                for v, cost in edges[node]:
+                    if v == match_left[node] or v in settled_right:
+                        continue
+                    reduced = d + cost + potential_left[node] - potential_right[v]
+                    if reduced < dist_right.get(v, math.inf):
+                        dist_right[v] = reduced
+                        previous[v] = node
+                        heapq.heappush(heap, (reduced, 1, v))
+            else:
+                if node in settled_right or d > dist_right[node]:
+                    continue
+                settled_right[node] = None
+                owner = match_right[node]
+                if owner == -1:
+                    target = node
+                    break
+                # The matched edge is tight, so crossing it back costs nothing.
+                if owner not in settled_left and d < dist_left.get(owner, math.inf):
+                    dist_left[owner] = d
+                    heapq.heappush(heap, (d, 0, owner))
+
+        reach = dist_right[target]
+        for u in settled_left:
+            potential_left[u] += dist_left[u] - reach
+        for v in settled_right:
+            potential_right[v] += dist_right[v] - reach
+        v = target
+        while True:
+            u = previous[v]
+            next_v = match_left[u]
+            match_left[u] = v
+            match_right[v] = u
+            if u == source:
+                break
+            v = next_v
+    return [v if v < n_right else -1 for v in match_left]
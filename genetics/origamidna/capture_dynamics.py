@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""Shared Brownian EV capture kernel used by every dynamic capture script.
+
+Beginner picture:
+Each EV is a ball drifting randomly just above the DNA-origami surface. Its
+CD133 receptors ride along with it. At every time step existing
+aptamer/receptor bonds may break, free aptamers may grab free receptors that
+are within linker reach, and bonds slow the EV down and pull it closer. An EV
+counts as captured once it keeps enough bonds for long enough.
+
+All EVs in a batch move together. Positions, bond tables and dwell counters
+are stacked arrays, so one time step costs a few array operations for the
+whole batch instead of a Python loop per EV. The scripts only describe their
+scenario (rates, thresholds, field shape) in a ``CaptureScenario``.
+
+With the opt-in ``capture_only`` a trajectory stops as soon as its capture
+outcome is decided (captured, or too few steps left to finish the dwell); only
+``ever_captured`` is meaningful then.
+
+Anchors are looked up through an ``AnchorCellIndex`` (a uniform grid with one
+linker reach per cell), so a step only measures receptors against the few
+anchors in neighbouring cells. Per-step cost therefore stays flat as a
+multi-tile field grows.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+
+from score_ev_capture_geometry import LinkerModels
+
+Anchor = dict[str, Union[float, str]]
+
+# receptor_to_anchor marks padding slots (EVs with fewer receptors than the
+# batch maximum) with this value so they are never free and never bonded.
+PADDING = -2
+
+# The 3x3 block of cells searched around a query point.
+NEIGHBOR_OFFSETS = np.asarray([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=int)
+
+
+@dataclass(frozen=True)
+class CaptureScenario:
+    """Physical and bookkeeping settings for one batch of capture trajectories.
+
+    The EV starts uniformly inside ``start_half_width_nm`` around the origin.
+    Lateral motion is either pulled back onto a circle of ``escape_radius_nm``
+    or clamped to the rectangle ``field_half_width_nm`` (for multi-tile
+    fields); set the unused one to None. ``capture_only`` is the shortcut
+    described in the module docstring.
+    """
+
+    n_steps: int
+    dt_seconds: float = 0.05
+    diffusion_nm2_per_s: float = 35.0
+    bound_floor_fraction: float = 0.10
+    k_on_per_step: float = 0.18
+    k_off_per_s: float = 0.12
+    reach_multiplier: float = 1.0
+    binding_activity: float = 1.0
+    capture_threshold: int = 1
+    strong_threshold: int = 2
+    capture_dwell_seconds: float = 1.0
+    surface_clearance_nm: float = 2.0
+    initial_gap_nm: float = 8.0
+    max_gap_nm: float = 24.0
+    start_half_width_nm: tuple[float, float] = (22.0, 22.0)
+    escape_radius_nm: float | None = 75.0
+    field_half_width_nm: tuple[float, float] | None = None
+    strain_break_nm: float = 14.0
+    capture_only: bool = False
+
+    @property
+    def required_capture_steps(self) -> int:
+        return max(1, int(round(self.capture_dwell_seconds / self.dt_seconds)))
+
+
+@dataclass(frozen=True)
+class CaptureResult:
+    """Per-step contact counts and capture flags, shape ``(trajectories, steps)``.
+
+    ``steps_run`` is how many steps each trajectory was actually stepped; it is
+    ``n_steps`` everywhere unless the scenario was ``capture_only``.
+    """
+
+    receptor_counts: np.ndarray
+    contacts: np.ndarray
+    captured: np.ndarray
+    strong_threshold: int
+    steps_run: np.ndarray
+
+    @property
+    def ever_captured(self) -> np.ndarray:
+        return self.captured.any(axis=1)
+
+    @property
+    def mean_contacts(self) -> np.ndarray:
+        return self.contacts.mean(axis=1)
+
+    @property
+    def max_contacts(self) -> np.ndarray:
+        return self.contacts.max(axis=1)
+
+    @property
+    def strong_fraction(self) -> np.ndarray:
+        return (self.contacts >= self.strong_threshold).mean(axis=1)
+
+
+@dataclass(frozen=True)
+class AnchorCellIndex:
+    """Cell list over anchor x/y positions, built once per anchor set.
+
+    Anchors are sorted by square cell of side ``cell_nm``; ``cell_start`` holds
+    where each cell's run begins in ``anchor_order`` (CSR layout). With
+    ``cell_nm`` at least the query radius, the 3x3 cells around a point hold
+    every anchor within that radius.
+    """
+
+    origin: np.ndarray
+    cell_nm: float
+    n_cells: tuple[int, int]
+    cell_start: np.ndarray
+    anchor_order: np.ndarray
+
+    @classmethod
+    def build(cls, anchor_xy: np.ndarray, cell_nm: float) -> AnchorCellIndex:
+        if cell_nm <= 0.0:
+            raise ValueError("cell_nm must be positive")
+        anchor_xy = np.asarray(anchor_xy, dtype=float).reshape(-1, 2)
+        origin = anchor_xy.min(axis=0) if len(anchor_xy) else np.zeros(2)
+        cells = np.floor((anchor_xy - origin) / cell_nm).astype(int)
+        n_x, n_y = (cells.max(axis=0) + 1) if len(anchor_xy) else (1, 1)
+        flat = cells[:, 0] * n_y + cells[:, 1]
+        anchor_order = np.argsort(flat, kind="stable")
+        cell_start = np.zeros(n_x * n_y + 1, dtype=int)
+        np.cumsum(np.bincount(flat, minlength=n_x * n_y), out=cell_start[1:])
+        return cls(origin, float(cell_nm), (int(n_x), int(n_y)), cell_start, anchor_order)
+
+    def neighbors(self, points_xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(point_index, anchor_index)`` for every anchor in the 3x3 cells around each point.
+
+        Pairs farther than ``cell_nm`` can be included; callers filter by distance.
+        """
+        n_x, n_y = self.n_cells
+        cells = np.floor((np.asarray(points_xy, dtype=float) - self.origin) / self.cell_nm).astype(int)
+        cell_x = cells[:, 0, None] + NEIGHBOR_OFFSETS[:, 0]
+        cell_y = cells[:, 1, None] + NEIGHBOR_OFFSETS[:, 1]
+        point_id, offset_id = np.nonzero((cell_x >= 0) & (cell_x < n_x) & (cell_y >= 0) & (cell_y < n_y))
+        flat = cell_x[point_id, offset_id] * n_y + cell_y[point_id, offset_id]
+        start = self.cell_start[flat]
+        count = self.cell_start[flat + 1] - start
+        run_offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return np.repeat(point_id, count), self.anchor_order[np.repeat(start, count) + run_offset]
+
+
+def clamp_to_field(centers: np.ndarray, scenario: CaptureScenario) -> None:
+    """Pull lateral positions back onto the escape circle or into the field rectangle, in place."""
+    if scenario.escape_radius_nm is not None:
+        lateral = np.hypot(centers[:, 0], centers[:, 1])
+        escaped = lateral > scenario.escape_radius_nm
+        if escaped.any():
+            # Keep escaped particles in the bookkeeping with no new capture.
+            centers[escaped, :2] *= (scenario.escape_radius_nm / lateral[escaped])[:, None]
+    if scenario.field_half_width_nm is not None:
+        half_x, half_y = scenario.field_half_width_nm
+        np.clip(centers[:, 0], -half_x, half_x, out=centers[:, 0])
+        np.clip(centers[:, 1], -half_y, half_y, out=centers[:, 1])
+
+
+def pad_receptor_bodies(bodies: list[np.ndarray]) -> np.ndarray:
+    """Stack receptor clouds of different sizes into one NaN-padded ``(n, max_receptors, 3)`` array."""
+    width = max((len(body) for body in bodies), default=0)
+    padded = np.full((len(bodies), max(width, 1), 3), np.nan, dtype=float)
+    for index, body in enumerate(bodies):
+        padded[index, : len(body)] = body
+    return padded
+
+
+def form_bonds(
+    trajectory_index: np.ndarray,
+    anchor_index: np.ndarray,
+    receptor_index: np.ndarray,
+    anchor_to_receptor: np.ndarray,
+    receptor_to_anchor: np.ndarray,
+    rng: np.random.Generator,
+) -> None:
+    """Resolve successful bond candidates ``(trajectory, anchor, receptor)`` one-to-one.
+
+    Every candidate gets a random priority. A candidate is accepted once it holds
+    the best remaining priority for both its anchor and its receptor; this is the
+    same outcome as visiting the candidates in a random shuffle, without a
+    per-pair Python loop.
+    """
+    n_anchors = anchor_to_receptor.shape[1]
+    n_receptors = receptor_to_anchor.shape[1]
+    priority = rng.random(len(trajectory_index))
+    best_for_anchor = np.empty(anchor_to_receptor.size)
+    best_for_receptor = np.empty(receptor_to_anchor.size)
+    while len(priority):
+        anchor_slot = trajectory_index * n_anchors + anchor_index
+        receptor_slot = trajectory_index * n_receptors + receptor_index
+        best_for_anchor[anchor_slot] = np.inf
+        best_for_receptor[receptor_slot] = np.inf
+        np.minimum.at(best_for_anchor, anchor_slot, priority)
+        np.minimum.at(best_for_receptor, receptor_slot, priority)
+        accepted = (priority == best_for_anchor[anchor_slot]) & (priority == best_for_receptor[receptor_slot])
+        anchor_to_receptor[trajectory_index[accepted], anchor_index[accepted]] = receptor_index[accepted]
+        receptor_to_anchor[trajectory_index[accepted], receptor_index[accepted]] = anchor_index[accepted]
+
+        remaining = (anchor_to_receptor[trajectory_index, anchor_index] == -1) & (
+            receptor_to_anchor[trajectory_index, receptor_index] == -1
+        )
+        trajectory_index = trajectory_index[remaining]
+        anchor_index = anchor_index[remaining]
+        receptor_index = receptor_index[remaining]
+        priority = priority[remaining]
+
+
+def break_bonds(
+    anchor_xyz: np.ndarray,
+    receptors: np.ndarray,
+    anchor_to_receptor: np.ndarray,
+    receptor_to_anchor: np.ndarray,
+    p_off: float,
+    strain_break_nm: float,
+    rng: np.random.Generator,
+) -> None:
+    # Bonds are found from the receptor side, whose width does not grow with
+    # the field, then visited in (trajectory, anchor) order.
+    trajectory_index, receptor_index = np.nonzero(receptor_to_anchor >= 0)
+    if len(trajectory_index) == 0:
+        return
+    anchor_index = receptor_to_anchor[trajectory_index, receptor_index]
+    order = np.lexsort((anchor_index, trajectory_index))
+    trajectory_index = trajectory_index[order]
+    anchor_index = anchor_index[order]
+    receptor_index = receptor_index[order]
+    bond_distances = np.linalg.norm(
+        anchor_xyz[anchor_index] - receptors[trajectory_index, receptor_index], axis=1
+    )
+    broken = (bond_distances > strain_break_nm) | (rng.random(len(trajectory_index)) < p_off)
+    anchor_to_receptor[trajectory_index[broken], anchor_index[broken]] = -1
+    receptor_to_anchor[trajectory_index[broken], receptor_index[broken]] = -1
+
+
+def move_centers(
+    centers: np.ndarray,
+    n_contacts: np.ndarray,
+    min_z: np.ndarray,
+    max_z: np.ndarray,
+    scenario: CaptureScenario,
+    rng: np.random.Generator,
+    step_sigma: np.ndarray | None = None,
+    noise: np.ndarray | None = None,
+) -> None:
+    """Advance EV centres one Brownian step in place; bonds slow the EV and pull it down.
+
+    ``step_sigma`` and ``noise`` are optional buffers of matching length.
+    """
+    step_sigma = np.empty(len(centers)) if step_sigma is None else step_sigma
+    noise = np.empty((len(centers), 3)) if noise is None else noise
+    np.multiply(0.75, n_contacts, out=step_sigma)
+    step_sigma += 1.0
+    np.reciprocal(step_sigma, out=step_sigma)
+    np.maximum(step_sigma, scenario.bound_floor_fraction, out=step_sigma)
+    step_sigma *= 2.0 * scenario.diffusion_nm2_per_s * scenario.dt_seconds
+    np.sqrt(step_sigma, out=step_sigma)
+    rng.standard_normal(out=noise)
+    noise *= step_sigma[:, None]
+    noise[:, 2] *= 0.45
+    centers += noise
+    centers[:, 2] -= 0.035 * n_contacts
+    np.clip(centers[:, 2], min_z, max_z, out=centers[:, 2])
+    clamp_to_field(centers, scenario)
+
+
+def simulate_capture(
+    anchors: list[Anchor],
+    linker_models: LinkerModels,
+    receptor_bodies: np.ndarray,
+    diameters_nm: np.ndarray | float,
+    scenario: CaptureScenario,
+    rng: np.random.Generator,
+) -> CaptureResult:
+    """Run one trajectory per receptor cloud in ``receptor_bodies`` over the same anchors.
+
+    ``receptor_bodies`` has shape ``(trajectories, receptors, 3)`` in EV body
+    coordinates; NaN rows are padding for EVs with fewer receptors.
+    ``diameters_nm`` is one diameter for the whole batch or one per trajectory.
+    Anchors may carry ``reach_multiplier`` and ``binding_multiplier``; as in
+    ``anchor_reach_probabilities``, their construct's curve is then stretched
+    along the distance axis and scaled in height for that anchor only.
+    """
+    receptor_bodies = np.asarray(receptor_bodies, dtype=float)
+    n_trajectories, n_receptors = receptor_bodies.shape[:2]
+    n_anchors = len(anchors)
+    n_steps = scenario.n_steps
+    radii = np.broadcast_to(np.asarray(diameters_nm, dtype=float) / 2.0, (n_trajectories,))
+
+    valid = ~np.isnan(receptor_bodies[:, :, 0])
+    body = np.where(valid[:, :, None], receptor_bodies, 0.0)
+    anchor_xyz = np.asarray(
+        [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in anchors],
+        dtype=float,
+    ).reshape(-1, 3)
+
+    constructs = sorted({str(anchor["linker_construct"]) for anchor in anchors})
+    construct_models = [linker_models[construct] for construct in constructs]
+    anchor_construct = np.asarray(
+        [constructs.index(str(anchor["linker_construct"])) for anchor in anchors], dtype=int
+    )
+    anchor_reach = np.asarray([float(anchor.get("reach_multiplier", 1.0)) for anchor in anchors])
+    anchor_binding = np.asarray([float(anchor.get("binding_multiplier", 1.0)) for anchor in anchors])
+    reach_cutoff_nm = scenario.reach_multiplier * max(
+        (construct_models[construct].support_nm * reach for construct, reach in zip(anchor_construct, anchor_reach)),
+        default=0.0,
+    )
+    reach_scale = scenario.binding_activity * scenario.k_on_per_step
+    can_bind = reach_scale > 0.0 and n_anchors > 0 and reach_cutoff_nm > 0.0
+    if can_bind:
+        reach_box_low = anchor_xyz[:, :2].min(axis=0) - reach_cutoff_nm
+        reach_box_high = anchor_xyz[:, :2].max(axis=0) + reach_cutoff_nm
+        anchor_index_grid = AnchorCellIndex.build(anchor_xyz[:, :2], reach_cutoff_nm)
+
+    min_z = radii + scenario.surface_clearance_nm
+    max_z = min_z + scenario.max_gap_nm
+    centers = np.empty((n_trajectories, 3), dtype=float)
+    centers[:, 0] = rng.uniform(-scenario.start_half_width_nm[0], scenario.start_half_width_nm[0], n_trajectories)
+    centers[:, 1] = rng.uniform(-scenario.start_half_width_nm[1], scenario.start_half_width_nm[1], n_trajectories)
+    centers[:, 2] = min_z + scenario.initial_gap_nm
+
+    anchor_to_receptor = np.full((n_trajectories, n_anchors), -1, dtype=int)
+    receptor_to_anchor = np.where(valid, -1, PADDING)
+    p_off = 1.0 - math.exp(-scenario.k_off_per_s * scenario.dt_seconds)
+    required_steps = scenario.required_capture_steps
+
+    # Buffers reused by every step.
+    contacts = np.zeros((n_trajectories, n_steps), dtype=int)
+    captured = np.zeros((n_trajectories, n_steps), dtype=bool)
+    n_contacts = np.zeros(n_trajectories, dtype=int)
+    consecutive = np.zeros(n_trajectories, dtype=int)
+    step_sigma = np.empty(n_trajectories)
+    noise = np.empty((n_trajectories, 3))
+    receptors = np.empty_like(body)
+    near = np.empty((n_trajectories, n_receptors), dtype=bool)
+    scratch = np.empty((n_trajectories, n_receptors), dtype=bool)
+
+    steps_run = np.full(n_trajectories, n_steps, dtype=int)
+    # Trajectories that still get steps; decided ones drop out.
+    active = np.arange(n_trajectories)
+
+    for step in range(n_steps):
+        if scenario.capture_only:
+            moving = centers[active]
+            move_centers(moving, n_contacts[active], min_z[active], max_z[active], scenario, rng)
+            centers[active] = moving
+        else:
+            move_centers(centers, n_contacts, min_z, max_z, scenario, rng, step_sigma, noise)
+
+        if scenario.capture_only:
+            # Only active trajectories get receptor and bond work this step;
+            # the others keep zero contacts.
+            n_active = len(active)
+            step_receptors = receptors[:n_active]
+            np.add(body[active], centers[active, None, :], out=step_receptors)
+            step_anchor_to_receptor = anchor_to_receptor[active]
+            step_receptor_to_anchor = receptor_to_anchor[active]
+            step_near = near[:n_active]
+            step_scratch = scratch[:n_active]
+        else:
+            step_receptors = np.add(body, centers[:, None, :], out=receptors)
+            step_anchor_to_receptor = anchor_to_receptor
+            step_receptor_to_anchor = receptor_to_anchor
+            step_near = near
+            step_scratch = scratch
+
+        break_bonds(
+            anchor_xyz,
+            step_receptors,
+            step_anchor_to_receptor,
+            step_receptor_to_anchor,
+            p_off,
+            scenario.strain_break_nm,
+            rng,
+        )
+
+        if can_bind:
+            # Only free receptors inside the anchors' reach box can bind; every
+            # other pair has zero probability and is never evaluated.
+            np.equal(step_receptor_to_anchor, -1, out=step_near)
+            step_near &= np.less_equal(step_receptors[:, :, 2], reach_cutoff_nm, out=step_scratch)
+            step_near &= np.greater_equal(step_receptors[:, :, 0], reach_box_low[0], out=step_scratch)
+            step_near &= np.less_equal(step_receptors[:, :, 0], reach_box_high[0], out=step_scratch)
+            step_near &= np.greater_equal(step_receptors[:, :, 1], reach_box_low[1], out=step_scratch)
+            step_near &= np.less_equal(step_receptors[:, :, 1], reach_box_high[1], out=step_scratch)
+            near_trajectory, near_receptor = np.nonzero(step_near)
+            if len(near_trajectory):
+                near_xyz = step_receptors[near_trajectory, near_receptor]
+                pair_index, anchor_index = anchor_index_grid.neighbors(near_xyz[:, :2])
+                pair_xyz = near_xyz[pair_index]
+                squared = (
+                    (anchor_xyz[anchor_index, 0] - pair_xyz[:, 0]) ** 2
+                    + (anchor_xyz[anchor_index, 1] - pair_xyz[:, 1]) ** 2
+                    + (anchor_xyz[anchor_index, 2] - pair_xyz[:, 2]) ** 2
+                )
+                in_reach = (squared <= reach_cutoff_nm * reach_cutoff_nm) & (
+                    step_anchor_to_receptor[near_trajectory[pair_index], anchor_index] == -1
+                )
+                # Anchor-major order, so random draws line up with pairs the
+                # same way however many anchors the field has.
+                keep = np.flatnonzero(in_reach)
+                keep = keep[np.lexsort((pair_index[keep], anchor_index[keep]))]
+                anchor_index = anchor_index[keep]
+                pair_index = pair_index[keep]
+                if len(anchor_index):
+                    scaled = np.sqrt(squared[keep]) / (scenario.reach_multiplier * anchor_reach[anchor_index])
+                    probabilities = np.empty(len(anchor_index))
+                    pair_construct = anchor_construct[anchor_index]
+                    for construct_index, model in enumerate(construct_models):
+                        rows = pair_construct == construct_index
+                        probabilities[rows] = model(scaled[rows])
+                    probabilities *= anchor_binding[anchor_index]
+                    bound = rng.random(len(anchor_index)) < reach_scale * probabilities
+                    if bound.any():
+                        pair_index = pair_index[bound]
+                        form_bonds(
+                            near_trajectory[pair_index],
+                            anchor_index[bound],
+                            near_receptor[pair_index],
+                            step_anchor_to_receptor,
+                            step_receptor_to_anchor,
+                            rng,
+                        )
+
+        if scenario.capture_only:
+            anchor_to_receptor[active] = step_anchor_to_receptor
+            receptor_to_anchor[active] = step_receptor_to_anchor
+            active_contacts = np.count_nonzero(step_receptor_to_anchor >= 0, axis=1)
+            n_contacts[active] = active_contacts
+            contacts[active, step] = active_contacts
+            run = consecutive[active] + 1
+            run[active_contacts < scenario.capture_threshold] = 0
+            consecutive[active] = run
+            captured[active, step] = run >= required_steps
+        else:
+            n_contacts[:] = np.count_nonzero(receptor_to_anchor >= 0, axis=1)
+            contacts[:, step] = n_contacts
+            consecutive += 1
+            consecutive[n_contacts < scenario.capture_threshold] = 0
+            np.greater_equal(consecutive, required_steps, out=captured[:, step])
+
+        if scenario.capture_only:
+            # The outcome is settled once captured, or once even an unbroken run
+            # of contacts from here could no longer reach the dwell time.
+            steps_left = n_steps - step - 1
+            decided = captured[active, step] | (consecutive[active] + steps_left < required_steps)
+            if decided.any():
+                steps_run[active[decided]] = step + 1
+                active = active[~decided]
+            if not len(active):
+                break
+
+    return CaptureResult(valid.sum(axis=1), contacts, captured, scenario.strong_threshold, steps_run)
@@ -5,22 +5,43 @@ Beginner picture:
 Each EV is a tiny ball. CD133 molecules are tiny handles on that ball. This
 script makes many fake-but-realistic balls with different sizes, handle counts,
 and handle patterns.
+
+Populations are saved as a "population store": a directory holding one
+uncompressed ``.npy`` file per column plus ``metadata.json`` (seed, size and
+generator settings). Columns are opened memory-mapped, so slicing a few EVs
+out of a very large population never loads the rest into RAM. Receptor
+points are stored ragged (a flat float32 buffer plus per-EV offsets, see
+``ragged_receptors``); sequential stores also keep the float64 padded array
+that the seeded results were computed from.
+
+``generate_population`` builds EVs one at a time and is kept for the seeded
+populations behind the existing results. Large cohorts use the blocked
+generator instead: it draws whole blocks of ``BLOCK_EVS`` EVs as arrays, each
+block from its own child of the seed, and streams them into a store. Block
+boundaries are fixed, so the output does not depend on the chunk size used to
+write it.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
+import time
+from collections.abc import Iterator
 import math
 from dataclasses import dataclass
 from pathlib import Path
 
 import numpy as np
 
+from ragged_receptors import RaggedReceptors
+
 ROOT = Path(__file__).resolve().parent
 OUT_CSV = ROOT / "ev_population_clinical.csv"
-OUT_NPZ = ROOT / "ev_population_clinical.npz"
+OUT_STORE = ROOT / "ev_population_clinical.popstore"
 OUT_JSON = ROOT / "ev_population_clinical_summary.json"
+OUT_COHORT_STORE = ROOT / "ev_population_cohort.popstore"
 
 RNG_SEED = 20260615
 N_EVS = 160
@@ -29,6 +50,20 @@ DIAMETER_SD_NM = 12.0
 MIN_DIAMETER_NM = 45.0
 MAX_DIAMETER_NM = 115.0
 MAX_RECEPTORS = 20
+PATTERNS = ("random", "single_cluster", "two_cluster", "bottom_cap")
+PATTERN_PROBABILITIES = (0.40, 0.25, 0.20, 0.15)
+# Cluster spread (radians) per pattern; "random" has no cluster.
+PATTERN_SPREAD_RAD = (0.0, 0.16, 0.14, 0.28)
+# Receptor-count tiers as (cumulative probability, low, high exclusive).
+RECEPTOR_COUNT_TIERS = ((0.30, 1, 4), (0.80, 4, 11), (1.00, 11, 16))
+
+BLOCK_EVS = 8192
+CHUNK_EVS = 65536
+
+STORE_FORMAT = "ev_population_store/1"
+STORE_METADATA = "metadata.json"
+POPULATION_COLUMNS = ("receptor_points", "diameter_nm", "receptor_count", "pattern")
+RAGGED_COLUMNS = ("receptor_xyz", "receptor_offsets")
 
 
 @dataclass(frozen=True)
@@ -49,11 +84,10 @@ def sample_diameter(rng: np.random.Generator) -> float:
 
 def sample_receptor_count(rng: np.random.Generator) -> int:
     draw = rng.random()
-    if draw < 0.30:
-        return int(rng.integers(1, 4))
-    if draw < 0.80:
-        return int(rng.integers(4, 11))
-    return int(rng.integers(11, 16))
+    for cumulative, low, high in RECEPTOR_COUNT_TIERS:
+        if draw < cumulative:
+            break
+    return int(rng.integers(low, high))
 
 
 def random_lower_hemisphere(n: int, radius_nm: float, rng: np.random.Generator) -> np.ndarray:
@@ -108,21 +142,22 @@ def cluster_points(
 def receptor_points(pattern: str, receptor_count: int, radius_nm: float, rng: np.random.Generator) -> np.ndarray:
     if receptor_count == 0:
         return np.zeros((0, 3), dtype=float)
+    spread_rad = dict(zip(PATTERNS, PATTERN_SPREAD_RAD)).get(pattern)
     if pattern == "random":
         return random_lower_hemisphere(receptor_count, radius_nm, rng)
     if pattern == "single_cluster":
-        return cluster_points(receptor_count, radius_nm, rng, spread_rad=0.16)
+        return cluster_points(receptor_count, radius_nm, rng, spread_rad=spread_rad)
     if pattern == "two_cluster":
         if receptor_count < 2:
-            return cluster_points(receptor_count, radius_nm, rng, spread_rad=0.14)
+            return cluster_points(receptor_count, radius_nm, rng, spread_rad=spread_rad)
         n1 = receptor_count // 2
         n2 = receptor_count - n1
         first = random_direction_lower(rng)
         second = random_direction_lower(rng)
         return np.vstack(
             (
-                cluster_points(n1, radius_nm, rng, first, spread_rad=0.14),
-                cluster_points(n2, radius_nm, rng, second, spread_rad=0.14),
+                cluster_points(n1, radius_nm, rng, first, spread_rad=spread_rad),
+                cluster_points(n2, radius_nm, rng, second, spread_rad=spread_rad),
             )
         )
     if pattern == "bottom_cap":
@@ -131,29 +166,332 @@ def receptor_points(pattern: str, receptor_count: int, radius_nm: float, rng: np
             radius_nm,
             rng,
             center=np.array([0.0, 0.0, -1.0]),
-            spread_rad=0.28,
+            spread_rad=spread_rad,
         )
     raise ValueError(f"Unknown EV receptor pattern: {pattern}")
 
 
 def generate_population(n_evs: int = N_EVS, seed: int = RNG_SEED) -> tuple[list[EVRecord], np.ndarray]:
     rng = np.random.default_rng(seed)
-    patterns = ("random", "single_cluster", "two_cluster", "bottom_cap")
-    pattern_prob = (0.40, 0.25, 0.20, 0.15)
     records: list[EVRecord] = []
     receptor_array = np.full((n_evs, MAX_RECEPTORS, 3), np.nan, dtype=float)
     for ev_id in range(n_evs):
         diameter = sample_diameter(rng)
         receptor_count = sample_receptor_count(rng)
-        pattern = str(rng.choice(patterns, p=pattern_prob))
+        pattern = str(rng.choice(PATTERNS, p=PATTERN_PROBABILITIES))
         points = receptor_points(pattern, receptor_count, diameter / 2.0, rng)
         records.append(EVRecord(ev_id, diameter, receptor_count, pattern))
         receptor_array[ev_id, :receptor_count, :] = points
     return records, receptor_array
 
 
+def sample_diameters(n: int, rng: np.random.Generator) -> np.ndarray:
+    diameters = rng.normal(MEAN_DIAMETER_NM, DIAMETER_SD_NM, size=n)
+    for _ in range(100):
+        redraw = np.flatnonzero((diameters < MIN_DIAMETER_NM) | (diameters > MAX_DIAMETER_NM))
+        if len(redraw) == 0:
+            break
+        diameters[redraw] = rng.normal(MEAN_DIAMETER_NM, DIAMETER_SD_NM, size=len(redraw))
+    return np.clip(diameters, MIN_DIAMETER_NM, MAX_DIAMETER_NM)
+
+
+def sample_receptor_counts(n: int, rng: np.random.Generator) -> np.ndarray:
+    draw = rng.random(n)
+    cumulative, low, high = (np.asarray(column) for column in zip(*RECEPTOR_COUNT_TIERS))
+    tier = np.minimum(np.searchsorted(cumulative, draw, side="right"), len(cumulative) - 1)
+    return rng.integers(low[tier], high[tier])
+
+
+def lower_hemisphere_units(shape: tuple[int, ...], rng: np.random.Generator) -> np.ndarray:
+    theta = rng.uniform(0.0, 2.0 * math.pi, size=shape)
+    z_unit = -rng.uniform(0.0, 1.0, size=shape)
+    xy_unit = np.sqrt(np.clip(1.0 - z_unit * z_unit, 0.0, None))
+    return np.stack((xy_unit * np.cos(theta), xy_unit * np.sin(theta), z_unit), axis=-1)
+
+
+def tangent_bases(directions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    helper = np.zeros_like(directions)
+    near_vertical = np.abs(directions[..., 2]) > 0.90
+    helper[..., 2] = ~near_vertical
+    helper[..., 0] = near_vertical
+    u = np.cross(directions, helper)
+    u /= np.linalg.norm(u, axis=-1, keepdims=True)
+    v = np.cross(directions, u)
+    v /= np.linalg.norm(v, axis=-1, keepdims=True)
+    return u, v
+
+
+def block_rng(block_index: int, seed: int) -> np.random.Generator:
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+
+
+def block_receptor_counts(block_index: int, n_evs: int, seed: int) -> np.ndarray:
+    # Replays only the first two draws of generate_population_block, so a
+    # streaming writer can size the ragged buffer before drawing any points.
+    rng = block_rng(block_index, seed)
+    sample_diameters(n_evs, rng)
+    return sample_receptor_counts(n_evs, rng)
+
+
+def generate_population_block(block_index: int, n_evs: int, seed: int) -> dict[str, np.ndarray]:
+    """Draw ``n_evs`` EVs of block ``block_index`` as population store columns.
+
+    Same distributions as ``generate_population``, but every EV in the block is
+    drawn at once and all ``MAX_RECEPTORS`` slots are drawn then masked by count.
+    """
+    rng = block_rng(block_index, seed)
+    diameters = sample_diameters(n_evs, rng)
+    counts = sample_receptor_counts(n_evs, rng)
+    pattern_codes = rng.choice(len(PATTERNS), size=n_evs, p=PATTERN_PROBABILITIES)
+    radii = diameters / 2.0
+
+    # Two cluster centres per EV; bottom-cap EVs cluster around straight down.
+    centers = lower_hemisphere_units((n_evs, 2), rng)
+    centers[pattern_codes == PATTERNS.index("bottom_cap")] = (0.0, 0.0, -1.0)
+    slots = np.arange(MAX_RECEPTORS)
+    second_cluster = (
+        (pattern_codes == PATTERNS.index("two_cluster"))[:, None]
+        & (counts >= 2)[:, None]
+        & (slots[None, :] >= (counts // 2)[:, None])
+    )
+    slot_centers = np.where(second_cluster[:, :, None], centers[:, None, 1], centers[:, None, 0])
+    u, v = tangent_bases(slot_centers)
+    spread = np.asarray(PATTERN_SPREAD_RAD)[pattern_codes][:, None, None]
+    offsets = rng.normal(0.0, 1.0, size=(n_evs, MAX_RECEPTORS, 2)) * spread
+    clustered = slot_centers + offsets[:, :, :1] * u + offsets[:, :, 1:] * v
+    clustered[:, :, 2] = -np.abs(clustered[:, :, 2])
+    clustered /= np.linalg.norm(clustered, axis=-1, keepdims=True)
+
+    scattered = lower_hemisphere_units((n_evs, MAX_RECEPTORS), rng)
+    is_random = (pattern_codes == PATTERNS.index("random"))[:, None, None]
+    points = np.where(is_random, scattered, clustered) * radii[:, None, None]
+    points[slots[None, :] >= counts[:, None]] = np.nan
+    return {
+        "receptor_points": points,
+        "diameter_nm": diameters,
+        "receptor_count": counts.astype(int),
+        "pattern": np.asarray(PATTERNS)[pattern_codes],
+    }
+
+
+def iter_population_chunks(
+    n_evs: int, seed: int, chunk_evs: int = CHUNK_EVS
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """Yield ``(start, columns)`` chunks of a blocked population.
+
+    Chunks are cut from fixed ``BLOCK_EVS`` blocks, so any ``chunk_evs`` gives
+    the same EVs.
+    """
+    if chunk_evs <= 0:
+        raise ValueError("chunk_evs must be positive")
+    block_index = -1
+    block: dict[str, np.ndarray] = {}
+    for start in range(0, n_evs, chunk_evs):
+        stop = min(start + chunk_evs, n_evs)
+        pieces = []
+        position = start
+        while position < stop:
+            if position // BLOCK_EVS != block_index:
+                block_index = position // BLOCK_EVS
+                block_start = block_index * BLOCK_EVS
+                block = generate_population_block(
+                    block_index, min(BLOCK_EVS, n_evs - block_start), seed
+                )
+            offset = position - block_index * BLOCK_EVS
+            take = min(stop - position, len(block["diameter_nm"]) - offset)
+            pieces.append({name: column[offset : offset + take] for name, column in block.items()})
+            position += take
+        yield start, {
+            name: np.concatenate([piece[name] for piece in pieces]) for name in POPULATION_COLUMNS
+        }
+
+
+def generator_parameters() -> dict[str, object]:
+    # Everything that shapes the drawn EVs. Lists rather than tuples, so the
+    # value compares equal to its JSON round trip in a store's metadata.
+    return {
+        "mean_diameter_nm": MEAN_DIAMETER_NM,
+        "diameter_sd_nm": DIAMETER_SD_NM,
+        "min_diameter_nm": MIN_DIAMETER_NM,
+        "max_diameter_nm": MAX_DIAMETER_NM,
+        "max_receptors": MAX_RECEPTORS,
+        "patterns": list(PATTERNS),
+        "pattern_probabilities": list(PATTERN_PROBABILITIES),
+        "pattern_spread_rad": list(PATTERN_SPREAD_RAD),
+        "receptor_count_tiers": [list(tier) for tier in RECEPTOR_COUNT_TIERS],
+    }
+
+
+def population_columns(records: list[EVRecord], receptor_array: np.ndarray) -> dict[str, np.ndarray]:
+    counts = np.asarray([r.receptor_count for r in records], dtype=int)
+    ragged = RaggedReceptors.from_padded(receptor_array, counts)
+    return {
+        "receptor_points": receptor_array,
+        "diameter_nm": np.asarray([r.diameter_nm for r in records], dtype=float),
+        "receptor_count": counts,
+        "pattern": np.asarray([r.pattern for r in records]),
+        "receptor_xyz": ragged.points,
+        "receptor_offsets": ragged.offsets,
+    }
+
+
+def write_store_metadata(
+    directory: Path, columns: dict[str, np.ndarray], seed: int, generator: str
+) -> None:
+    # Metadata is written last, so a store without it is treated as incomplete.
+    metadata = {
+        "format": STORE_FORMAT,
+        "generator": generator,
+        "rng_seed": int(seed),
+        "n_evs": int(len(columns["diameter_nm"])),
+        "parameters": generator_parameters(),
+        "columns": {
+            name: {"dtype": columns[name].dtype.str, "shape": list(columns[name].shape)}
+            for name in columns
+        },
+    }
+    (directory / STORE_METADATA).write_text(json.dumps(metadata, indent=2) + "\n", encoding="ascii")
+
+
+def clear_population_store(directory: Path) -> None:
+    # Metadata goes first, so an interrupted rewrite is never mistaken for a
+    # complete store, and no column from an older layout is left behind.
+    for stale in [directory / STORE_METADATA, *sorted(directory.glob("*.npy"))]:
+        stale.unlink(missing_ok=True)
+
+
+def write_population_store(directory: Path, columns: dict[str, np.ndarray], seed: int) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    clear_population_store(directory)
+    for name, column in columns.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(column), allow_pickle=False)
+    write_store_metadata(directory, columns, seed, "sequential")
+
+
+def stream_population_store(
+    directory: Path, n_evs: int, seed: int, chunk_evs: int = CHUNK_EVS
+) -> dict[str, np.ndarray]:
+    """Generate a blocked population straight into a store, one chunk in memory at a time.
+
+    Receptor points are written ragged only; a cohort never holds the padded
+    ``(n_evs, MAX_RECEPTORS, 3)`` array on disk or in memory.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    clear_population_store(directory)
+    offsets = np.zeros(n_evs + 1, dtype=np.int64)
+    for block_start in range(0, n_evs, BLOCK_EVS):
+        block_size = min(BLOCK_EVS, n_evs - block_start)
+        counts = block_receptor_counts(block_start // BLOCK_EVS, block_size, seed)
+        np.cumsum(counts, out=offsets[block_start + 1 : block_start + block_size + 1])
+        offsets[block_start + 1 : block_start + block_size + 1] += offsets[block_start]
+    shapes = {
+        "diameter_nm": ((n_evs,), np.dtype(float)),
+        "receptor_count": ((n_evs,), np.dtype(int)),
+        "pattern": ((n_evs,), np.dtype(f"<U{max(len(p) for p in PATTERNS)}")),
+        "receptor_xyz": ((int(offsets[-1]), 3), np.dtype(np.float32)),
+    }
+    columns = {
+        name: np.lib.format.open_memmap(directory / f"{name}.npy", mode="w+", dtype=dtype, shape=shape)
+        for name, (shape, dtype) in shapes.items()
+    }
+    for start, chunk in iter_population_chunks(n_evs, seed, chunk_evs):
+        stop = start + len(chunk["diameter_nm"])
+        for name in ("diameter_nm", "receptor_count", "pattern"):
+            columns[name][start:stop] = chunk[name]
+        ragged = RaggedReceptors.from_padded(chunk["receptor_points"], chunk["receptor_count"])
+        columns["receptor_xyz"][offsets[start] : offsets[stop]] = ragged.points
+    np.save(directory / "receptor_offsets.npy", offsets, allow_pickle=False)
+    columns["receptor_offsets"] = offsets
+    for column in columns.values():
+        if isinstance(column, np.memmap):
+            column.flush()
+    write_store_metadata(directory, columns, seed, "blocked")
+    return load_population_store(directory)
+
+
+def read_store_metadata(directory: Path) -> dict[str, object] | None:
+    path = directory / STORE_METADATA
+    if not path.exists():
+        return None
+    metadata = json.loads(path.read_text(encoding="ascii"))
+    if metadata.get("format") != STORE_FORMAT:
+        return None
+    return metadata
+
+
+def load_population_store(directory: Path) -> dict[str, np.ndarray]:
+    """Open every column of a population store as a read-only memory map."""
+    metadata = read_store_metadata(directory)
+    if metadata is None:
+        raise FileNotFoundError(f"No complete population store at {directory}")
+    return {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in metadata["columns"]}
+
+
+def population_head(population: dict[str, np.ndarray], n_evs: int) -> dict[str, np.ndarray]:
+    """The first ``n_evs`` EVs of a loaded population, CSR receptor columns included."""
+    n_evs = min(int(n_evs), len(population["diameter_nm"]))
+    head = {
+        name: column[:n_evs]
+        for name, column in population.items()
+        if name not in ("receptor_xyz", "receptor_offsets")
+    }
+    if "receptor_offsets" in population:
+        offsets = population["receptor_offsets"][: n_evs + 1]
+        head["receptor_offsets"] = offsets
+        head["receptor_xyz"] = population["receptor_xyz"][: int(offsets[-1])]
+    return head
+
+
+def ensure_population_store(
+    directory: Path, n_evs: int = N_EVS, seed: int = RNG_SEED, blocked: bool = False
+) -> dict[str, np.ndarray]:
+    """Load the store at ``directory``, regenerating it if its generator, seed, size or settings differ."""
+    generator = "blocked" if blocked else "sequential"
+    metadata = read_store_metadata(directory)
+    if (
+        metadata is None
+        or metadata.get("generator", "sequential") != generator
+        or metadata["rng_seed"] != seed
+        or metadata["n_evs"] != n_evs
+        or metadata["parameters"] != generator_parameters()
+    ):
+        if blocked:
+            return stream_population_store(directory, n_evs, seed)
+        records, receptor_array = generate_population(n_evs, seed)
+        write_population_store(directory, population_columns(records, receptor_array), seed)
+    return load_population_store(directory)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cohort-evs",
+        type=int,
+        default=None,
+        help=f"stream a blocked cohort of this many EVs into {OUT_COHORT_STORE.name} instead",
+    )
+    parser.add_argument("--seed", type=int, default=RNG_SEED)
+    parser.add_argument("--chunk-evs", type=int, default=CHUNK_EVS)
+    return parser.parse_args()
+
+
+def write_cohort(n_evs: int, seed: int, chunk_evs: int) -> None:
+    start = time.perf_counter()
+    population = stream_population_store(OUT_COHORT_STORE, n_evs, seed, chunk_evs)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {OUT_COHORT_STORE.name} ({n_evs} EVs in {elapsed:.1f} s)")
+    print(
+        f"Cohort: diameter mean={float(np.mean(population['diameter_nm'])):.1f} nm, "
+        f"receptor mean={float(np.mean(population['receptor_count'])):.1f}"
+    )
+
+
 def main() -> None:
-    records, receptor_array = generate_population()
+    args = parse_args()
+    if args.cohort_evs is not None:
+        write_cohort(args.cohort_evs, args.seed, args.chunk_evs)
+        return
+    records, receptor_array = generate_population(seed=args.seed)
     with open(OUT_CSV, "w", newline="", encoding="ascii") as f:
         writer = csv.DictWriter(
             f,
@@ -169,19 +507,13 @@ def main() -> None:
                     "pattern": record.pattern,
                 }
             )
-    np.savez_compressed(
-        OUT_NPZ,
-        receptor_points=receptor_array,
-        diameter_nm=np.asarray([r.diameter_nm for r in records], dtype=float),
-        receptor_count=np.asarray([r.receptor_count for r in records], dtype=int),
-        pattern=np.asarray([r.pattern for r in records]),
-    )
+    write_population_store(OUT_STORE, population_columns(records, receptor_array), args.seed)
     counts = np.asarray([r.receptor_count for r in records], dtype=float)
     diameters = np.asarray([r.diameter_nm for r in records], dtype=float)
     summary = {
         "model": "clinical CD133+ EV population generator",
         "n_evs": len(records),
-        "rng_seed": RNG_SEED,
+        "rng_seed": args.seed,
         "diameter_nm": {
             "mean": float(np.mean(diameters)),
             "p10": float(np.percentile(diameters, 10)),
@@ -200,12 +532,12 @@ def main() -> None:
         },
         "outputs": {
             "metadata_csv": OUT_CSV.name,
-            "receptor_points_npz": OUT_NPZ.name,
+            "population_store": OUT_STORE.name,
         },
     }
     OUT_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
     print(f"Wrote {OUT_CSV.name}")
-    print(f"Wrote {OUT_NPZ.name}")
+    print(f"Wrote {OUT_STORE.name}")
     print(f"Wrote {OUT_JSON.name}")
     print(
         f"Population: diameter mean={summary['diameter_nm']['mean']:.1f} nm, "
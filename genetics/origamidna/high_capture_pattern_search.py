@@ -5,10 +5,16 @@ Beginner picture:
 The earlier designs were like small sticky patches. This script tries bigger
 "sticky nets" to see whether a single DNA tile can approach 90% capture in the
 current model.
+
+With ``--surrogate-fraction`` only the hand-built nets and every
+``SURROGATE_WARMUP_STRIDE``-th random net are simulated first. A layout
+surrogate fitted on those then picks which fraction of the remaining random
+nets is worth simulating.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 from pathlib import Path
@@ -21,13 +27,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from clinical_layouts import ellipse_ring, grid_layout
-from ev_population_generator import generate_population
+from ev_population_generator import ensure_population_store, load_population_store, read_store_metadata
+from layout_surrogate import preselect, surrogate_accuracy
 from optimize_population_layouts import evaluate_layout
 from score_ev_capture_geometry import load_linker_models
-from validate_population_dynamics import simulate_one
+from validate_population_dynamics import simulate_population
 
 ROOT = Path(__file__).resolve().parent
-POPULATION_FILE = ROOT / "ev_population_optimization_run.npz"
+POPULATION_STORE = ROOT / "ev_population_optimization_run.popstore"
 OUT_CANDIDATES_CSV = ROOT / "high_capture_layout_scores.csv"
 OUT_DYNAMIC_CSV = ROOT / "high_capture_dynamic_validation.csv"
 OUT_LAYOUTS_CSV = ROOT / "high_capture_best_layouts.csv"
@@ -39,6 +46,7 @@ RNG_SEED = 20260618
 LINKER = "polyT30"
 N_POPULATION_EVS = 160
 TOP_DYNAMIC_LAYOUTS = 8
+SURROGATE_WARMUP_STRIDE = 4
 
 Anchor = dict[str, Union[float, str]]
 
@@ -132,17 +140,11 @@ def candidate_layouts(rng: np.random.Generator) -> dict[str, list[Anchor]]:
     return {name: with_linker(anchors) for name, anchors in layouts.items()}
 
 
-def ensure_population() -> np.lib.npyio.NpzFile:
-    if not POPULATION_FILE.exists():
-        records, receptor_array = generate_population(N_POPULATION_EVS, RNG_SEED)
-        np.savez_compressed(
-            POPULATION_FILE,
-            receptor_points=receptor_array,
-            diameter_nm=np.asarray([r.diameter_nm for r in records], dtype=float),
-            receptor_count=np.asarray([r.receptor_count for r in records], dtype=int),
-            pattern=np.asarray([r.pattern for r in records]),
-        )
-    return np.load(POPULATION_FILE)
+def ensure_population() -> dict[str, np.ndarray]:
+    # Reuse the optimizer's run population when it exists; otherwise make one.
+    if read_store_metadata(POPULATION_STORE) is None:
+        return ensure_population_store(POPULATION_STORE, N_POPULATION_EVS, RNG_SEED)
+    return load_population_store(POPULATION_STORE)
 
 
 def write_layouts(layouts: dict[str, list[Anchor]], names: list[str]) -> None:
@@ -174,11 +176,7 @@ def dynamic_validate(
     rows = []
     for layout_index, name in enumerate(names):
         rng = np.random.default_rng(RNG_SEED + 500 + layout_index)
-        per_ev = []
-        for ev_index, diameter in enumerate(population["diameter_nm"]):
-            receptor_count = int(population["receptor_count"][ev_index])
-            receptor_body = population["receptor_points"][ev_index, :receptor_count, :]
-            per_ev.append(simulate_one(layouts[name], linker_models, receptor_body, float(diameter), rng))
+        per_ev = simulate_population(layouts[name], linker_models, population, rng)
         rows.append(
             {
                 "layout": name,
@@ -228,26 +226,82 @@ def plot_layouts(layouts: dict[str, list[Anchor]], names: list[str]) -> None:
     plt.close(fig)
 
 
-def main() -> None:
-    rng = np.random.default_rng(RNG_SEED)
-    population = ensure_population()
-    linker_models = load_linker_models()
-    layouts = candidate_layouts(rng)
-    score_rows = []
-    for i, (name, anchors) in enumerate(layouts.items()):
+def score_candidates(
+    layouts: dict[str, list[Anchor]], names: list[str], population, linker_models
+) -> list[dict[str, str]]:
+    # Seeds follow each layout's position in the full candidate list, so a
+    # layout scores the same whichever subset is simulated.
+    index = {name: i for i, name in enumerate(layouts)}
+    rows = []
+    for name in names:
         metrics = evaluate_layout(
-            anchors,
+            layouts[name],
             linker_models,
             population,
-            np.random.default_rng(RNG_SEED + i),
+            np.random.default_rng(RNG_SEED + index[name]),
         )
-        score_rows.append(
+        rows.append(
             {
                 "layout": name,
-                "aptamer_count": str(len(anchors)),
+                "aptamer_count": str(len(layouts[name])),
                 **{key: f"{value:.5f}" for key, value in metrics.items()},
             }
         )
+    return rows
+
+
+def score_with_surrogate(
+    layouts: dict[str, list[Anchor]], population, linker_models, fraction: float
+) -> tuple[list[dict[str, str]], dict[str, object]]:
+    random_names = [name for name in layouts if name.startswith("random_")]
+    warmup = [name for name in layouts if name not in random_names] + random_names[::SURROGATE_WARMUP_STRIDE]
+    rows = score_candidates(layouts, warmup, population, linker_models)
+    scored = {row["layout"]: (layouts[row["layout"]], float(row["capture_probability"])) for row in rows}
+    remaining = {name: layouts[name] for name in layouts if name not in scored}
+    kept, predictions = preselect(remaining, scored, fraction)
+    promoted = score_candidates(layouts, kept, population, linker_models)
+    observed = {row["layout"]: float(row["capture_probability"]) for row in promoted}
+    report = {
+        "model": "Gaussian process on rotation-invariant layout descriptors",
+        "target": "capture_probability",
+        "warmup_simulated": len(warmup),
+        "candidates_ranked": len(remaining),
+        "candidates_simulated": len(kept),
+        "simulator_calls_saved": len(remaining) - len(kept),
+        "accuracy_on_simulated": surrogate_accuracy(predictions, observed),
+    }
+    return rows + promoted, report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--surrogate-fraction",
+        type=float,
+        default=None,
+        help="simulate only this fraction of the non-warm-up random nets, picked by a layout surrogate",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(RNG_SEED)
+    population = ensure_population()
+    linker_models = load_linker_models()
+    layouts = candidate_layouts(rng)
+    surrogate_report = None
+    if args.surrogate_fraction is None:
+        score_rows = score_candidates(layouts, list(layouts), population, linker_models)
+    else:
+        score_rows, surrogate_report = score_with_surrogate(
+            layouts, population, linker_models, args.surrogate_fraction
+        )
+        print(
+            f"Surrogate: simulated {surrogate_report['candidates_simulated']}/"
+            f"{surrogate_report['candidates_ranked']} ranked candidates",
+            flush=True,
+        )
     score_rows.sort(key=lambda row: float(row["capture_probability"]), reverse=True)
     with open(OUT_CANDIDATES_CSV, "w", newline="", encoding="ascii") as f:
         writer = csv.DictWriter(f, fieldnames=list(score_rows[0].keys()))
@@ -266,7 +320,7 @@ def main() -> None:
         "model": "aggressive high-capture aptamer net search",
         "target_capture_probability": 0.90,
         "rng_seed": RNG_SEED,
-        "population_file": POPULATION_FILE.name,
+        "population_file": POPULATION_STORE.name,
         "layouts_tested": len(layouts),
         "best_snapshot_layout": score_rows[0],
         "best_dynamic_layout": dynamic_rows[0],
@@ -285,6 +339,9 @@ def main() -> None:
             "If dynamic validation remains below 90%, a single tile is probably not enough under sparse clinical EV assumptions.",
         ],
     }
+    if surrogate_report is not None:
+        summary["layouts_tested"] = len(score_rows)
+        summary["surrogate"] = surrogate_report
     OUT_SUMMARY_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
     print(f"Wrote {OUT_CANDIDATES_CSV.name}")
     print(f"Wrote {OUT_DYNAMIC_CSV.name}")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Cheap surrogate scores for aptamer layouts, learned from simulator results.
+
+Beginner picture:
+Every layout the simulator has already scored is a worked example. Each layout
+is boiled down to a few numbers that do not change when the tile is rotated:
+how many anchors it has, how far apart neighbours sit, how anchors spread out
+from the centre, and how much area the layout covers. A Gaussian process then
+learns "descriptors -> score" from the examples. It predicts a score for a
+new layout together with its uncertainty, so only the most promising
+candidates have to go through the real simulator.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Union
+
+import numpy as np
+
+Anchor = dict[str, Union[float, str]]
+
+NEIGHBOR_SPACING_BINS_NM = (0.0, 4.0, 8.0, 12.0, 16.0, 24.0, math.inf)
+RADIAL_BINS_NM = (0.0, 10.0, 20.0, 30.0, math.inf)
+LENGTH_SCALE_FACTORS = (0.5, 1.0, 2.0, 4.0)
+NOISE_VARIANCES = (1e-3, 1e-2, 1e-1)
+
+
+def convex_hull_area(xy: np.ndarray) -> float:
+    """Area of the convex hull of 2D points (monotone chain plus shoelace)."""
+    points = sorted(set(map(tuple, np.asarray(xy, dtype=float).tolist())))
+    if len(points) < 3:
+        return 0.0
+
+    def cross(o, a, b) -> float:
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower: list[tuple[float, float]] = []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper: list[tuple[float, float]] = []
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    hull = np.asarray(lower[:-1] + upper[:-1])
+    x, y = hull[:, 0], hull[:, 1]
+    return float(0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+
+
+def layout_descriptors(anchors: list[Anchor]) -> np.ndarray:
+    """Rotation-invariant feature vector of one layout.
+
+    Anchor count, nearest-neighbour spacing histogram and mean, radial
+    density profile about the centroid, radius of gyration and convex hull
+    area (in 1000 nm^2).
+    """
+    xy = np.asarray([[float(a["x_nm"]), float(a["y_nm"])] for a in anchors], dtype=float).reshape(-1, 2)
+    count = len(xy)
+    if count > 1:
+        gaps = np.linalg.norm(xy[:, None, :] - xy[None, :, :], axis=-1)
+        np.fill_diagonal(gaps, np.inf)
+        nearest = gaps.min(axis=1)
+    else:
+        nearest = np.zeros(count)
+    spacing = np.histogram(nearest, bins=NEIGHBOR_SPACING_BINS_NM)[0] / max(count, 1)
+    radii = np.linalg.norm(xy - xy.mean(axis=0), axis=1) if count else np.zeros(0)
+    radial = np.histogram(radii, bins=RADIAL_BINS_NM)[0] / max(count, 1)
+    return np.concatenate(
+        (
+            [float(count), float(np.mean(nearest)) if count else 0.0],
+            spacing,
+            radial,
+            [
+                float(np.sqrt(np.mean(radii**2))) if count else 0.0,
+                convex_hull_area(xy) / 1000.0,
+            ],
+        )
+    )
+
+
+def squared_exponential(a: np.ndarray, b: np.ndarray, length_scale: float) -> np.ndarray:
+    sq = np.sum(a * a, axis=1)[:, None] + np.sum(b * b, axis=1)[None, :] - 2.0 * a @ b.T
+    return np.exp(-0.5 * np.clip(sq, 0.0, None) / length_scale**2)
+
+
+@dataclass(frozen=True)
+class GaussianProcessSurrogate:
+    """Squared-exponential Gaussian process fitted on standardized descriptors.
+
+    ``fit`` picks the length scale and noise level from a small grid by log
+    marginal likelihood.
+    """
+
+    x_train: np.ndarray = field(repr=False)
+    alpha: np.ndarray = field(repr=False)
+    cholesky: np.ndarray = field(repr=False)
+    x_mean: np.ndarray = field(repr=False)
+    x_scale: np.ndarray = field(repr=False)
+    y_mean: float
+    y_scale: float
+    length_scale: float
+    noise_variance: float
+
+    @classmethod
+    def fit(cls, features: np.ndarray, targets: np.ndarray) -> GaussianProcessSurrogate:
+        x = np.asarray(features, dtype=float)
+        y = np.asarray(targets, dtype=float)
+        if len(x) < 2:
+            raise ValueError(f"Need at least two scored layouts to fit a surrogate, got {len(x)}")
+        x_mean = x.mean(axis=0)
+        x_scale = x.std(axis=0)
+        x_scale = np.where(x_scale > 0.0, x_scale, 1.0)
+        y_mean = float(y.mean())
+        y_scale = float(y.std()) or 1.0
+        x_train = (x - x_mean) / x_scale
+        z = (y - y_mean) / y_scale
+
+        best = None
+        base = math.sqrt(x.shape[1])
+        for factor in LENGTH_SCALE_FACTORS:
+            kernel = squared_exponential(x_train, x_train, factor * base)
+            for noise in NOISE_VARIANCES:
+                try:
+                    chol = np.linalg.cholesky(kernel + noise * np.eye(len(z)))
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, z))
+                log_likelihood = -0.5 * z @ alpha - np.sum(np.log(np.diag(chol)))
+                if best is None or log_likelihood > best[0]:
+                    best = (log_likelihood, factor * base, noise, chol, alpha)
+        if best is None:
+            raise ValueError("Surrogate kernel matrix is not positive definite for any grid setting")
+        _, length_scale, noise, chol, alpha = best
+        return cls(x_train, alpha, chol, x_mean, x_scale, y_mean, y_scale, length_scale, noise)
+
+    def predict(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Predictive mean and standard deviation of a new simulator score, in score units."""
+        x = (np.atleast_2d(np.asarray(features, dtype=float)) - self.x_mean) / self.x_scale
+        cross = squared_exponential(x, self.x_train, self.length_scale)
+        mean = cross @ self.alpha
+        v = np.linalg.solve(self.cholesky, cross.T)
+        variance = np.clip(1.0 - np.sum(v * v, axis=0), 0.0, None) + self.noise_variance
+        return mean * self.y_scale + self.y_mean, np.sqrt(variance) * self.y_scale
+
+
+def rank_correlation(predicted: np.ndarray, observed: np.ndarray) -> float | None:
+    if len(predicted) < 3:
+        return None
+    predicted_ranks = np.argsort(np.argsort(predicted)).astype(float)
+    observed_ranks = np.argsort(np.argsort(observed)).astype(float)
+    if np.ptp(predicted_ranks) == 0 or np.ptp(observed_ranks) == 0:
+        return None
+    return float(np.corrcoef(predicted_ranks, observed_ranks)[0, 1])
+
+
+def preselect(
+    candidates: dict[str, list[Anchor]],
+    scored: dict[str, tuple[list[Anchor], float]],
+    fraction: float,
+    exploration: float = 0.5,
+) -> tuple[list[str], dict[str, tuple[float, float]]]:
+    """Pick the top ``fraction`` of ``candidates`` by surrogate mean + ``exploration`` x sd.
+
+    ``scored`` maps already simulated layouts to ``(anchors, score)``. Returns
+    the kept names (in candidate order) and every candidate's ``(mean, sd)``.
+    """
+    if not 0.0 < fraction <= 1.0:
+        raise ValueError(f"Surrogate fraction must be in (0, 1], got {fraction}")
+    names = list(candidates)
+    n_keep = max(1, int(math.ceil(fraction * len(names))))
+    surrogate = GaussianProcessSurrogate.fit(
+        np.asarray([layout_descriptors(anchors) for anchors, _ in scored.values()]),
+        np.asarray([score for _, score in scored.values()]),
+    )
+    mean, sd = surrogate.predict(np.asarray([layout_descriptors(candidates[name]) for name in names]))
+    order = np.argsort(-(mean + exploration * sd), kind="stable")[:n_keep]
+    kept = set(order.tolist())
+    predictions = {name: (float(mean[i]), float(sd[i])) for i, name in enumerate(names)}
+    return [name for i, name in enumerate(names) if i in kept], predictions
+
+
+def surrogate_accuracy(
+    predictions: dict[str, tuple[float, float]], observed: dict[str, float]
+) -> dict[str, float | None]:
+    """How well surrogate predictions matched the simulator on the layouts it let through."""
+    names = [name for name in observed if name in predictions]
+    if not names:
+        return {"compared_layouts": 0, "rank_correlation": None, "rmse": None, "coverage_2sd": None}
+    mean = np.asarray([predictions[name][0] for name in names])
+    sd = np.asarray([predictions[name][1] for name in names])
+    truth = np.asarray([observed[name] for name in names])
+    correlation = rank_correlation(mean, truth)
+    return {
+        "compared_layouts": len(names),
+        "rank_correlation": None if correlation is None else round(correlation, 4),
+        "rmse": round(float(np.sqrt(np.mean((mean - truth) ** 2))), 5),
+        "coverage_2sd": round(float(np.mean(np.abs(mean - truth) <= 2.0 * sd)), 4),
+    }
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Multi-fidelity layout search: cheap screen, static Monte Carlo, Brownian dynamics, stress test.
+
+Beginner picture:
+The earlier scripts each ran one tier and handed a fixed top N to the next
+through CSV files. Here one driver owns all four tiers. Every candidate gets
+the cheap screen; after that, each step spends CPU time on whichever
+(candidate, next tier) promotion has the largest expected improvement per
+second, until the CPU budget is used up or nothing is still worth checking.
+
+Tiers, cheapest first, all scored as a capture probability:
+  screen    static population scorer on the first ``SCREEN_EVS`` EVs
+  static    static population scorer on the whole run population
+  dynamics  Brownian capture of the whole run population
+  stress    Brownian capture across a few drawn uncertain-condition scenarios
+
+Expected improvement for promoting a candidate to tier k uses a linear map
+from its tier k-1 score to tier k, fitted online on candidates that already
+have both. Until a tier has ``MIN_TIER_EVALUATIONS`` results it is filled
+with the best candidates of the tier below.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+import robustness_sensitivity_screen as stress
+from clinical_layouts import clinical_candidate_layouts
+from ev_population_generator import population_head, receptor_points
+from high_capture_pattern_search import candidate_layouts, ensure_population
+from optimize_population_layouts import evaluate_layout
+from score_ev_capture_geometry import load_linker_models
+from validate_population_dynamics import simulate_population
+
+ROOT = Path(__file__).resolve().parent
+OUT_CANDIDATES_CSV = ROOT / "multifidelity_search_candidates.csv"
+OUT_PROMOTIONS_CSV = ROOT / "multifidelity_search_promotions.csv"
+OUT_SUMMARY_JSON = ROOT / "multifidelity_search_summary.json"
+
+RNG_SEED = 20260701
+LINKER = "polyT30"
+SCREEN_EVS = 40
+CPU_BUDGET_SECONDS = 900.0
+MIN_TIER_EVALUATIONS = 3
+PRIOR_PREDICTIVE_SD = 0.15
+MIN_PREDICTIVE_SD = 0.02
+EXPECTED_IMPROVEMENT_TOLERANCE = 0.0005
+STRESS_SCENARIOS = 6
+STRESS_EVS_PER_SCENARIO = 24
+TOP_REPORTED = 10
+
+Anchor = dict[str, Union[float, str]]
+
+
+@dataclass(frozen=True)
+class Tier:
+    """One fidelity level: ``evaluate(anchors, rng)`` returns a capture probability."""
+
+    name: str
+    description: str
+    evaluate: Callable[[list[Anchor], np.random.Generator], float]
+
+
+def search_candidates(rng: np.random.Generator) -> dict[str, list[Anchor]]:
+    layouts = candidate_layouts(rng)
+    layouts.update(clinical_candidate_layouts(LINKER))
+    return layouts
+
+
+def stress_cases(rng: np.random.Generator) -> list[tuple[dict[str, float], list[tuple[float, np.ndarray]]]]:
+    """Uncertain-condition scenarios and their EVs, drawn once and shared by every candidate."""
+    cases = []
+    for _ in range(STRESS_SCENARIOS):
+        scenario = stress.draw_scenario(rng)
+        evs = []
+        for _ in range(STRESS_EVS_PER_SCENARIO):
+            diameter = float(np.clip(rng.normal(scenario["mean_diameter_nm"], 12.0), 45.0, 115.0))
+            count = stress.sample_receptor_count(scenario["mean_receptors"], rng)
+            pattern = str(rng.choice(stress.PATTERNS, p=stress.PATTERN_PROBABILITIES))
+            evs.append((diameter, receptor_points(pattern, count, diameter / 2.0, rng)))
+        cases.append((scenario, evs))
+    return cases
+
+
+def build_tiers(population, linker_models, screen_evs: int, cases) -> list[Tier]:
+    screen_population = population_head(population, screen_evs)
+
+    def screen(anchors: list[Anchor], rng: np.random.Generator) -> float:
+        return evaluate_layout(anchors, linker_models, screen_population, rng)["capture_probability"]
+
+    def static(anchors: list[Anchor], rng: np.random.Generator) -> float:
+        return evaluate_layout(anchors, linker_models, population, rng)["capture_probability"]
+
+    def dynamics(anchors: list[Anchor], rng: np.random.Generator) -> float:
+        per_ev = simulate_population(anchors, linker_models, population, rng)
+        return float(np.mean([row["ever_captured"] for row in per_ev]))
+
+    def stress_test(anchors: list[Anchor], rng: np.random.Generator) -> float:
+        captures = []
+        for scenario, evs in cases:
+            active = rng.random(len(anchors)) < scenario["active_aptamer_fraction"]
+            if not np.any(active):
+                active[rng.integers(0, len(anchors))] = True
+            anchor_xyz = np.asarray(
+                [[float(a["x_nm"]), float(a["y_nm"]), 0.0] for a, keep in zip(anchors, active) if keep]
+            )
+            captures.append(float(np.mean(stress.simulate_evs(anchor_xyz, evs, scenario, linker_models, rng))))
+        return float(np.mean(captures))
+
+    return [
+        Tier("screen", f"static population scorer, first {screen_evs} EVs", screen),
+        Tier("static", f"static population scorer, all {len(population['diameter_nm'])} EVs", static),
+        Tier("dynamics", "Brownian capture of the run population", dynamics),
+        Tier("stress", f"Brownian capture over {len(cases)} uncertain-condition scenarios", stress_test),
+    ]
+
+
+def expected_improvement(mean: float, sd: float, incumbent: float) -> float:
+    z = (mean - incumbent) / sd
+    cdf = 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+    pdf = math.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+    return (mean - incumbent) * cdf + sd * pdf
+
+
+def tier_predictor(lower: dict[str, float], upper: dict[str, float]) -> Callable[[float], tuple[float, float]]:
+    """Predict a tier score and its spread from the tier below, fitted on candidates with both."""
+    shared = [name for name in upper if name in lower]
+    x = np.asarray([lower[name] for name in shared])
+    y = np.asarray([upper[name] for name in shared])
+    if len(shared) < 3 or np.ptp(x) == 0.0:
+        return lambda score: (score, PRIOR_PREDICTIVE_SD)
+    slope, intercept = np.polyfit(x, y, 1)
+    residual_sd = math.sqrt(float(np.sum((y - (slope * x + intercept)) ** 2)) / (len(shared) - 2))
+    sd = max(residual_sd, MIN_PREDICTIVE_SD)
+    return lambda score: (float(slope * score + intercept), sd)
+
+
+def run_search(
+    layouts: dict[str, list[Anchor]], tiers: list[Tier], budget_seconds: float
+) -> tuple[list[dict[str, float]], list[dict[str, str]], dict[str, dict[str, float]]]:
+    names = list(layouts)
+    index = {name: i for i, name in enumerate(names)}
+    scores: list[dict[str, float]] = [{} for _ in tiers]
+    seconds: list[list[float]] = [[] for _ in tiers]
+    log: list[dict[str, str]] = []
+    spent = 0.0
+    stop_reason = "no candidates left to promote"
+
+    def evaluate(tier_index: int, name: str, predicted: tuple[float, float] | None, gain: float | None) -> None:
+        nonlocal spent
+        rng = np.random.default_rng([RNG_SEED, tier_index, index[name]])
+        start = time.process_time()
+        score = tiers[tier_index].evaluate(layouts[name], rng)
+        cost = time.process_time() - start
+        spent += cost
+        scores[tier_index][name] = score
+        seconds[tier_index].append(cost)
+        log.append(
+            {
+                "step": str(len(log) + 1),
+                "layout": name,
+                "tier": tiers[tier_index].name,
+                "predicted_capture": "" if predicted is None else f"{predicted[0]:.4f}",
+                "predicted_sd": "" if predicted is None else f"{predicted[1]:.4f}",
+                "expected_improvement": "" if gain is None or math.isinf(gain) else f"{gain:.5f}",
+                "observed_capture": f"{score:.4f}",
+                "cpu_seconds": f"{cost:.3f}",
+                "cpu_seconds_total": f"{spent:.3f}",
+            }
+        )
+        if tier_index > 0:
+            print(f"{tiers[tier_index].name:>8} {name}: {score:.4f} ({spent:.0f}/{budget_seconds:.0f} s)", flush=True)
+
+    # Everyone gets the cheap screen, even if it alone exceeds the budget.
+    for name in names:
+        evaluate(0, name, None, None)
+
+    while True:
+        stop_reason = "no candidates left to promote"
+        best: tuple[float, int, str, tuple[float, float], float] | None = None
+        for tier_index in range(1, len(tiers)):
+            lower, upper = scores[tier_index - 1], scores[tier_index]
+            waiting = sorted((name for name in lower if name not in upper), key=lambda n: -lower[n])
+            if not waiting:
+                continue
+            predict = tier_predictor(lower, upper)
+            # Until a tier has been timed, assume it costs what the tier below did.
+            cost = float(np.mean(seconds[tier_index] or seconds[tier_index - 1]))
+            if len(upper) < MIN_TIER_EVALUATIONS:
+                # Warm-up: fill the tier with the best of the tier below first.
+                candidates = [(math.inf, waiting[0])]
+            else:
+                incumbent = max(upper.values())
+                candidates = [(expected_improvement(*predict(lower[n]), incumbent), n) for n in waiting]
+            for gain, name in candidates:
+                if not math.isinf(gain) and gain < EXPECTED_IMPROVEMENT_TOLERANCE:
+                    if stop_reason != "cpu budget":
+                        stop_reason = "expected improvement below tolerance"
+                    continue
+                if spent + cost > budget_seconds:
+                    stop_reason = "cpu budget"
+                    continue
+                value = gain / max(cost, 1e-6)
+                if best is None or value > best[0]:
+                    best = (value, tier_index, name, predict(lower[name]), gain)
+        if best is None:
+            break
+        _, tier_index, name, predicted, gain = best
+        evaluate(tier_index, name, predicted, gain)
+
+    timing = {
+        tier.name: {
+            "evaluations": len(seconds[i]),
+            "cpu_seconds": round(float(np.sum(seconds[i])), 3),
+            "mean_cpu_seconds": round(float(np.mean(seconds[i])), 4) if seconds[i] else None,
+        }
+        for i, tier in enumerate(tiers)
+    }
+    timing["stop_reason"] = stop_reason
+    return scores, log, timing
+
+
+def candidate_rows(
+    layouts: dict[str, list[Anchor]], tiers: list[Tier], scores: list[dict[str, float]]
+) -> list[dict[str, str]]:
+    rows = []
+    for name, anchors in layouts.items():
+        reached = max(i for i, tier_scores in enumerate(scores) if name in tier_scores)
+        rows.append(
+            {
+                "layout": name,
+                "aptamer_count": str(len(anchors)),
+                "highest_tier": tiers[reached].name,
+                **{
+                    f"{tier.name}_capture": f"{scores[i][name]:.4f}" if name in scores[i] else ""
+                    for i, tier in enumerate(tiers)
+                },
+            }
+        )
+    # Deepest-validated first, then by the score at that depth.
+    depth = {tier.name: i for i, tier in enumerate(tiers)}
+    return sorted(
+        rows,
+        key=lambda row: (depth[row["highest_tier"]], float(row[f"{row['highest_tier']}_capture"])),
+        reverse=True,
+    )
+
+
+def write_csv(path: Path, rows: list[dict[str, str]]) -> None:
+    with open(path, "w", newline="", encoding="ascii") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--budget-seconds", type=float, default=CPU_BUDGET_SECONDS, help="CPU-time budget for the whole search"
+    )
+    parser.add_argument("--screen-evs", type=int, default=SCREEN_EVS, help="population EVs used by the screen tier")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(RNG_SEED)
+    population = ensure_population()
+    linker_models = load_linker_models()
+    layouts = search_candidates(rng)
+    tiers = build_tiers(population, linker_models, args.screen_evs, stress_cases(rng))
+
+    scores, log, timing = run_search(layouts, tiers, args.budget_seconds)
+    stop_reason = timing.pop("stop_reason")
+    rows = candidate_rows(layouts, tiers, scores)
+    write_csv(OUT_CANDIDATES_CSV, rows)
+    write_csv(OUT_PROMOTIONS_CSV, log)
+
+    summary = {
+        "model": "multi-fidelity layout search promoted by expected improvement per CPU second",
+        "rng_seed": RNG_SEED,
+        "cpu_budget_seconds": args.budget_seconds,
+        "cpu_seconds_used": round(sum(tier["cpu_seconds"] for tier in timing.values()), 3),
+        "stop_reason": stop_reason,
+        "candidates": len(layouts),
+        "tiers": [{"name": tier.name, "description": tier.description} for tier in tiers],
+        "tier_timing": timing,
+        "promotion_rule": {
+            "warm_up_evaluations_per_tier": MIN_TIER_EVALUATIONS,
+            "prior_predictive_sd": PRIOR_PREDICTIVE_SD,
+            "min_predictive_sd": MIN_PREDICTIVE_SD,
+            "expected_improvement_tolerance": EXPECTED_IMPROVEMENT_TOLERANCE,
+        },
+        "best_layout": rows[0],
+        "top_layouts": rows[:TOP_REPORTED],
+        "outputs": {"candidates": OUT_CANDIDATES_CSV.name, "promotion_log": OUT_PROMOTIONS_CSV.name},
+    }
+    OUT_SUMMARY_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
+    print(f"Wrote {OUT_CANDIDATES_CSV.name}")
+    print(f"Wrote {OUT_PROMOTIONS_CSV.name}")
+    print(f"Wrote {OUT_SUMMARY_JSON.name}")
+    best = rows[0]
+    print(
+        f"Best layout: {best['layout']} reached {best['highest_tier']} "
+        f"capture={best[best['highest_tier'] + '_capture']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,16 @@ This script asks a better question:
 
 That is like moving a hook from one pegboard hole to the next hole so the hook
 faces the right way, while keeping the same overall broad-grid shape.
+
+By default aptamers pick their site one after another, so early aptamers can
+take the sites later ones wanted. With ``--assignment global`` every aptamer
+of a layout is placed in one minimum-cost assignment, where the cost of a
+site is its squared shift minus a weighted up score.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 import math
@@ -25,11 +31,12 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from lattice_site_index import LatticeSiteIndex, assign_sites_globally
 from score_ev_capture_geometry import load_linker_models
 from score_lattice_orientation import (
     GOOD_UP_SCORE,
+    orient_anchors,
     orientation_metrics,
-    oriented_linker_models,
     sparse_score_average,
 )
 
@@ -43,6 +50,9 @@ OUT_PLOT = ROOT / "orientation_optimized_layouts.png"
 
 MAX_SHIFT_FROM_ORIGINAL_NM = 4.0
 SHIFT_PENALTY = 0.08
+# Global assignment cost is shift^2 - weight * up_score. At this weight up score
+# dominates inside the shift radius, as in choose_site; shift settles the rest.
+ASSIGNMENT_UP_SCORE_WEIGHT = 64.0
 
 Anchor = dict[str, float | str]
 
@@ -69,8 +79,7 @@ def read_original_mapped_rows() -> dict[str, list[dict[str, str]]]:
     return dict(rows_by_layout)
 
 
-def candidate_score(site: dict[str, float | int], original_x: float, original_y: float) -> tuple[float, float]:
-    shift = math.hypot(float(site["x_nm"]) - original_x, float(site["y_nm"]) - original_y)
+def site_up_score(site: dict[str, float | int]) -> float:
     probe: Anchor = {
         "x_nm": float(site["x_nm"]),
         "y_nm": float(site["y_nm"]),
@@ -80,32 +89,31 @@ def candidate_score(site: dict[str, float | int], original_x: float, original_y:
         "linker_reach_nm": 15.0,
         "linker_construct": "polyT30",
     }
-    up_score = float(orientation_metrics(probe)["up_score"])
-    return up_score - SHIFT_PENALTY * shift, shift
+    return float(orientation_metrics(probe)["up_score"])
+
+
+def candidate_score(site: dict[str, float | int], original_x: float, original_y: float) -> tuple[float, float]:
+    shift = math.hypot(float(site["x_nm"]) - original_x, float(site["y_nm"]) - original_y)
+    return site_up_score(site) - SHIFT_PENALTY * shift, shift
+
+
+def assignment_cost(site: dict[str, float | int], shift: float) -> float:
+    return shift**2 - ASSIGNMENT_UP_SCORE_WEIGHT * site_up_score(site)
 
 
 def choose_site(
     original_x: float,
     original_y: float,
-    sites: list[dict[str, float | int]],
-    used_site_ids: set[int],
+    index: LatticeSiteIndex,
 ) -> tuple[dict[str, float | int], float]:
     candidates = []
-    for site in sites:
-        if int(site["site_id"]) in used_site_ids:
-            continue
+    for site in index.within(original_x, original_y, MAX_SHIFT_FROM_ORIGINAL_NM):
         shift = math.hypot(float(site["x_nm"]) - original_x, float(site["y_nm"]) - original_y)
-        if shift <= MAX_SHIFT_FROM_ORIGINAL_NM:
-            score, _ = candidate_score(site, original_x, original_y)
-            candidates.append((score, -shift, site, shift))
+        score, _ = candidate_score(site, original_x, original_y)
+        candidates.append((score, -shift, site, shift))
 
     if not candidates:
-        available = [site for site in sites if int(site["site_id"]) not in used_site_ids]
-        site = min(
-            available,
-            key=lambda item: (float(item["x_nm"]) - original_x) ** 2
-            + (float(item["y_nm"]) - original_y) ** 2,
-        )
+        site = index.nearest(original_x, original_y)
         shift = math.hypot(float(site["x_nm"]) - original_x, float(site["y_nm"]) - original_y)
         return site, shift
 
@@ -117,18 +125,27 @@ def optimize_layout(
     layout_name: str,
     rows: list[dict[str, str]],
     sites: list[dict[str, float | int]],
+    global_assignment: bool = False,
 ) -> tuple[list[Anchor], list[dict[str, str]]]:
-    used_site_ids: set[int] = set()
+    index = LatticeSiteIndex(sites)
     anchors: list[Anchor] = []
     out_rows: list[dict[str, str]] = []
+    rows = sorted(rows, key=lambda item: int(item["anchor_id"]))
+    if global_assignment:
+        points = [(float(row["original_x_nm"]), float(row["original_y_nm"])) for row in rows]
+        assigned = assign_sites_globally(points, index, MAX_SHIFT_FROM_ORIGINAL_NM, assignment_cost)
 
-    for row in sorted(rows, key=lambda item: int(item["anchor_id"])):
+    for position, row in enumerate(rows):
         original_x = float(row["original_x_nm"])
         original_y = float(row["original_y_nm"])
         old_x = float(row["snapped_x_nm"])
         old_y = float(row["snapped_y_nm"])
-        site, shift = choose_site(original_x, original_y, sites, used_site_ids)
-        used_site_ids.add(int(site["site_id"]))
+        if global_assignment:
+            site = assigned[position]
+            shift = math.hypot(float(site["x_nm"]) - original_x, float(site["y_nm"]) - original_y)
+        else:
+            site, shift = choose_site(original_x, original_y, index)
+            index.take(site)
         anchor: Anchor = {
             "x_nm": float(site["x_nm"]),
             "y_nm": float(site["y_nm"]),
@@ -200,7 +217,19 @@ def plot_layouts(rows: list[dict[str, str]]) -> None:
     plt.close(fig)
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--assignment",
+        choices=("greedy", "global"),
+        default="greedy",
+        help="choose sites one aptamer at a time (greedy) or as one minimum-cost assignment (global)",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     sites = read_sites()
     source = read_original_mapped_rows()
     base_models = load_linker_models()
@@ -208,10 +237,10 @@ def main() -> None:
     summary_rows: list[dict[str, str]] = []
 
     for layout_name, rows in source.items():
-        anchors, layout_rows = optimize_layout(layout_name, rows, sites)
+        anchors, layout_rows = optimize_layout(layout_name, rows, sites, args.assignment == "global")
         all_layout_rows.extend(layout_rows)
-        oriented, models, anchor_scores = oriented_linker_models(anchors, base_models, layout_name)
-        score = sparse_score_average(oriented, models)
+        oriented, _ = orient_anchors(anchors, layout_name)
+        score = sparse_score_average(oriented, base_models)
 
         up_count = sum(row["orientation_class"] == "up_facing" for row in layout_rows)
         side_count = sum(row["orientation_class"] == "side_facing" for row in layout_rows)
@@ -274,6 +303,10 @@ def main() -> None:
             "optimized_layout_plot": OUT_PLOT.name,
         },
     }
+    if args.assignment == "global":
+        report["settings"]["assignment"] = "one minimum-cost assignment per layout"
+        report["settings"]["assignment_cost"] = "shift_nm^2 - up_score_weight * up_score"
+        report["settings"]["up_score_weight"] = ASSIGNMENT_UP_SCORE_WEIGHT
     OUT_JSON.write_text(json.dumps(report, indent=2) + "\n", encoding="ascii")
 
     best = summary_rows[0]
@@ -5,13 +5,42 @@ Beginner picture:
 We make one shared test set of EVs. Then every layout tries to catch those same
 EVs. The best layout is the one that catches the most EVs across the whole mix,
 not just one perfect vesicle.
+
+With ``--workers`` the search runs in cached mode. Each layout is scored once
+from a seed derived from its own anchor set. Scores are kept in a JSON-lines
+fitness cache keyed by layout, linker curves, population and scoring settings,
+so surviving parents are never re-scored and restarted or longer runs reuse
+earlier work. Cache misses are scored on a process pool.
+
+With ``--crn`` every layout is scored from the same seed (common random
+numbers), so two layouts differ only where their anchors differ, not in the
+binding-trial noise. The summary then reports how much that shrinks the
+variance of paired score differences among the top layouts.
+
+With ``--surrogate-fraction`` a Gaussian-process surrogate, refitted each
+generation on every layout scored so far, pre-ranks the new mutants and only
+that fraction of them reaches the simulator.
+
+With ``--min-buildability`` each generation's mutants are first scored for
+DNA-origami buildability in one batched call, and those below the floor are
+dropped before any simulation.
+
+With ``--local-search-steps`` the best layout is then hill-climbed with
+single-anchor moves. Reach probabilities are cached per anchor, so each move
+recomputes only the anchor it changed. The refined layout is re-scored on a
+fresh seed and written to the layout CSV after the top 10.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
+import hashlib
+import inspect
 import json
 import math
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Union
 
@@ -21,9 +50,18 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bipartite_matching import batch_max_bipartite_matches
 from clinical_layouts import clinical_candidate_layouts, grid_layout
-from ev_population_generator import generate_population
-from score_ev_capture_geometry import load_layouts, load_linker_models, reach_probability
+from ev_population_generator import ensure_population_store
+from layout_surrogate import preselect, surrogate_accuracy
+from ragged_receptors import population_receptors
+from score_ev_capture_geometry import (
+    anchor_reach_probabilities,
+    load_layouts,
+    load_linker_models,
+    paired_variance_reduction,
+)
+from score_origami_buildability import batch_buildability_metrics, pad_layouts
 
 ROOT = Path(__file__).resolve().parent
 OUT_LAYOUTS_CSV = ROOT / "population_optimized_layouts.csv"
@@ -31,6 +69,8 @@ OUT_SCORES_CSV = ROOT / "population_layout_scores.csv"
 OUT_SUMMARY_JSON = ROOT / "population_layout_optimization_summary.json"
 OUT_PLOT = ROOT / "population_layout_top_scores.png"
 OUT_LAYOUT_PNG = ROOT / "population_optimized_layouts.png"
+POPULATION_STORE = ROOT / "ev_population_optimization_run.popstore"
+FITNESS_CACHE = ROOT / "population_layout_fitness_cache.jsonl"
 
 RNG_SEED = 20260616
 LINKER = "polyT30"
@@ -50,6 +90,21 @@ LATERAL_OFFSETS_NM = (
     (0.0, 10.0),
 )
 SURFACE_CLEARANCE_NM = 2.0
+# population_score = weighted capture metrics minus the crowding penalty.
+SCORE_WEIGHTS = {
+    "capture": 0.45,
+    "strong": 0.20,
+    "contacts": 0.15,
+    "low_receptor_capture": 0.15,
+    "clustered_capture": 0.05,
+}
+CROWDING_DISTANCE_NM = 5.0
+CROWDING_PAIR_PENALTY = 0.004
+CROWDING_FREE_APTAMERS = 18
+CROWDING_EXTRA_APTAMER_PENALTY = 0.002
+MAX_CROWDING_PENALTY = 0.15
+CRN_REPLICATES = 8
+CRN_STUDY_LAYOUTS = 5
 
 Anchor = dict[str, Union[float, str]]
 
@@ -121,6 +176,27 @@ def mutate_layout(name: str, parent: list[Anchor], rng: np.random.Generator) ->
     return name, anchors
 
 
+def mutate_one_anchor(name: str, parent: list[Anchor], rng: np.random.Generator) -> tuple[str, list[Anchor]]:
+    """Move, remove or add a single anchor; every other anchor is left exactly in place."""
+    anchors = [dict(anchor) for anchor in parent]
+    move = rng.random()
+    if move < 0.20 and len(anchors) > MIN_APTAMERS:
+        del anchors[int(rng.integers(0, len(anchors)))]
+        return name, anchors
+    if move < 0.40 and len(anchors) < MAX_APTAMERS:
+        x, y = rng.normal(0.0, [18.0, 12.0])
+        anchors.append({"x_nm": x, "y_nm": y, "linker_reach_nm": 15.0, "linker_construct": LINKER})
+        changed = anchors[-1]
+    else:
+        changed = anchors[int(rng.integers(0, len(anchors)))]
+        dx, dy = rng.normal(0.0, [5.0, 3.5])
+        changed["x_nm"] = float(changed["x_nm"]) + dx
+        changed["y_nm"] = float(changed["y_nm"]) + dy
+    changed["x_nm"] = float(np.clip(changed["x_nm"], -45.0, 45.0))
+    changed["y_nm"] = float(np.clip(changed["y_nm"], -30.0, 30.0))
+    return name, anchors
+
+
 def seed_layouts(rng: np.random.Generator) -> dict[str, list[Anchor]]:
     layouts = {name: with_linker(anchors) for name, anchors in load_layouts().items()}
     layouts.update(clinical_candidate_layouts(LINKER))
@@ -134,112 +210,141 @@ def seed_layouts(rng: np.random.Generator) -> dict[str, list[Anchor]]:
     return layouts
 
 
-def max_bipartite_matches(edges: np.ndarray) -> int:
-    if edges.size == 0:
-        return 0
-    n_anchors, n_receptors = edges.shape
-    match_to_anchor = np.full(n_receptors, -1, dtype=int)
-    adjacency = [np.flatnonzero(edges[i]) for i in range(n_anchors)]
-
-    def assign(anchor_index: int, seen: np.ndarray) -> bool:
-        for receptor_index in adjacency[anchor_index]:
-            if seen[receptor_index]:
-                continue
-            seen[receptor_index] = True
-            if match_to_anchor[receptor_index] == -1 or assign(match_to_anchor[receptor_index], seen):
-                match_to_anchor[receptor_index] = anchor_index
-                return True
-        return False
-
-    matches = 0
-    for anchor_index in sorted(range(n_anchors), key=lambda i: len(adjacency[i])):
-        if assign(anchor_index, np.zeros(n_receptors, dtype=bool)):
-            matches += 1
-    return matches
-
-
 def layout_penalty(anchors: list[Anchor]) -> float:
     # A gentle crowding penalty. If many hooks sit almost on top of each other,
     # the score goes down slightly because real DNA/linkers occupy space.
     xy = np.asarray([[float(a["x_nm"]), float(a["y_nm"])] for a in anchors], dtype=float)
     if len(xy) < 2:
         return 0.0
-    close_pairs = 0
-    for i in range(len(xy)):
-        d = np.linalg.norm(xy[i + 1 :] - xy[i], axis=1)
-        close_pairs += int(np.sum(d < 5.0))
-    return min(0.15, 0.004 * close_pairs + 0.002 * max(0, len(xy) - 18))
+    d = np.linalg.norm(xy[None, :, :] - xy[:, None, :], axis=-1)
+    close_pairs = int(np.sum(np.triu(d < CROWDING_DISTANCE_NM, k=1)))
+    return min(
+        MAX_CROWDING_PENALTY,
+        CROWDING_PAIR_PENALTY * close_pairs
+        + CROWDING_EXTRA_APTAMER_PENALTY * max(0, len(xy) - CROWDING_FREE_APTAMERS),
+    )
+
+
+PopulationGeometry = list[tuple[int, np.ndarray, np.ndarray]]
+
+
+def population_geometry(population: dict[str, np.ndarray]) -> PopulationGeometry:
+    """Receptor positions at every lateral offset, one ``(count, ev_indices, points)`` entry per receptor count.
+
+    ``points`` has shape ``(n_evs, n_offsets, count, 3)``. It depends only on
+    the population, so it can be shared by every layout scored against it.
+    """
+    diameters = np.asarray(population["diameter_nm"], dtype=float)
+    offsets_xy = np.asarray(LATERAL_OFFSETS_NM, dtype=float)
+    geometry = []
+    for receptor_count, ev_indices, bodies in population_receptors(population).groups_by_count():
+        if receptor_count <= 0:
+            continue
+        centers = np.empty((len(ev_indices), len(offsets_xy), 3))
+        centers[:, :, :2] = offsets_xy
+        centers[:, :, 2] = (diameters[ev_indices] / 2.0 + SURFACE_CLEARANCE_NM)[:, None]
+        geometry.append((receptor_count, ev_indices, bodies[:, None, :, :] + centers[:, :, None, :]))
+    return geometry
+
+
+def layout_probabilities(anchors: list[Anchor], linker_models, geometry: PopulationGeometry) -> list[np.ndarray]:
+    """Reach probabilities per receptor-count group, each shaped ``(n_evs, n_offsets, n_anchors, count)``."""
+    anchor_xyz = anchor_array(anchors)
+    probabilities = []
+    for _, _, points in geometry:
+        distances = np.linalg.norm(anchor_xyz[:, None, :] - points[:, :, None, :, :], axis=-1)
+        probabilities.append(anchor_reach_probabilities(anchors, linker_models, distances))
+    return probabilities
 
 
 def evaluate_layout(
     anchors: list[Anchor],
     linker_models,
-    population: np.lib.npyio.NpzFile,
+    population: dict[str, np.ndarray],
     rng: np.random.Generator,
+    common_random_numbers: bool = False,
 ) -> dict[str, float]:
-    anchor_xyz = anchor_array(anchors)
-    diameters = population["diameter_nm"]
-    receptor_counts = population["receptor_count"]
-    receptor_points = population["receptor_points"]
-
-    capture_values = []
-    strong_values = []
-    mean_contacts = []
-    low_receptor_capture = []
-    clustered_capture = []
-    for ev_index, diameter in enumerate(diameters):
-        receptor_count = int(receptor_counts[ev_index])
-        if receptor_count <= 0:
-            continue
-        radius = float(diameter) / 2.0
-        receptors_body = receptor_points[ev_index, :receptor_count, :]
-        best_contacts = []
-        best_p1 = 0.0
-        best_p2 = 0.0
-        for offset_x, offset_y in LATERAL_OFFSETS_NM:
-            center = np.array([offset_x, offset_y, radius + SURFACE_CLEARANCE_NM])
-            receptors = receptors_body + center
-            distances = np.linalg.norm(anchor_xyz[:, None, :] - receptors[None, :, :], axis=2)
-            probabilities = np.zeros_like(distances)
-            for anchor_index, anchor in enumerate(anchors):
-                construct = str(anchor["linker_construct"])
-                probabilities[anchor_index, :] = [
-                    reach_probability(linker_models, construct, float(distance))
-                    for distance in distances[anchor_index, :]
-                ]
-            samples = [
-                max_bipartite_matches(rng.random(probabilities.shape) < probabilities)
-                for _ in range(N_BINDING_TRIALS)
-            ]
-            samples_arr = np.asarray(samples, dtype=float)
-            p1 = float(np.mean(samples_arr >= 1))
-            p2 = float(np.mean(samples_arr >= 2))
-            if p1 + 0.25 * p2 > best_p1 + 0.25 * best_p2:
-                best_p1 = p1
-                best_p2 = p2
-                best_contacts = samples
-        mean_contact = float(np.mean(best_contacts)) if best_contacts else 0.0
-        capture_values.append(best_p1)
-        strong_values.append(best_p2)
-        mean_contacts.append(mean_contact)
-        if receptor_count <= 3:
-            low_receptor_capture.append(best_p1)
-        pattern = str(population["pattern"][ev_index])
-        if "cluster" in pattern:
-            clustered_capture.append(best_p1)
+    geometry = population_geometry(population)
+    probabilities = layout_probabilities(anchors, linker_models, geometry)
+    return score_probabilities(anchors, population, geometry, probabilities, rng, common_random_numbers)
+
+
+def score_probabilities(
+    anchors: list[Anchor],
+    population: dict[str, np.ndarray],
+    geometry: PopulationGeometry,
+    probabilities: list[np.ndarray],
+    rng: np.random.Generator,
+    common_random_numbers: bool = False,
+) -> dict[str, float]:
+    # Every EV with the same receptor count is scored as one batch over all
+    # lateral offsets and binding trials. Random draws are taken in the order
+    # a per-EV, per-offset loop would use them, so scores do not depend on the
+    # grouping. With common random numbers each anchor instead draws from its
+    # own child of one seeded key, per group: an anchor gets the same uniforms
+    # in every layout scored from the same seed. The child is keyed by the
+    # anchor's ``crn_id`` (kept stable through local-search moves) or, without
+    # one, by its place in the list.
+    counts = population_receptors(population).counts
+    n_offsets = len(LATERAL_OFFSETS_NM)
+    n_anchors = len(anchors)
+    if common_random_numbers:
+        crn_key = int(rng.integers(2**63))
+        crn_ids = [int(anchor.get("crn_id", index)) for index, anchor in enumerate(anchors)]
+    else:
+        draws_per_ev = n_offsets * N_BINDING_TRIALS * n_anchors * counts
+        draw_start = np.concatenate(([0], np.cumsum(draws_per_ev)))
+        draws = rng.random(int(draw_start[-1]))
+
+    best_p1 = np.zeros(len(counts))
+    best_p2 = np.zeros(len(counts))
+    best_mean_contacts = np.zeros(len(counts))
+    for (receptor_count, ev_indices, _), group_probabilities in zip(geometry, probabilities):
+        if common_random_numbers:
+            trial_draws = np.empty((len(ev_indices), n_offsets, N_BINDING_TRIALS, n_anchors, receptor_count))
+            for column, crn_id in enumerate(crn_ids):
+                anchor_seed = np.random.SeedSequence(crn_key, spawn_key=(receptor_count, crn_id))
+                anchor_rng = np.random.default_rng(anchor_seed)
+                trial_draws[:, :, :, column] = anchor_rng.random(
+                    (len(ev_indices), n_offsets, N_BINDING_TRIALS, receptor_count)
+                )
+        else:
+            draw_rows = draw_start[ev_indices][:, None] + np.arange(draws_per_ev[ev_indices[0]])
+            trial_draws = draws[draw_rows].reshape(
+                len(ev_indices), n_offsets, N_BINDING_TRIALS, n_anchors, receptor_count
+            )
+        edges = trial_draws < group_probabilities[:, :, None, :, :]
+        samples = batch_max_bipartite_matches(edges.reshape(-1, n_anchors, receptor_count)).astype(float)
+        samples = samples.reshape(len(ev_indices), n_offsets, N_BINDING_TRIALS)
+        p1 = np.mean(samples >= 1, axis=2)
+        p2 = np.mean(samples >= 2, axis=2)
+        # First offset with the best capture-weighted score, as in a running max.
+        best = np.argmax(p1 + 0.25 * p2, axis=1)
+        rows = np.arange(len(ev_indices))
+        best_p1[ev_indices] = p1[rows, best]
+        best_p2[ev_indices] = p2[rows, best]
+        best_mean_contacts[ev_indices] = np.mean(samples[rows, best], axis=1)
+
+    scored = counts > 0
+    capture_values = best_p1[scored]
+    strong_values = best_p2[scored]
+    mean_contacts = best_mean_contacts[scored]
+    low_receptor_capture = best_p1[scored & (counts <= 3)]
+    is_clustered = np.char.find(np.asarray(population["pattern"]).astype(str), "cluster") >= 0
+    clustered_capture = best_p1[scored & is_clustered]
 
     capture = float(np.mean(capture_values))
     strong = float(np.mean(strong_values))
     mean_contact = float(np.mean(mean_contacts))
-    low_capture = float(np.mean(low_receptor_capture)) if low_receptor_capture else 0.0
-    cluster_capture = float(np.mean(clustered_capture)) if clustered_capture else 0.0
+    low_capture = float(np.mean(low_receptor_capture)) if len(low_receptor_capture) else 0.0
+    cluster_capture = float(np.mean(clustered_capture)) if len(clustered_capture) else 0.0
     penalty = layout_penalty(anchors)
     score = (
-        0.45 * capture
-        + 0.20 * strong
-        + 0.15 * min(mean_contact / 2.0, 1.0)
-        + 0.15 * low_capture
-        + 0.05 * cluster_capture
+        SCORE_WEIGHTS["capture"] * capture
+        + SCORE_WEIGHTS["strong"] * strong
+        + SCORE_WEIGHTS["contacts"] * min(mean_contact / 2.0, 1.0)
+        + SCORE_WEIGHTS["low_receptor_capture"] * low_capture
+        + SCORE_WEIGHTS["clustered_capture"] * cluster_capture
         - penalty
     )
     return {
@@ -253,11 +358,72 @@ def evaluate_layout(
     }
 
 
-def score_layouts(layouts: dict[str, list[Anchor]], linker_models, population, seed: int) -> list[dict[str, str]]:
+class IncrementalLayoutEvaluator:
+    """Score layouts that differ from an accepted layout by only a few anchors.
+
+    Reach-probability rows are kept per anchor (position and construct) for
+    the accepted layout. A proposal reuses the rows of every anchor it shares
+    with it and computes only the moved or added ones, so its geometry costs
+    O(changed anchors). Sampling and matching still cover all anchors, and
+    scores are identical to ``evaluate_layout``.
+    """
+
+    def __init__(self, linker_models, population: dict[str, np.ndarray]) -> None:
+        self.linker_models = linker_models
+        self.population = population
+        self.geometry = population_geometry(population)
+        self.rows_computed = 0
+        self.rows_reused = 0
+        self._accepted: dict[tuple[float, float, str], list[np.ndarray]] = {}
+        self._proposed: dict[tuple[float, float, str], list[np.ndarray]] = {}
+
+    @staticmethod
+    def anchor_key(anchor: Anchor) -> tuple[float, float, str]:
+        return float(anchor["x_nm"]), float(anchor["y_nm"]), str(anchor["linker_construct"])
+
+    def probabilities(self, anchors: list[Anchor]) -> list[np.ndarray]:
+        rows: dict[tuple[float, float, str], list[np.ndarray]] = {}
+        for anchor in anchors:
+            key = self.anchor_key(anchor)
+            if key in rows:
+                continue
+            if key in self._accepted:
+                rows[key] = self._accepted[key]
+                self.rows_reused += 1
+            else:
+                rows[key] = layout_probabilities([anchor], self.linker_models, self.geometry)
+                self.rows_computed += 1
+        self._proposed = rows
+        keys = [self.anchor_key(anchor) for anchor in anchors]
+        return [
+            np.concatenate([rows[key][group] for key in keys], axis=2) for group in range(len(self.geometry))
+        ]
+
+    def evaluate(
+        self, anchors: list[Anchor], rng: np.random.Generator, common_random_numbers: bool = False
+    ) -> dict[str, float]:
+        probabilities = self.probabilities(anchors)
+        return score_probabilities(
+            anchors, self.population, self.geometry, probabilities, rng, common_random_numbers
+        )
+
+    def accept(self) -> None:
+        """Make the last evaluated layout the one later proposals are compared against."""
+        self._accepted = self._proposed
+
+
+def score_layouts(
+    layouts: dict[str, list[Anchor]],
+    linker_models,
+    population,
+    seed: int,
+    common_random_numbers: bool = False,
+) -> list[dict[str, str]]:
     rows = []
     for index, (name, anchors) in enumerate(layouts.items()):
-        rng = np.random.default_rng(seed + index)
-        metrics = evaluate_layout(anchors, linker_models, population, rng)
+        # Common random numbers: every layout replays the same seeded stream.
+        rng = np.random.default_rng(seed if common_random_numbers else seed + index)
+        metrics = evaluate_layout(anchors, linker_models, population, rng, common_random_numbers)
         rows.append(
             {
                 "layout": name,
@@ -268,6 +434,257 @@ def score_layouts(layouts: dict[str, list[Anchor]], linker_models, population, s
     return sorted(rows, key=lambda row: float(row["population_score"]), reverse=True)
 
 
+def digest(payload: object) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("ascii")).hexdigest()
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    h = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(array.dtype.str.encode("ascii"))
+        h.update(str(array.shape).encode("ascii"))
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def anchor_sort_key(anchor: Anchor) -> tuple[float, float, str]:
+    return round(float(anchor["x_nm"]), 6), round(float(anchor["y_nm"]), 6), str(anchor["linker_construct"])
+
+
+def layout_fingerprint(anchors: list[Anchor]) -> str:
+    # The key ignores anchor order; cached jobs score anchors in this same
+    # sorted order, so every permutation of a layout gets one score.
+    return digest(sorted(anchor_sort_key(a) for a in anchors))
+
+
+def linker_fingerprint(linker_models) -> str:
+    return digest(
+        {
+            construct: array_digest(model.distances_nm, model.probabilities)
+            + f"/{model.table_step_nm}"
+            for construct, model in sorted(linker_models.items())
+        }
+    )
+
+
+def population_fingerprint(population: dict[str, np.ndarray]) -> str:
+    receptors = population_receptors(population)
+    return array_digest(
+        np.asarray(population["diameter_nm"], dtype=float),
+        np.asarray(receptors.points, dtype=float),
+        receptors.offsets,
+        np.asarray(population["pattern"]).astype(str),
+    )
+
+
+def scoring_fingerprint(
+    linker_models, population: dict[str, np.ndarray], seed: int, common_random_numbers: bool = False
+) -> str:
+    """Everything besides the layout that a cached score depends on."""
+    payload = {
+        "linker": linker_fingerprint(linker_models),
+        "population": population_fingerprint(population),
+        "seed": seed,
+        "binding_trials": N_BINDING_TRIALS,
+        "lateral_offsets_nm": LATERAL_OFFSETS_NM,
+        "surface_clearance_nm": SURFACE_CLEARANCE_NM,
+        "score_weights": SCORE_WEIGHTS,
+        "crowding_penalty": {
+            "distance_nm": CROWDING_DISTANCE_NM,
+            "pair_penalty": CROWDING_PAIR_PENALTY,
+            "free_aptamers": CROWDING_FREE_APTAMERS,
+            "extra_aptamer_penalty": CROWDING_EXTRA_APTAMER_PENALTY,
+            "max_penalty": MAX_CROWDING_PENALTY,
+        },
+        # The constants above do not cover an edit to how the score or the
+        # penalty is put together, so their code is part of the key too.
+        "scoring_code": hashlib.sha256(
+            "".join(
+                inspect.getsource(function) for function in (score_probabilities, layout_penalty, evaluate_layout_job)
+            ).encode("utf-8")
+        ).hexdigest(),
+    }
+    if common_random_numbers:
+        # Only added when set, so earlier cache files keep matching.
+        payload["common_random_numbers"] = True
+    return digest(payload)
+
+
+def load_fitness_cache(path: Path, context: str) -> dict[str, dict[str, float]]:
+    cache: dict[str, dict[str, float]] = {}
+    if not path.exists():
+        return cache
+    with open(path, encoding="ascii") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["context"] == context:
+                cache[entry["layout_key"]] = entry["metrics"]
+    return cache
+
+
+def append_fitness_cache(path: Path, context: str, entries: dict[str, dict[str, float]]) -> None:
+    with open(path, "a", encoding="ascii") as f:
+        for layout_key, metrics in entries.items():
+            f.write(json.dumps({"context": context, "layout_key": layout_key, "metrics": metrics}) + "\n")
+
+
+_worker_state: dict[str, object] = {}
+
+
+def init_fitness_worker(linker_models, population: dict[str, np.ndarray]) -> None:
+    # Each pool process receives the models and population once, not per job.
+    _worker_state["linker_models"] = linker_models
+    _worker_state["population"] = population
+
+
+def evaluate_layout_job(job: tuple[list[Anchor], int, str, bool]) -> dict[str, float]:
+    anchors, seed, layout_key, common_random_numbers = job
+    # The seed comes from the layout itself (or is shared by all layouts under
+    # common random numbers), so a score is the same whichever run, generation
+    # or worker computes it. Random draws are tied to an anchor's place in the
+    # list, so anchors are put in the fingerprint's order first.
+    anchors = sorted(anchors, key=anchor_sort_key)
+    if common_random_numbers:
+        rng = np.random.default_rng(seed)
+    else:
+        rng = np.random.default_rng(np.random.SeedSequence([seed, int(layout_key[:16], 16)]))
+    return evaluate_layout(
+        anchors, _worker_state["linker_models"], _worker_state["population"], rng, common_random_numbers
+    )
+
+
+def score_layouts_cached(
+    layouts: dict[str, list[Anchor]],
+    linker_models,
+    population: dict[str, np.ndarray],
+    seed: int,
+    workers: int,
+    cache: dict[str, dict[str, float]],
+    cache_path: Path | None,
+    context: str,
+    common_random_numbers: bool = False,
+) -> list[dict[str, str]]:
+    keys = {name: layout_fingerprint(anchors) for name, anchors in layouts.items()}
+    missing: dict[str, list[Anchor]] = {}
+    for name, key in keys.items():
+        if key not in cache and key not in missing:
+            missing[key] = layouts[name]
+    if missing:
+        jobs = [(anchors, seed, key, common_random_numbers) for key, anchors in missing.items()]
+        if workers <= 1:
+            init_fitness_worker(linker_models, population)
+            results = [evaluate_layout_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=init_fitness_worker, initargs=(linker_models, population)
+            ) as executor:
+                results = list(executor.map(evaluate_layout_job, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+        fresh = dict(zip(missing, results))
+        cache.update(fresh)
+        if cache_path is not None:
+            append_fitness_cache(cache_path, context, fresh)
+    rows = [
+        {
+            "layout": name,
+            "aptamer_count": str(len(anchors)),
+            **{key: f"{value:.5f}" for key, value in cache[keys[name]].items()},
+        }
+        for name, anchors in layouts.items()
+    ]
+    return sorted(rows, key=lambda row: float(row["population_score"]), reverse=True)
+
+
+def common_random_numbers_study(
+    layouts: dict[str, list[Anchor]],
+    linker_models,
+    population: dict[str, np.ndarray],
+    seed: int,
+    replicates: int,
+    reference: str,
+) -> dict[str, object]:
+    """Paired score differences to ``reference`` under common vs independent streams."""
+    common: list[dict[str, float]] = []
+    independent: list[dict[str, float]] = []
+    for replicate in range(replicates):
+        common_seed = seed + 5000 + replicate
+        common.append(
+            {
+                name: evaluate_layout(
+                    anchors, linker_models, population, np.random.default_rng(common_seed), True
+                )["population_score"]
+                for name, anchors in layouts.items()
+            }
+        )
+        independent.append(
+            {
+                name: evaluate_layout(
+                    anchors, linker_models, population, np.random.default_rng([seed, replicate, index])
+                )["population_score"]
+                for index, (name, anchors) in enumerate(layouts.items())
+            }
+        )
+    return paired_variance_reduction(common, independent, reference)
+
+
+def local_search(
+    name: str,
+    anchors: list[Anchor],
+    linker_models,
+    population: dict[str, np.ndarray],
+    steps: int,
+    seed: int,
+    validation_seed: int,
+    rng: np.random.Generator,
+) -> tuple[list[Anchor], dict[str, object]]:
+    """Hill-climb one layout with single-anchor moves, re-scoring only the changed anchors.
+
+    Every proposal is scored with common random numbers from ``seed``, so it is
+    accepted only when its own anchor change raises the score. Each anchor
+    keeps a ``crn_id`` through the climb, so adding or removing one leaves the
+    other anchors' uniforms alone. The climb selects on the noise of that one
+    seed, so the start and final layouts are re-scored on ``validation_seed``.
+    """
+    evaluator = IncrementalLayoutEvaluator(linker_models, population)
+    start = time.process_time()
+    current = [{**anchor, "crn_id": index} for index, anchor in enumerate(anchors)]
+    next_crn_id = len(current)
+    current_score = evaluator.evaluate(current, np.random.default_rng(seed), True)["population_score"]
+    evaluator.accept()
+    start_layout, start_score = current, current_score
+    accepted = 0
+    for step in range(steps):
+        _, proposal = mutate_one_anchor(f"{name}_local{step}", current, rng)
+        for anchor in proposal:
+            if "crn_id" not in anchor:
+                anchor["crn_id"] = next_crn_id
+                next_crn_id += 1
+        score = evaluator.evaluate(proposal, np.random.default_rng(seed), True)["population_score"]
+        if score > current_score:
+            evaluator.accept()
+            current, current_score = proposal, score
+            accepted += 1
+    start_validation, final_validation = (
+        evaluator.evaluate(layout, np.random.default_rng(validation_seed), True)["population_score"]
+        for layout in (start_layout, current)
+    )
+    refined = [{key: value for key, value in anchor.items() if key != "crn_id"} for anchor in current]
+    return refined, {
+        "start_layout": name,
+        "steps": steps,
+        "accepted_moves": accepted,
+        "start_score_crn": round(start_score, 5),
+        "final_score_crn": round(current_score, 5),
+        "validation_seed": validation_seed,
+        "start_score_validation": round(start_validation, 5),
+        "final_score_validation": round(final_validation, 5),
+        "final_aptamers": len(current),
+        "probability_rows_computed": evaluator.rows_computed,
+        "probability_rows_reused": evaluator.rows_reused,
+        "cpu_seconds": round(time.process_time() - start, 3),
+    }
+
+
 def write_layouts(layouts: dict[str, list[Anchor]], top_names: list[str]) -> None:
     with open(OUT_LAYOUTS_CSV, "w", newline="", encoding="ascii") as f:
         writer = csv.DictWriter(
@@ -320,23 +737,92 @@ def plot_layouts(layouts: dict[str, list[Anchor]], top_names: list[str]) -> None
     plt.close(fig)
 
 
-def main() -> None:
-    records, receptor_array = generate_population(N_POPULATION_EVS, RNG_SEED)
-    np.savez_compressed(
-        ROOT / "ev_population_optimization_run.npz",
-        receptor_points=receptor_array,
-        diameter_nm=np.asarray([r.diameter_nm for r in records], dtype=float),
-        receptor_count=np.asarray([r.receptor_count for r in records], dtype=int),
-        pattern=np.asarray([r.pattern for r in records]),
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="cached mode: score each new layout once, with a per-layout seed, on this many processes",
+    )
+    parser.add_argument(
+        "--fitness-cache",
+        type=Path,
+        default=FITNESS_CACHE,
+        help="JSON-lines fitness cache used in cached mode",
+    )
+    parser.add_argument("--no-fitness-cache", action="store_true", help="cached mode without the on-disk cache")
+    parser.add_argument(
+        "--crn",
+        action="store_true",
+        help="common random numbers: score every layout from the same seeded binding-trial draws",
     )
-    population = np.load(ROOT / "ev_population_optimization_run.npz")
+    parser.add_argument(
+        "--crn-replicates",
+        type=int,
+        default=CRN_REPLICATES,
+        help="replicates for the paired-difference variance study of the top layouts in --crn mode",
+    )
+    parser.add_argument(
+        "--surrogate-fraction",
+        type=float,
+        default=None,
+        help="simulate only this fraction of each generation's mutants, picked by a layout surrogate",
+    )
+    parser.add_argument(
+        "--min-buildability",
+        type=float,
+        default=None,
+        help="drop mutants whose origami buildability score is below this before simulating them",
+    )
+    parser.add_argument(
+        "--local-search-steps",
+        type=int,
+        default=0,
+        help="after the search, hill-climb the best layout with this many single-anchor moves",
+    )
+    parser.add_argument("--generations", type=int, default=N_GENERATIONS)
+    parser.add_argument("--population-evs", type=int, default=N_POPULATION_EVS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    population = ensure_population_store(POPULATION_STORE, args.population_evs, RNG_SEED)
     linker_models = load_linker_models()
     rng = np.random.default_rng(RNG_SEED)
     layouts = seed_layouts(rng)
 
-    best_rows = score_layouts(layouts, linker_models, population, RNG_SEED + 1000)
-    for generation in range(N_GENERATIONS):
+    cache_path = None if args.no_fitness_cache else args.fitness_cache
+    if args.workers is None:
+        # Original mode: every generation re-scores every layout from a fresh stream.
+        def score(generation_seed: int) -> list[dict[str, str]]:
+            return score_layouts(layouts, linker_models, population, generation_seed, args.crn)
+
+    else:
+        context = scoring_fingerprint(linker_models, population, RNG_SEED, args.crn)
+        cache = load_fitness_cache(cache_path, context) if cache_path is not None else {}
+        print(f"Fitness cache: {len(cache)} earlier evaluations reusable", flush=True)
+
+        def score(generation_seed: int) -> list[dict[str, str]]:
+            return score_layouts_cached(
+                layouts,
+                linker_models,
+                population,
+                RNG_SEED,
+                args.workers,
+                cache,
+                cache_path,
+                context,
+                args.crn,
+            )
+
+    best_rows = score(RNG_SEED + 1000)
+    surrogate_generations = []
+    buildability_generations = []
+    for generation in range(args.generations):
         parents = [row["layout"] for row in best_rows[:KEEP_PER_GENERATION]]
+        mutants: dict[str, list[Anchor]] = {}
         for parent_name in parents:
             parent = layouts[parent_name]
             for mutant_index in range(MUTANTS_PER_PARENT):
@@ -345,30 +831,102 @@ def main() -> None:
                     parent,
                     rng,
                 )
-                layouts[child_name] = child
-        best_rows = score_layouts(layouts, linker_models, population, RNG_SEED + 2000 + generation)
+                mutants[child_name] = child
+        if args.min_buildability is not None:
+            names = list(mutants)
+            buildability = batch_buildability_metrics(*pad_layouts([mutants[name] for name in names]))
+            mutants = {
+                name: mutants[name]
+                for name, score in zip(names, buildability["origami_buildability_score"])
+                if score >= args.min_buildability
+            }
+            buildability_generations.append(
+                {
+                    "generation": generation + 1,
+                    "mutants_proposed": len(names),
+                    "mutants_rejected": len(names) - len(mutants),
+                }
+            )
+            print(
+                f"Buildability generation {generation + 1}: kept {len(mutants)}/{len(names)} mutants",
+                flush=True,
+            )
+        if args.surrogate_fraction is not None:
+            proposed = len(mutants)
+            scored = {row["layout"]: (layouts[row["layout"]], float(row["population_score"])) for row in best_rows}
+            kept, predictions = preselect(mutants, scored, args.surrogate_fraction) if mutants else ([], {})
+            mutants = {name: mutants[name] for name in kept}
+        layouts.update(mutants)
+        best_rows = score(RNG_SEED + 2000 + generation)
+        if args.surrogate_fraction is not None:
+            observed = {
+                row["layout"]: float(row["population_score"]) for row in best_rows if row["layout"] in mutants
+            }
+            surrogate_generations.append(
+                {
+                    "generation": generation + 1,
+                    "mutants_proposed": proposed,
+                    "mutants_simulated": len(mutants),
+                    "simulator_calls_saved": proposed - len(mutants),
+                    **surrogate_accuracy(predictions, observed),
+                }
+            )
+            print(
+                f"Surrogate generation {generation + 1}: simulated {len(mutants)}/{proposed} mutants, "
+                f"rank correlation={surrogate_generations[-1]['rank_correlation']}",
+                flush=True,
+            )
         print(
             f"Generation {generation + 1}: best={best_rows[0]['layout']} "
             f"score={best_rows[0]['population_score']}",
             flush=True,
         )
 
+    if args.local_search_steps > 0:
+        start_name = best_rows[0]["layout"]
+        refined, local_search_summary = local_search(
+            start_name,
+            layouts[start_name],
+            linker_models,
+            population,
+            args.local_search_steps,
+            RNG_SEED + 4000,
+            RNG_SEED + 6000,
+            rng,
+        )
+        refined_name = f"{start_name}_local_search"
+        local_search_summary["layout"] = refined_name
+        local_search_summary["anchors"] = [
+            {"x_nm": round(float(anchor["x_nm"]), 3), "y_nm": round(float(anchor["y_nm"]), 3)} for anchor in refined
+        ]
+        print(
+            f"Local search: {local_search_summary['accepted_moves']}/{args.local_search_steps} moves accepted, "
+            f"score {local_search_summary['start_score_crn']} -> {local_search_summary['final_score_crn']} "
+            f"(fresh seed: {local_search_summary['start_score_validation']} -> "
+            f"{local_search_summary['final_score_validation']})",
+            flush=True,
+        )
+
     with open(OUT_SCORES_CSV, "w", newline="", encoding="ascii") as f:
         writer = csv.DictWriter(f, fieldnames=list(best_rows[0].keys()))
         writer.writeheader()
         writer.writerows(best_rows)
 
     top_names = [row["layout"] for row in best_rows[:10]]
-    write_layouts(layouts, top_names)
+    if args.local_search_steps > 0:
+        # The refined layout is written after the top 10 it was hill-climbed from.
+        write_layouts({**layouts, refined_name: refined}, [*top_names, refined_name])
+    else:
+        write_layouts(layouts, top_names)
     plot_scores(best_rows)
     plot_layouts(layouts, top_names)
 
     summary = {
         "model": "EV population generator plus evolutionary layout competition",
         "rng_seed": RNG_SEED,
-        "n_population_evs": N_POPULATION_EVS,
+        "n_population_evs": args.population_evs,
         "n_layouts_tested": len(layouts),
-        "n_generations": N_GENERATIONS,
+        "n_generations": args.generations,
         "binding_trials_per_ev_offset": N_BINDING_TRIALS,
         "lateral_offsets_nm": LATERAL_OFFSETS_NM,
         "best_layout": best_rows[0],
@@ -385,6 +943,38 @@ def main() -> None:
             "A small crowding penalty is included so overly packed layouts are not favored for free.",
         ],
     }
+    if args.workers is not None:
+        summary["fitness_evaluation"] = {
+            "mode": "cached, one seeded evaluation per distinct layout",
+            "workers": args.workers,
+            "cache": cache_path.name if cache_path is not None else None,
+            "cached_layouts": len(cache),
+        }
+    if args.surrogate_fraction is not None:
+        summary["surrogate"] = {
+            "model": "Gaussian process on rotation-invariant layout descriptors",
+            "simulated_fraction": args.surrogate_fraction,
+            "accuracy_measured_on": "mutants the surrogate let through to the simulator",
+            "generations": surrogate_generations,
+            "simulator_calls_saved": sum(g["simulator_calls_saved"] for g in surrogate_generations),
+        }
+    if args.min_buildability is not None:
+        summary["buildability_filter"] = {
+            "min_origami_buildability_score": args.min_buildability,
+            "generations": buildability_generations,
+            "simulator_calls_saved": sum(g["mutants_rejected"] for g in buildability_generations),
+        }
+    if args.local_search_steps > 0:
+        summary["local_search"] = local_search_summary
+    if args.crn:
+        summary["common_random_numbers"] = {
+            "scheme": "one shared seed per scoring pass; binding uniforms drawn anchor-major over the shared EV population",
+        }
+        if args.crn_replicates > 1:
+            study_layouts = {row["layout"]: layouts[row["layout"]] for row in best_rows[:CRN_STUDY_LAYOUTS]}
+            summary["common_random_numbers"]["variance_study"] = common_random_numbers_study(
+                study_layouts, linker_models, population, RNG_SEED, args.crn_replicates, best_rows[0]["layout"]
+            )
     OUT_SUMMARY_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
 
     print(f"Wrote {OUT_SCORES_CSV.name}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Compact ragged (CSR) storage for per-EV CD133 receptor clouds.
+
+Beginner picture:
+EVs carry anywhere from 1 to 15 receptors. Padding every EV to the largest
+possible count wastes most of the array on NaN rows. Here all receptor points
+sit end to end in one flat ``(total_receptors, 3)`` buffer, and
+``offsets[i]:offsets[i + 1]`` is the slice that belongs to EV ``i``.
+
+Scorers mostly want "all EVs with exactly k receptors" as one
+``(n_evs, k, 3)`` block, which ``groups_by_count`` hands out directly.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class RaggedReceptors:
+    """Receptor points of many EVs in CSR layout: ``points`` plus ``offsets``."""
+
+    points: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_padded(
+        cls, receptor_points: np.ndarray, receptor_counts: np.ndarray, dtype: np.dtype | type = np.float32
+    ) -> RaggedReceptors:
+        counts = np.asarray(receptor_counts, dtype=np.int64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        valid = np.arange(np.shape(receptor_points)[1])[None, :] < counts[:, None]
+        return cls(np.asarray(receptor_points)[valid].astype(dtype, copy=False), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def ev(self, index: int) -> np.ndarray:
+        return self.points[self.offsets[index] : self.offsets[index + 1]]
+
+    def gather(self, ev_indices: np.ndarray, count: int) -> np.ndarray:
+        """Stack EVs that all have ``count`` receptors into one ``(len(ev_indices), count, 3)`` array."""
+        rows = self.offsets[np.asarray(ev_indices)][:, None] + np.arange(count)
+        return self.points[rows]
+
+    def groups_by_count(self) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """Yield ``(count, ev_indices, points)`` for every receptor count present, smallest first."""
+        counts = self.counts
+        for count in np.unique(counts):
+            ev_indices = np.flatnonzero(counts == count)
+            yield int(count), ev_indices, self.gather(ev_indices, int(count))
+
+    def iter_evs(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self.ev(index)
+
+    def padded(self, width: int | None = None) -> np.ndarray:
+        """NaN-padded ``(n_evs, width, 3)`` float array, by default as wide as the largest EV."""
+        counts = self.counts
+        if width is None:
+            width = max(int(counts.max(initial=0)), 1)
+        padded = np.full((len(self), width, 3), np.nan, dtype=float)
+        padded[np.arange(width)[None, :] < counts[:, None]] = self.points
+        return padded
+
+
+def population_receptors(population) -> RaggedReceptors:
+    """Receptor clouds of a population store, whichever layout it carries.
+
+    Stores written by the sequential generator keep the float64 padded array,
+    which is used as-is so seeded results do not shift by float32 rounding.
+    """
+    if "receptor_points" in population:
+        return RaggedReceptors.from_padded(
+            population["receptor_points"], population["receptor_count"], dtype=float
+        )
+    return RaggedReceptors(population["receptor_xyz"], population["receptor_offsets"])
@@ -12,8 +12,8 @@ from __future__ import annotations
 
 import csv
 import json
-import math
 from pathlib import Path
+from typing import Union
 
 import matplotlib
 
@@ -21,9 +21,10 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from capture_dynamics import CaptureScenario, pad_receptor_bodies, simulate_capture
 from clinical_layouts import clinical_candidate_layouts
 from ev_population_generator import receptor_points
-from score_ev_capture_geometry import load_linker_models, reach_probability
+from score_ev_capture_geometry import load_linker_models
 
 ROOT = Path(__file__).resolve().parent
 OUT_CSV = ROOT / "robustness_sensitivity_results.csv"
@@ -42,6 +43,10 @@ SURFACE_CLEARANCE_NM = 2.0
 INITIAL_GAP_NM = 8.0
 MAX_GAP_NM = 24.0
 MAX_ENCOUNTERS = 10
+REACH_CONSTRUCT = "polyT30"
+# Opt-in: only capture outcomes are scored here, so a trajectory may stop as
+# soon as its outcome is decided.
+CAPTURE_ONLY = False
 
 LAYOUT_NAMES = (
     "clinical_grid_12",
@@ -53,6 +58,8 @@ LAYOUT_NAMES = (
 PATTERNS = ("random", "single_cluster", "two_cluster", "bottom_cap")
 PATTERN_PROBABILITIES = (0.40, 0.25, 0.20, 0.15)
 
+Anchor = dict[str, Union[float, str]]
+
 
 def draw_scenario(rng: np.random.Generator) -> dict[str, float]:
     """Draw one plausible set of uncertain physical and practical values."""
@@ -77,103 +84,50 @@ def sample_receptor_count(mean: float, rng: np.random.Generator) -> int:
     return int(np.clip(rng.negative_binomial(dispersion, probability), 1, 16))
 
 
-def break_bonds(
-    distances: np.ndarray,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    k_off_per_s: float,
-    rng: np.random.Generator,
-) -> None:
-    p_off = 1.0 - math.exp(-k_off_per_s * DT_SECONDS)
-    for anchor_index, receptor_index in enumerate(anchor_to_receptor):
-        if receptor_index == -1:
-            continue
-        if distances[anchor_index, receptor_index] > 14.0 or rng.random() < p_off:
-            anchor_to_receptor[anchor_index] = -1
-            receptor_to_anchor[receptor_index] = -1
-
-
-def try_form_bonds(
-    distances: np.ndarray,
-    linker_models,
-    reach_multiplier: float,
-    k_on_per_step: float,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    free_anchors = np.flatnonzero(anchor_to_receptor == -1)
-    free_receptors = np.flatnonzero(receptor_to_anchor == -1)
-    if len(free_anchors) == 0 or len(free_receptors) == 0:
-        return
-    sub_distances = distances[np.ix_(free_anchors, free_receptors)] / reach_multiplier
-    probabilities = np.asarray(
-        [
-            [k_on_per_step * reach_probability(linker_models, "polyT30", float(distance)) for distance in row]
-            for row in sub_distances
-        ]
+def capture_scenario(scenario: dict[str, float]) -> CaptureScenario:
+    return CaptureScenario(
+        n_steps=N_STEPS,
+        dt_seconds=DT_SECONDS,
+        diffusion_nm2_per_s=scenario["diffusion_nm2_per_s"],
+        k_on_per_step=scenario["k_on_per_step"],
+        k_off_per_s=scenario["k_off_per_s"],
+        reach_multiplier=scenario["linker_reach_multiplier"],
+        capture_threshold=1,
+        capture_dwell_seconds=CAPTURE_DWELL_SECONDS,
+        surface_clearance_nm=SURFACE_CLEARANCE_NM,
+        initial_gap_nm=INITIAL_GAP_NM,
+        max_gap_nm=MAX_GAP_NM,
+        start_half_width_nm=(22.0, 22.0),
+        escape_radius_nm=70.0,
+        capture_only=CAPTURE_ONLY,
     )
-    candidate_pairs = np.argwhere(rng.random(probabilities.shape) < probabilities)
-    rng.shuffle(candidate_pairs)
-    for local_anchor, local_receptor in candidate_pairs:
-        anchor_index = int(free_anchors[local_anchor])
-        receptor_index = int(free_receptors[local_receptor])
-        if anchor_to_receptor[anchor_index] == -1 and receptor_to_anchor[receptor_index] == -1:
-            anchor_to_receptor[anchor_index] = receptor_index
-            receptor_to_anchor[receptor_index] = anchor_index
 
 
-def simulate_one_ev(
+def reach_anchors(anchors: np.ndarray) -> list[Anchor]:
+    # Every stress-test anchor uses the polyT30 reach curve.
+    return [
+        {"x_nm": float(x), "y_nm": float(y), "linker_construct": REACH_CONSTRUCT}
+        for x, y in np.asarray(anchors, dtype=float).reshape(-1, 3)[:, :2]
+    ]
+
+
+def simulate_evs(
     anchors: np.ndarray,
-    receptor_body: np.ndarray,
-    diameter_nm: float,
+    evs: list[tuple[float, np.ndarray]],
     scenario: dict[str, float],
     linker_models,
     rng: np.random.Generator,
-) -> bool:
-    radius = diameter_nm / 2.0
-    center = np.array(
-        [rng.uniform(-22.0, 22.0), rng.uniform(-22.0, 22.0), radius + SURFACE_CLEARANCE_NM + INITIAL_GAP_NM]
+) -> np.ndarray:
+    """Return whether each ``(diameter, receptor_body)`` EV is captured, all EVs advancing together."""
+    result = simulate_capture(
+        reach_anchors(anchors),
+        linker_models,
+        pad_receptor_bodies([receptors for _, receptors in evs]),
+        np.asarray([diameter for diameter, _ in evs], dtype=float),
+        capture_scenario(scenario),
+        rng,
     )
-    min_z = radius + SURFACE_CLEARANCE_NM
-    max_z = min_z + MAX_GAP_NM
-    anchor_to_receptor = np.full(len(anchors), -1, dtype=int)
-    receptor_to_anchor = np.full(len(receptor_body), -1, dtype=int)
-    required_steps = int(round(CAPTURE_DWELL_SECONDS / DT_SECONDS))
-    consecutive = 0
-
-    for _ in range(N_STEPS):
-        contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        mobility = max(0.10, 1.0 / (1.0 + 0.75 * contacts))
-        sigma = math.sqrt(2.0 * scenario["diffusion_nm2_per_s"] * mobility * DT_SECONDS)
-        center[:2] += rng.normal(0.0, sigma, size=2)
-        center[2] += rng.normal(0.0, sigma * 0.45) - 0.035 * contacts
-        center[2] = float(np.clip(center[2], min_z, max_z))
-        lateral_norm = float(np.linalg.norm(center[:2]))
-        if lateral_norm > 70.0:
-            center[:2] *= 70.0 / lateral_norm
-        distances = np.linalg.norm(anchors[:, None, :] - (receptor_body + center)[None, :, :], axis=2)
-        break_bonds(
-            distances,
-            anchor_to_receptor,
-            receptor_to_anchor,
-            scenario["k_off_per_s"],
-            rng,
-        )
-        try_form_bonds(
-            distances,
-            linker_models,
-            scenario["linker_reach_multiplier"],
-            scenario["k_on_per_step"],
-            anchor_to_receptor,
-            receptor_to_anchor,
-            rng,
-        )
-        contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        consecutive = consecutive + 1 if contacts >= 1 else 0
-        if consecutive >= required_steps:
-            return True
-    return False
+    return result.ever_captured
 
 
 def repeated_target_capture(single_capture: float, encounters: int, activity_loss: float) -> float:
@@ -229,10 +183,7 @@ def main() -> None:
                 [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in active_layout],
                 dtype=float,
             )
-            captures = [
-                simulate_one_ev(anchors, receptors, diameter, scenario, linker_models, rng)
-                for diameter, receptors in evs
-            ]
+            captures = simulate_evs(anchors, evs, scenario, linker_models, rng)
             single_capture = float(np.mean(captures))
             encounter_results = []
             for encounters in range(1, MAX_ENCOUNTERS + 1):
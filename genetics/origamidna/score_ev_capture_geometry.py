@@ -3,10 +3,13 @@
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 import math
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Union
 
@@ -16,6 +19,9 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from adaptive_sampling import StoppingRule, race
+from bipartite_matching import batch_max_bipartite_matches, max_bipartite_matches
+
 ROOT = Path(__file__).resolve().parent
 IN_CSV = ROOT / "ev_origami_aptamer_layouts.csv"
 LINKER_MODEL_CSV = ROOT / "linker_reach_models.csv"
@@ -42,9 +48,83 @@ N_RECEPTOR_REALIZATIONS = 8
 N_BINDING_TRIALS = 16
 REACH_EDGE_THRESHOLD = 0.05
 RNG_SEED = 20260525
+# Common-random-numbers mode: paired score differences are compared against
+# independent streams over this many replicates in one cheap grid cell.
+CRN_REPLICATES = 8
+CRN_VARIANCE_CELL = (100.0, "low")
+# Adaptive mode: per grid cell, draw receptor realizations in batches until the
+# capture-score 95% CI half-width reaches the target, racing layouts that can
+# no longer reach the cell's top k out early.
+ADAPTIVE_CI_HALF_WIDTH = 0.01
+ADAPTIVE_BATCH_REALIZATIONS = 2
+ADAPTIVE_MIN_BATCHES = 2
+ADAPTIVE_MAX_BATCHES = 16
+ADAPTIVE_TOP_K = 2
+# Optional dense reach lookup table. None keeps exact interpolation between the
+# calibrated curve points; a step such as 0.01 nm trades a bounded rounding
+# error for O(1) table lookups in the inner scoring loops.
+REACH_TABLE_STEP_NM: float | None = None
 
 Anchor = dict[str, Union[float, str]]
-LinkerModels = dict[str, tuple[np.ndarray, np.ndarray]]
+
+
+@dataclass(frozen=True)
+class LinkerModel:
+    """Reach-probability curve for one linker construct.
+
+    Calling the model evaluates a whole distance array at once. Distances at or
+    below zero always reach (1.0), distances beyond the last calibrated point
+    never reach (0.0), and everything in between is linearly interpolated.
+    """
+
+    construct: str
+    distances_nm: np.ndarray
+    probabilities: np.ndarray
+    table_step_nm: float | None = None
+    table: np.ndarray | None = field(default=None, repr=False, compare=False)
+
+    @property
+    def max_reach_nm(self) -> float:
+        return float(self.distances_nm[-1])
+
+    @property
+    def support_nm(self) -> float:
+        """Distance beyond which this model always returns exactly 0.0.
+
+        Neighbor searches can use it as a hard cutoff. Table lookups round to
+        the nearest grid point, so they can reach up to half a step further.
+        """
+        nonzero = np.flatnonzero(self.probabilities > 0.0)
+        if len(nonzero) == 0:
+            return 0.0
+        support = float(self.distances_nm[min(int(nonzero[-1]) + 1, len(self.distances_nm) - 1)])
+        if self.table_step_nm is not None:
+            support += 0.5 * self.table_step_nm
+        return min(support, self.max_reach_nm)
+
+    def with_table(self, step_nm: float | None) -> LinkerModel:
+        """Return a copy that answers lookups from a precomputed dense table."""
+        if step_nm is None:
+            return LinkerModel(self.construct, self.distances_nm, self.probabilities)
+        if step_nm <= 0:
+            raise ValueError(f"Reach table step must be positive, got {step_nm}")
+        grid = np.arange(0.0, self.max_reach_nm + step_nm, step_nm)
+        table = np.interp(grid, self.distances_nm, self.probabilities)
+        return LinkerModel(self.construct, self.distances_nm, self.probabilities, float(step_nm), table)
+
+    def __call__(self, distances_nm: np.ndarray | float) -> np.ndarray:
+        distances = np.asarray(distances_nm, dtype=float)
+        if self.table is None:
+            probabilities = np.interp(distances, self.distances_nm, self.probabilities)
+        else:
+            index = np.rint(distances / self.table_step_nm)
+            np.clip(index, 0, len(self.table) - 1, out=index)
+            probabilities = self.table[index.astype(np.intp)]
+        probabilities = np.where(distances <= 0, 1.0, probabilities)
+        return np.where(distances > self.max_reach_nm, 0.0, probabilities)
+
+
+LinkerModels = dict[str, LinkerModel]
 
 
 def load_layouts() -> dict[str, list[Anchor]]:
@@ -62,7 +142,9 @@ def load_layouts() -> dict[str, list[Anchor]]:
     return dict(layouts)
 
 
-def load_linker_models() -> LinkerModels:
+def load_linker_models(table_step_nm: float | None = None) -> LinkerModels:
+    if table_step_nm is None:
+        table_step_nm = REACH_TABLE_STEP_NM
     if not LINKER_MODEL_CSV.exists():
         raise FileNotFoundError(
             f"{LINKER_MODEL_CSV.name} is missing. Run python3 calibrate_linker_reach.py first."
@@ -78,17 +160,47 @@ def load_linker_models() -> LinkerModels:
                     xs.append(float(key.removeprefix("p_reach_").removesuffix("_nm")))
                     ys.append(float(value))
             order = np.argsort(xs)
-            models[row["construct"]] = (np.asarray(xs)[order], np.asarray(ys)[order])
+            model = LinkerModel(row["construct"], np.asarray(xs)[order], np.asarray(ys)[order])
+            models[row["construct"]] = model.with_table(table_step_nm)
     return models
 
 
 def reach_probability(models: LinkerModels, construct: str, distance_nm: float) -> float:
-    xs, ys = models[construct]
-    if distance_nm <= 0:
-        return 1.0
-    if distance_nm > xs[-1]:
-        return 0.0
-    return float(np.interp(distance_nm, xs, ys))
+    return float(models[construct](distance_nm))
+
+
+def anchor_reach_probabilities(
+    anchors: list[Anchor],
+    linker_models: LinkerModels,
+    distances: np.ndarray,
+) -> np.ndarray:
+    """Evaluate reach probabilities for a distance array with one anchor per row.
+
+    ``distances[..., i, :]`` must hold the distances for ``anchors[i]``. Anchors
+    that share a construct are evaluated together in one vectorized call.
+
+    Anchors may carry ``reach_multiplier`` and ``binding_multiplier`` (for
+    example from an orientation screen). Their construct's curve is then
+    stretched along the distance axis and scaled in height for that anchor
+    only, so oriented anchors still share one base model.
+    """
+    if any("reach_multiplier" in anchor or "binding_multiplier" in anchor for anchor in anchors):
+        reach = np.asarray([float(anchor.get("reach_multiplier", 1.0)) for anchor in anchors])[:, None]
+        binding = np.asarray([float(anchor.get("binding_multiplier", 1.0)) for anchor in anchors])[:, None]
+        plain = [{"linker_construct": anchor["linker_construct"]} for anchor in anchors]
+        return anchor_reach_probabilities(plain, linker_models, distances / reach) * binding
+
+    constructs = [str(anchor["linker_construct"]) for anchor in anchors]
+    unique_constructs = set(constructs)
+    if len(unique_constructs) == 1:
+        return linker_models[constructs[0]](distances)
+
+    probabilities = np.empty(np.shape(distances), dtype=float)
+    construct_array = np.asarray(constructs)
+    for construct in unique_constructs:
+        rows = np.flatnonzero(construct_array == construct)
+        probabilities[..., rows, :] = linker_models[construct](distances[..., rows, :])
+    return probabilities
 
 
 def receptor_count(ev_radius_nm: float, density_per_1000_nm2: float) -> int:
@@ -96,43 +208,134 @@ def receptor_count(ev_radius_nm: float, density_per_1000_nm2: float) -> int:
     return max(1, int(round(lower_hemisphere_area_nm2 * density_per_1000_nm2 / 1000.0)))
 
 
-def random_lower_hemisphere(n: int, radius_nm: float, rng: np.random.Generator) -> np.ndarray:
+def random_lower_hemisphere(
+    n: int | tuple[int, ...], radius_nm: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Uniform points on the lower hemisphere; ``n`` may be a batch shape such as ``(trajectories, receptors)``."""
     theta = rng.uniform(0.0, 2.0 * math.pi, size=n)
     z_unit = -rng.uniform(0.0, 1.0, size=n)
     xy_unit = np.sqrt(np.clip(1.0 - z_unit * z_unit, 0.0, None))
-    return np.column_stack(
+    return np.stack(
         (
             radius_nm * xy_unit * np.cos(theta),
             radius_nm * xy_unit * np.sin(theta),
             radius_nm * z_unit,
-        )
+        ),
+        axis=-1,
     )
 
 
-def max_bipartite_matches(edges: np.ndarray) -> int:
-    if edges.size == 0:
-        return 0
-
-    n_anchors, n_receptors = edges.shape
-    match_to_anchor = np.full(n_receptors, -1, dtype=int)
-    adjacency = [np.flatnonzero(edges[i]) for i in range(n_anchors)]
-
-    def assign(anchor_index: int, seen: np.ndarray) -> bool:
-        for receptor_index in adjacency[anchor_index]:
-            if seen[receptor_index]:
-                continue
-            seen[receptor_index] = True
-            if match_to_anchor[receptor_index] == -1 or assign(match_to_anchor[receptor_index], seen):
-                match_to_anchor[receptor_index] = anchor_index
-                return True
-        return False
+def sample_contact_counts(
+    probabilities: np.ndarray,
+    n_trials: int,
+    rng: np.random.Generator,
+    anchor_major: bool = False,
+) -> np.ndarray:
+    """Draw ``n_trials`` Bernoulli edge matrices at once and return their matching sizes.
+
+    ``anchor_major=True`` draws the uniforms anchor row by anchor row, so anchor
+    ``i`` sees the same numbers however many anchors follow it. Common-random-
+    number comparisons between layouts rely on that.
+    """
+    if anchor_major:
+        draws = np.moveaxis(rng.random((probabilities.shape[0], n_trials) + probabilities.shape[1:]), 0, 1)
+    else:
+        draws = rng.random((n_trials,) + probabilities.shape)
+    return batch_max_bipartite_matches(draws < probabilities).astype(float)
+
+
+def poisson_binomial_tail(probabilities: np.ndarray, k_max: int) -> np.ndarray:
+    """Return P(X >= k) for k = 0..k_max, where X counts successes of independent Bernoulli(p)."""
+    # The last bucket collects every count >= k_max. Zero-probability trials
+    # cannot change the distribution, so they are skipped.
+    pmf = [1.0] + [0.0] * k_max
+    values = np.ravel(probabilities)
+    for p in values[values > 0.0].tolist():
+        q = 1.0 - p
+        saturated = pmf[k_max] + pmf[k_max - 1] * p
+        for k in range(k_max - 1, 0, -1):
+            pmf[k] = pmf[k] * q + pmf[k - 1] * p
+        pmf[0] *= q
+        pmf[k_max] = saturated
+    return np.cumsum(pmf[::-1])[::-1]
+
+
+def greedy_matching_probabilities(probabilities: np.ndarray) -> np.ndarray:
+    """Edge probabilities along a one-to-one matching built most-likely-pair first."""
+    n_anchors, n_receptors = probabilities.shape
+    used_anchors = np.zeros(n_anchors, dtype=bool)
+    used_receptors = np.zeros(n_receptors, dtype=bool)
+    chosen = []
+    for index in np.argsort(-probabilities, axis=None, kind="stable"):
+        anchor_index, receptor_index = divmod(int(index), n_receptors)
+        p = probabilities[anchor_index, receptor_index]
+        if p <= 0.0 or len(chosen) == min(n_anchors, n_receptors):
+            break
+        if used_anchors[anchor_index] or used_receptors[receptor_index]:
+            continue
+        used_anchors[anchor_index] = True
+        used_receptors[receptor_index] = True
+        chosen.append(p)
+    return np.asarray(chosen, dtype=float)
+
+
+def analytic_contact_estimates(probabilities: np.ndarray) -> dict[str, float]:
+    """Sampling-free matching-size estimates for one anchors x receptors probability matrix.
+
+    Upper bound: a matching can never use more receptors (or anchors) than have
+    at least one bound edge, and those coverage counts are Poisson-binomial
+    because edges are independent. Lower bound: the edges of one fixed greedy
+    matching are themselves a matching, so their Poisson-binomial count never
+    exceeds the true maximum. P(at least 1) is exact. The point estimate is the
+    coverage bound, which tracked full Monte Carlo most closely in sparse-contact
+    geometries and overestimates when many anchors compete for few receptors.
+    """
+    k_max = max(CONTACT_THRESHOLD, STRONG_CONTACT_THRESHOLD)
+    receptor_cover = 1.0 - np.prod(1.0 - probabilities, axis=0)
+    anchor_cover = 1.0 - np.prod(1.0 - probabilities, axis=1)
+    greedy = greedy_matching_probabilities(probabilities)
+
+    upper_tail = np.minimum(
+        poisson_binomial_tail(receptor_cover, k_max), poisson_binomial_tail(anchor_cover, k_max)
+    )
+    lower_tail = poisson_binomial_tail(greedy, k_max)
+    upper_mean = float(min(receptor_cover.sum(), anchor_cover.sum()))
+    lower_mean = float(greedy.sum())
+
+    estimates = {
+        "expected_contacts": upper_mean,
+        "expected_contacts_lower": lower_mean,
+        "expected_contacts_upper": upper_mean,
+    }
+    for name, k in (
+        ("p_at_least_1", 1),
+        ("p_at_least_2", 2),
+        ("p_at_least_3", CONTACT_THRESHOLD),
+        ("p_at_least_6", STRONG_CONTACT_THRESHOLD),
+    ):
+        estimates[name] = float(upper_tail[k])
+        estimates[f"{name}_lower"] = float(lower_tail[k]) if k > 1 else float(upper_tail[k])
+        estimates[f"{name}_upper"] = float(upper_tail[k])
+    return estimates
+
+
+def contact_probabilities(
+    anchors: list[Anchor],
+    linker_models: LinkerModels,
+    receptor_points: np.ndarray,
+    ev_radius_nm: float,
+    offset_x_nm: float,
+    offset_y_nm: float,
+) -> np.ndarray:
+    center = np.array([offset_x_nm, offset_y_nm, ev_radius_nm + EV_SURFACE_CLEARANCE_NM])
+    receptors = receptor_points + center
 
-    matches = 0
-    # Anchors with fewer candidate receptors are harder to place, so try them first.
-    for anchor_index in sorted(range(n_anchors), key=lambda i: len(adjacency[i])):
-        if assign(anchor_index, np.zeros(n_receptors, dtype=bool)):
-            matches += 1
-    return matches
+    anchor_xyz = np.asarray(
+        [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in anchors],
+        dtype=float,
+    ).reshape(-1, 3)
+    distances = np.linalg.norm(anchor_xyz[:, None, :] - receptors[None, :, :], axis=2)
+    return anchor_reach_probabilities(anchors, linker_models, distances)
 
 
 def contact_metrics(
@@ -143,23 +346,28 @@ def contact_metrics(
     offset_x_nm: float,
     offset_y_nm: float,
     rng: np.random.Generator,
+    estimator: str = "monte_carlo",
+    anchor_major: bool = False,
 ) -> tuple[float, float, float, float, float, float]:
-    center = np.array([offset_x_nm, offset_y_nm, ev_radius_nm + EV_SURFACE_CLEARANCE_NM])
-    receptors = receptor_points + center
+    probabilities = contact_probabilities(
+        anchors, linker_models, receptor_points, ev_radius_nm, offset_x_nm, offset_y_nm
+    )
+    possible_contacts = float(max_bipartite_matches(probabilities > REACH_EDGE_THRESHOLD))
 
-    probabilities = np.zeros((len(anchors), len(receptors)), dtype=float)
-    for anchor_index, anchor in enumerate(anchors):
-        anchor_xyz = np.array([float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0])
-        distances = np.linalg.norm(receptors - anchor_xyz, axis=1)
-        probabilities[anchor_index, :] = [
-            reach_probability(linker_models, str(anchor["linker_construct"]), float(distance))
-            for distance in distances
-        ]
+    if estimator == "analytic":
+        estimates = analytic_contact_estimates(probabilities)
+        return (
+            estimates["expected_contacts"],
+            possible_contacts,
+            estimates["p_at_least_1"],
+            estimates["p_at_least_2"],
+            estimates["p_at_least_3"],
+            estimates["p_at_least_6"],
+        )
+    if estimator != "monte_carlo":
+        raise ValueError(f"Unknown contact estimator: {estimator}")
 
-    possible_contacts = float(max_bipartite_matches(probabilities > REACH_EDGE_THRESHOLD))
-    sampled_contacts = np.empty(N_BINDING_TRIALS, dtype=float)
-    for trial in range(N_BINDING_TRIALS):
-        sampled_contacts[trial] = max_bipartite_matches(rng.random(probabilities.shape) < probabilities)
+    sampled_contacts = sample_contact_counts(probabilities, N_BINDING_TRIALS, rng, anchor_major)
 
     expected_contacts = float(np.mean(sampled_contacts))
     p_at_least_1 = float(np.mean(sampled_contacts >= 1))
@@ -169,6 +377,28 @@ def contact_metrics(
     return expected_contacts, possible_contacts, p_at_least_1, p_at_least_2, p_at_least_3, p_at_least_6
 
 
+def lateral_offsets() -> np.ndarray:
+    return np.arange(-LATERAL_SCAN_NM, LATERAL_SCAN_NM + 0.001, LATERAL_STEP_NM)
+
+
+def n_geometries(receptor_realizations: int | None = None) -> int:
+    """Geometries per ``score_layout`` call: offset grid x receptor realizations."""
+    if receptor_realizations is None:
+        receptor_realizations = N_RECEPTOR_REALIZATIONS
+    return len(lateral_offsets()) ** 2 * receptor_realizations
+
+
+def common_random_seeds(
+    seed: int, ev_diameter_nm: float, density_name: str, replicate: int = 0
+) -> list[np.random.SeedSequence]:
+    """Per-geometry seeds shared by every layout scored in one EV diameter x density cell."""
+    cell = np.random.SeedSequence(
+        seed,
+        spawn_key=(replicate, int(round(ev_diameter_nm * 1000)), list(CD133_DENSITIES).index(density_name)),
+    )
+    return cell.spawn(n_geometries())
+
+
 def score_layout(
     anchors: list[Anchor],
     linker_models: LinkerModels,
@@ -176,7 +406,34 @@ def score_layout(
     density_per_1000_nm2: float,
     rng: np.random.Generator,
     fixed_receptor_count: int | None = None,
+    estimator: str = "monte_carlo",
+    common_seeds: list[np.random.SeedSequence] | None = None,
+    receptor_realizations: int | None = None,
 ) -> dict[str, float]:
+    """Average capture metrics over lateral EV offsets and receptor realizations.
+
+    ``estimator="monte_carlo"`` samples ``N_BINDING_TRIALS`` binding trials per
+    geometry. ``estimator="analytic"`` replaces those trials with the bounds from
+    ``analytic_contact_estimates`` and also returns ``*_lower``/``*_upper``
+    bracket values; use it to screen many layouts, then re-score finalists with
+    Monte Carlo.
+
+    ``common_seeds`` (one per geometry, see ``common_random_seeds``) switches to
+    common random numbers: each geometry draws its receptor points and binding
+    uniforms from its own seed instead of ``rng``, so every layout scored with
+    the same seeds meets the same EVs and the same trial noise.
+
+    ``receptor_realizations`` overrides ``N_RECEPTOR_REALIZATIONS``; the
+    adaptive sweep scores one realization at a time.
+    """
+    if estimator not in ("monte_carlo", "analytic"):
+        raise ValueError(f"Unknown contact estimator: {estimator}")
+    if receptor_realizations is None:
+        receptor_realizations = N_RECEPTOR_REALIZATIONS
+    if common_seeds is not None and len(common_seeds) != n_geometries(receptor_realizations):
+        raise ValueError(
+            f"Expected {n_geometries(receptor_realizations)} common seeds, got {len(common_seeds)}"
+        )
     ev_radius_nm = ev_diameter_nm / 2.0
     n_receptors = (
         max(1, int(fixed_receptor_count))
@@ -184,20 +441,44 @@ def score_layout(
         else receptor_count(ev_radius_nm, density_per_1000_nm2)
     )
 
-    offsets = np.arange(-LATERAL_SCAN_NM, LATERAL_SCAN_NM + 0.001, LATERAL_STEP_NM)
+    offsets = lateral_offsets()
     expected_contacts = []
     possible_contacts = []
     p1_values = []
     p2_values = []
     p3_values = []
     p6_values = []
+    bound_values: defaultdict[str, list[float]] = defaultdict(list)
     for ox in offsets:
         for oy in offsets:
-            for _ in range(N_RECEPTOR_REALIZATIONS):
+            for _ in range(receptor_realizations):
+                if common_seeds is not None:
+                    rng = np.random.default_rng(common_seeds[len(expected_contacts)])
                 receptor_points = random_lower_hemisphere(n_receptors, ev_radius_nm, rng)
-                expected, possible, p1, p2, p3, p6 = contact_metrics(
-                    anchors, linker_models, receptor_points, ev_radius_nm, ox, oy, rng
-                )
+                if estimator == "analytic":
+                    probabilities = contact_probabilities(
+                        anchors, linker_models, receptor_points, ev_radius_nm, ox, oy
+                    )
+                    estimates = analytic_contact_estimates(probabilities)
+                    for key, value in estimates.items():
+                        bound_values[key].append(value)
+                    expected = estimates["expected_contacts"]
+                    possible = float(max_bipartite_matches(probabilities > REACH_EDGE_THRESHOLD))
+                    p1 = estimates["p_at_least_1"]
+                    p2 = estimates["p_at_least_2"]
+                    p3 = estimates["p_at_least_3"]
+                    p6 = estimates["p_at_least_6"]
+                else:
+                    expected, possible, p1, p2, p3, p6 = contact_metrics(
+                        anchors,
+                        linker_models,
+                        receptor_points,
+                        ev_radius_nm,
+                        ox,
+                        oy,
+                        rng,
+                        anchor_major=common_seeds is not None,
+                    )
                 expected_contacts.append(expected)
                 possible_contacts.append(possible)
                 p1_values.append(p1)
@@ -216,7 +497,7 @@ def score_layout(
     normalized_contacts = min(mean_contacts / 8.0, 1.0)
     capture_score = 0.45 * p3 + 0.35 * p6 + 0.20 * normalized_contacts
 
-    return {
+    metrics = {
         "receptor_count": float(n_receptors),
         "mean_contacts": mean_contacts,
         "max_contacts": max_contacts,
@@ -226,26 +507,35 @@ def score_layout(
         "p_at_least_6_contacts": p6,
         "capture_score": capture_score,
     }
+    if estimator == "analytic":
+        for bound in ("lower", "upper"):
+            metrics[f"mean_contacts_{bound}"] = float(np.mean(bound_values[f"expected_contacts_{bound}"]))
+            metrics[f"p_at_least_1_contact_{bound}"] = float(np.mean(bound_values[f"p_at_least_1_{bound}"]))
+            for k in (2, 3, 6):
+                metrics[f"p_at_least_{k}_contacts_{bound}"] = float(
+                    np.mean(bound_values[f"p_at_least_{k}_{bound}"])
+                )
+    return metrics
 
 
 def write_scores(rows: list[dict[str, str]]) -> None:
     with open(OUT_CSV, "w", newline="", encoding="ascii") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
-                "layout",
-                "aptamer_count",
-                "linker_constructs",
-                "ev_diameter_nm",
-                "cd133_density",
-                "receptor_count",
-                "mean_contacts",
-                "max_contacts",
-                "p_at_least_3_contacts",
-                "p_at_least_6_contacts",
-                "capture_score",
-            ],
-        )
+        fieldnames = [
+            "layout",
+            "aptamer_count",
+            "linker_constructs",
+            "ev_diameter_nm",
+            "cd133_density",
+            "receptor_count",
+            "mean_contacts",
+            "max_contacts",
+            "p_at_least_3_contacts",
+            "p_at_least_6_contacts",
+            "capture_score",
+        ]
+        # Adaptive rows carry their sampling effort and achieved CI as well.
+        fieldnames += [key for key in rows[0] if key not in fieldnames]
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(rows)
 
@@ -308,30 +598,280 @@ def plot_probability(rows: list[dict[str, str]]) -> None:
     plt.close(fig)
 
 
+def score_row(
+    layout: str,
+    anchors: list[Anchor],
+    diameter: float,
+    density_name: str,
+    metrics: dict[str, float],
+) -> dict[str, str]:
+    return {
+        "layout": layout,
+        "aptamer_count": str(len(anchors)),
+        "linker_constructs": ";".join(sorted({str(a["linker_construct"]) for a in anchors})),
+        "ev_diameter_nm": f"{diameter:.0f}",
+        "cd133_density": density_name,
+        "receptor_count": f"{metrics['receptor_count']:.0f}",
+        "mean_contacts": f"{metrics['mean_contacts']:.3f}",
+        "max_contacts": f"{metrics['max_contacts']:.0f}",
+        "p_at_least_3_contacts": f"{metrics['p_at_least_3_contacts']:.4f}",
+        "p_at_least_6_contacts": f"{metrics['p_at_least_6_contacts']:.4f}",
+        "capture_score": f"{metrics['capture_score']:.4f}",
+    }
+
+
+def sweep_jobs(layouts: dict[str, list[Anchor]]) -> list[tuple[str, float, str]]:
+    return [
+        (layout, diameter, density_name)
+        for layout in sorted(layouts)
+        for diameter in EV_DIAMETERS_NM
+        for density_name in CD133_DENSITIES
+    ]
+
+
+def score_sweep_job(
+    job: tuple[str, list[Anchor], LinkerModels, float, str, np.random.SeedSequence, int | None],
+) -> dict[str, str]:
+    layout, anchors, linker_models, diameter, density_name, seed_sequence, common_seed = job
+    rng = np.random.default_rng(seed_sequence)
+    common_seeds = (
+        None if common_seed is None else common_random_seeds(common_seed, diameter, density_name)
+    )
+    metrics = score_layout(
+        anchors, linker_models, diameter, CD133_DENSITIES[density_name], rng, common_seeds=common_seeds
+    )
+    return score_row(layout, anchors, diameter, density_name, metrics)
+
+
+def score_serial(
+    layouts: dict[str, list[Anchor]], linker_models: LinkerModels, seed: int
+) -> list[dict[str, str]]:
+    # Original mode: one generator shared by the whole grid, in grid order.
+    rng = np.random.default_rng(seed)
+    rows: list[dict[str, str]] = []
+    for layout, diameter, density_name in sweep_jobs(layouts):
+        anchors = layouts[layout]
+        metrics = score_layout(anchors, linker_models, diameter, CD133_DENSITIES[density_name], rng)
+        rows.append(score_row(layout, anchors, diameter, density_name, metrics))
+    return rows
+
+
+def score_sweep(
+    layouts: dict[str, list[Anchor]],
+    linker_models: LinkerModels,
+    seed: int,
+    workers: int,
+    common_random_numbers: bool = False,
+) -> list[dict[str, str]]:
+    # Sweep mode: every grid cell gets its own SeedSequence child, spawned in
+    # grid order, so the rows do not depend on how many workers run them. With
+    # common random numbers all layouts in a diameter x density cell share
+    # per-geometry seeds instead.
+    grid = sweep_jobs(layouts)
+    children = np.random.SeedSequence(seed).spawn(len(grid))
+    common_seed = seed if common_random_numbers else None
+    jobs = [
+        (layout, layouts[layout], linker_models, diameter, density_name, child, common_seed)
+        for (layout, diameter, density_name), child in zip(grid, children)
+    ]
+    if workers <= 1:
+        return [score_sweep_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(score_sweep_job, jobs))
+
+
+def adaptive_stopping_rule(half_width: float = ADAPTIVE_CI_HALF_WIDTH) -> StoppingRule:
+    return StoppingRule(
+        half_width=half_width,
+        batch_size=ADAPTIVE_BATCH_REALIZATIONS,
+        min_batches=ADAPTIVE_MIN_BATCHES,
+        max_batches=ADAPTIVE_MAX_BATCHES,
+    )
+
+
+def pool_realization_metrics(metrics: list[dict[str, float]]) -> dict[str, float]:
+    """Combine single-realization ``score_layout`` results into one metrics dict."""
+    pooled = {key: float(np.mean([m[key] for m in metrics])) for key in metrics[0]}
+    pooled["max_contacts"] = float(np.max([m["max_contacts"] for m in metrics]))
+    return pooled
+
+
+def score_adaptive(
+    layouts: dict[str, list[Anchor]],
+    linker_models: LinkerModels,
+    seed: int,
+    rule: StoppingRule,
+    top_k: int = ADAPTIVE_TOP_K,
+) -> list[dict[str, str]]:
+    """Race the layouts in every diameter x density cell on single-realization capture scores.
+
+    Each sample is ``score_layout`` over the full offset grid for one receptor
+    realization. Every layout draws from its own SeedSequence child, so its
+    samples do not depend on when the others stop.
+    """
+    cells = [(diameter, density_name) for diameter in EV_DIAMETERS_NM for density_name in CD133_DENSITIES]
+    names = sorted(layouts)
+    by_key: dict[tuple[str, float, str], dict[str, str]] = {}
+    for (diameter, density_name), cell_seed in zip(cells, np.random.SeedSequence(seed).spawn(len(cells))):
+        density = CD133_DENSITIES[density_name]
+        rngs = {name: np.random.default_rng(child) for name, child in zip(names, cell_seed.spawn(len(names)))}
+        realizations: dict[str, list[dict[str, float]]] = {name: [] for name in names}
+
+        def sampler(name: str):
+            def draw(batch_index: int) -> np.ndarray:
+                batch = [
+                    score_layout(
+                        layouts[name], linker_models, diameter, density, rngs[name], receptor_realizations=1
+                    )
+                    for _ in range(rule.batch_size)
+                ]
+                realizations[name].extend(batch)
+                return np.asarray([metrics["capture_score"] for metrics in batch])
+
+            return draw
+
+        estimates = race({name: sampler(name) for name in names}, rule, top_k)
+        for name in names:
+            metrics = pool_realization_metrics(realizations[name])
+            row = score_row(name, layouts[name], diameter, density_name, metrics)
+            estimate = estimates[name]
+            row["receptor_realizations"] = str(estimate.evaluations)
+            row["capture_score_ci_half_width"] = f"{estimate.half_width:.4f}"
+            row["sampling_status"] = estimate.status
+            by_key[(name, diameter, density_name)] = row
+        print(
+            f"Adaptive EV={diameter:.0f} density={density_name}: "
+            + ", ".join(f"{name}={estimates[name].evaluations}" for name in names),
+            flush=True,
+        )
+    return [by_key[job] for job in sweep_jobs(layouts)]
+
+
+def paired_variance_reduction(
+    common: list[dict[str, float]], independent: list[dict[str, float]], reference: str
+) -> dict[str, object]:
+    """Variance of score differences to ``reference``, paired (common) vs independent streams.
+
+    ``common`` and ``independent`` hold one ``{layout: capture_score}`` dict per
+    replicate. A ratio above 1 is how many times fewer replicates a
+    common-random-number comparison needs for the same precision.
+    """
+    pairs = []
+    for layout in sorted(common[0]):
+        if layout == reference:
+            continue
+        common_diff = np.asarray([scores[layout] - scores[reference] for scores in common])
+        independent_diff = np.asarray([scores[layout] - scores[reference] for scores in independent])
+        common_var = float(np.var(common_diff, ddof=1))
+        independent_var = float(np.var(independent_diff, ddof=1))
+        pairs.append(
+            {
+                "layout": layout,
+                "mean_difference_common": round(float(common_diff.mean()), 6),
+                "mean_difference_independent": round(float(independent_diff.mean()), 6),
+                "difference_variance_common": common_var,
+                "difference_variance_independent": independent_var,
+                "variance_reduction_ratio": (
+                    round(independent_var / common_var, 3) if common_var > 0.0 else None
+                ),
+            }
+        )
+    ratios = [pair["variance_reduction_ratio"] for pair in pairs]
+    ratios = [ratio for ratio in ratios if ratio is not None]
+    return {
+        "reference_layout": reference,
+        "replicates": len(common),
+        "median_variance_reduction_ratio": round(float(np.median(ratios)), 3) if ratios else None,
+        "pairs": pairs,
+    }
+
+
+def common_random_numbers_study(
+    layouts: dict[str, list[Anchor]],
+    linker_models: LinkerModels,
+    seed: int,
+    replicates: int,
+    reference: str,
+) -> dict[str, object]:
+    """Re-score every layout in ``CRN_VARIANCE_CELL`` with common and with independent streams."""
+    diameter, density_name = CRN_VARIANCE_CELL
+    density = CD133_DENSITIES[density_name]
+    common: list[dict[str, float]] = []
+    independent: list[dict[str, float]] = []
+    for replicate in range(replicates):
+        seeds = common_random_seeds(seed, diameter, density_name, replicate)
+        common.append(
+            {
+                layout: score_layout(
+                    anchors, linker_models, diameter, density, np.random.default_rng(0), common_seeds=seeds
+                )["capture_score"]
+                for layout, anchors in layouts.items()
+            }
+        )
+        independent.append(
+            {
+                layout: score_layout(
+                    anchors, linker_models, diameter, density, np.random.default_rng([seed, replicate, index])
+                )["capture_score"]
+                for index, (layout, anchors) in enumerate(sorted(layouts.items()))
+            }
+        )
+        print(f"CRN replicate {replicate + 1}/{replicates}", flush=True)
+    study = paired_variance_reduction(common, independent, reference)
+    study["ev_diameter_nm"] = diameter
+    study["cd133_density"] = density_name
+    return study
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="score the layout x diameter x density grid as independent seeded jobs on this many processes "
+        "(not with --adaptive, which races layouts sequentially)",
+    )
+    parser.add_argument("--seed", type=int, default=RNG_SEED, help="root random seed")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--crn",
+        action="store_true",
+        help="common random numbers: every layout sees the same receptor realizations and binding uniforms",
+    )
+    parser.add_argument(
+        "--crn-replicates",
+        type=int,
+        default=CRN_REPLICATES,
+        help="replicates for the paired-difference variance study in --crn mode (below 2 skips it)",
+    )
+    modes.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="draw receptor realizations per cell until the capture-score CI is narrow or the layout "
+        "is raced out of the top k",
+    )
+    parser.add_argument("--ci-half-width", type=float, default=ADAPTIVE_CI_HALF_WIDTH)
+    parser.add_argument("--top-k", type=int, default=ADAPTIVE_TOP_K)
+    args = parser.parse_args()
+    if args.adaptive and args.workers is not None:
+        parser.error("--workers cannot be combined with --adaptive")
+    return args
+
+
 def main() -> None:
+    args = parse_args()
     layouts = load_layouts()
     linker_models = load_linker_models()
-    rng = np.random.default_rng(RNG_SEED)
-    rows: list[dict[str, str]] = []
-    for layout, anchors in sorted(layouts.items()):
-        for diameter in EV_DIAMETERS_NM:
-            for density_name, density_per_1000_nm2 in CD133_DENSITIES.items():
-                metrics = score_layout(anchors, linker_models, diameter, density_per_1000_nm2, rng)
-                rows.append(
-                    {
-                        "layout": layout,
-                        "aptamer_count": str(len(anchors)),
-                        "linker_constructs": ";".join(sorted({str(a["linker_construct"]) for a in anchors})),
-                        "ev_diameter_nm": f"{diameter:.0f}",
-                        "cd133_density": density_name,
-                        "receptor_count": f"{metrics['receptor_count']:.0f}",
-                        "mean_contacts": f"{metrics['mean_contacts']:.3f}",
-                        "max_contacts": f"{metrics['max_contacts']:.0f}",
-                        "p_at_least_3_contacts": f"{metrics['p_at_least_3_contacts']:.4f}",
-                        "p_at_least_6_contacts": f"{metrics['p_at_least_6_contacts']:.4f}",
-                        "capture_score": f"{metrics['capture_score']:.4f}",
-                    }
-                )
+    if args.adaptive:
+        rule = adaptive_stopping_rule(args.ci_half_width)
+        rows = score_adaptive(layouts, linker_models, args.seed, rule, args.top_k)
+    elif args.crn:
+        rows = score_sweep(layouts, linker_models, args.seed, args.workers or 1, common_random_numbers=True)
+    elif args.workers is None:
+        rows = score_serial(layouts, linker_models, args.seed)
+    else:
+        rows = score_sweep(layouts, linker_models, args.seed, args.workers)
 
     write_scores(rows)
     plot_heatmap(rows)
@@ -348,7 +888,7 @@ def main() -> None:
         "receptor_realizations": N_RECEPTOR_REALIZATIONS,
         "binding_trials_per_realization": N_BINDING_TRIALS,
         "receptor_occupancy": "finite one-to-one aptamer/CD133 matching",
-        "rng_seed": RNG_SEED,
+        "rng_seed": args.seed,
         "best_overall": best,
         "notes": [
             "Scores are not binding free energies.",
@@ -357,6 +897,27 @@ def main() -> None:
             "Use LAMMPS or HOOMD-blue next for dynamic EV capture.",
         ],
     }
+    if args.adaptive:
+        summary["adaptive_sampling"] = {
+            "sample": "capture score of one receptor realization over the full lateral offset grid",
+            "target_ci_half_width": rule.half_width,
+            "confidence": 0.95,
+            "batch_realizations": rule.batch_size,
+            "min_batches": rule.min_batches,
+            "max_batches": rule.max_batches,
+            "top_k_per_cell": args.top_k,
+            "total_receptor_realizations": sum(int(row["receptor_realizations"]) for row in rows),
+            "fixed_design_receptor_realizations": len(rows) * N_RECEPTOR_REALIZATIONS,
+        }
+    if args.crn:
+        summary["common_random_numbers"] = {
+            "scheme": "per-geometry seeds shared by all layouts in each EV diameter x density cell; "
+            "binding uniforms drawn anchor-major",
+        }
+        if args.crn_replicates > 1:
+            summary["common_random_numbers"]["variance_study"] = common_random_numbers_study(
+                layouts, linker_models, args.seed, args.crn_replicates, best["layout"]
+            )
     OUT_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
 
     print(f"Wrote {OUT_CSV.name}")
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
-"""Score matched random-layout controls for the EV capture geometry screen."""
+"""Score matched random-layout controls for the EV capture geometry screen.
+
+With ``--crn`` the controls are scored with common random numbers: the same
+per-geometry seeds that ``score_ev_capture_geometry.py --crn`` gives the
+designed layouts, so a design and its matched controls meet identical EVs and
+binding-trial noise.
+"""
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 from pathlib import Path
@@ -14,6 +21,7 @@ from score_ev_capture_geometry import (
     CD133_DENSITIES,
     EV_DIAMETERS_NM,
     RNG_SEED,
+    common_random_seeds,
     load_linker_models,
     load_layouts,
     score_layout,
@@ -69,7 +77,21 @@ def summarize_replicates(rows: list[dict[str, float]]) -> dict[str, float]:
     }
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--crn",
+        action="store_true",
+        help="score controls with the common random numbers of score_ev_capture_geometry.py --crn",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=RNG_SEED, help="common-random-number seed; match the designed-layout run"
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     linker_models = load_linker_models()
     designed_layouts = load_layouts()
     best_designed = matched_designed_scores()
@@ -87,6 +109,9 @@ def main() -> None:
     for aptamer_count, replicate_layouts in sorted(control_layouts.items()):
         for diameter in EV_DIAMETERS_NM:
             for density_name, density_per_1000_nm2 in CD133_DENSITIES.items():
+                common_seeds = (
+                    common_random_seeds(args.seed, diameter, density_name) if args.crn else None
+                )
                 replicate_metrics = [
                     score_layout(
                         control_anchors,
@@ -94,6 +119,7 @@ def main() -> None:
                         diameter,
                         density_per_1000_nm2,
                         rng,
+                        common_seeds=common_seeds,
                     )
                     for control_anchors in replicate_layouts
                 ]
@@ -139,6 +165,14 @@ def main() -> None:
             "Positive score deltas mean the best designed layout for the same aptamer count, EV size, and density outscored the matched random control.",
         ],
     }
+    if args.crn:
+        # Under common random numbers the replicate spread is due to anchor
+        # positions alone, not to sampling noise.
+        summary["common_random_numbers"] = {
+            "seed": args.seed,
+            "paired_with": "ev_capture_scores.csv from score_ev_capture_geometry.py --crn with the same seed",
+            "mean_capture_score_sd": round(float(np.mean([float(row["capture_score_sd"]) for row in rows])), 6),
+        }
     OUT_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
 
     print(f"Wrote {OUT_CSV.name}")
@@ -12,7 +12,9 @@ useful for capture.
 
 This is a simplified orientation model, not a full molecular simulation. It
 adds an honest penalty for attachment sites that are not predicted to face the
-EV well.
+EV well. Orientation is applied as per-aptamer reach and binding multipliers
+on the shared linker curve, so scoring an oriented layout costs the same as
+scoring the plain one.
 """
 
 from __future__ import annotations
@@ -21,6 +23,7 @@ import csv
 import json
 import math
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 
 import matplotlib
@@ -31,7 +34,7 @@ import numpy as np
 
 import score_ev_capture_geometry as scg
 from score_ev_capture_clinical_73nm import enrich_sparse_metrics
-from score_ev_capture_geometry import load_linker_models, score_layout
+from score_ev_capture_geometry import LinkerModels, load_linker_models, score_layout
 
 ROOT = Path(__file__).resolve().parent
 IN_MAPPED = ROOT / "origami_lattice_mapped_layouts.csv"
@@ -54,7 +57,6 @@ GOOD_UP_SCORE = 0.75
 WEAK_UP_SCORE = 0.45
 
 Anchor = dict[str, float | str]
-LinkerModels = dict[str, tuple[np.ndarray, np.ndarray]]
 
 
 def read_mapped_layouts() -> dict[str, list[Anchor]]:
@@ -83,12 +85,13 @@ def orientation_metrics(anchor: Anchor) -> dict[str, float | str]:
     1 means strongly upward-facing.
     0 means strongly downward/blocked-facing.
     """
-    helix_id = int(anchor["helix_id"])
-    base_index = int(anchor["base_index"])
-    phase = (
-        2.0 * math.pi * ((base_index % REGISTER_COUNT) / REGISTER_COUNT)
-        + HELIX_STAGGER_RADIANS * (helix_id % 2)
-    )
+    return dict(register_orientation(int(anchor["helix_id"]) % 2, int(anchor["base_index"]) % REGISTER_COUNT))
+
+
+@lru_cache(maxsize=None)
+def register_orientation(helix_parity: int, register: int) -> dict[str, float | str]:
+    """Orientation metrics shared by every site in one (helix parity, register) class."""
+    phase = 2.0 * math.pi * (register / REGISTER_COUNT) + HELIX_STAGGER_RADIANS * helix_parity
     up_score = 0.5 + 0.5 * math.cos(phase)
     if up_score >= GOOD_UP_SCORE:
         class_name = "up_facing"
@@ -109,28 +112,18 @@ def orientation_metrics(anchor: Anchor) -> dict[str, float | str]:
     }
 
 
-def oriented_linker_models(
-    anchors: list[Anchor],
-    base_models: LinkerModels,
-    layout_name: str,
-) -> tuple[list[Anchor], LinkerModels, list[dict[str, str]]]:
-    models = dict(base_models)
+def orient_anchors(anchors: list[Anchor], layout_name: str) -> tuple[list[Anchor], list[dict[str, str]]]:
+    """Attach orientation multipliers to each anchor; score the result with the base linker models."""
     oriented: list[Anchor] = []
     rows: list[dict[str, str]] = []
 
     for anchor in anchors:
         metrics = orientation_metrics(anchor)
-        base_construct = str(anchor["linker_construct"])
-        xs, ys = base_models[base_construct]
-        construct_name = f"{layout_name}_anchor_{int(anchor['anchor_id'])}"
-        models[construct_name] = (
-            xs * float(metrics["reach_multiplier"]),
-            ys * float(metrics["binding_multiplier"]),
-        )
         oriented_anchor = {
             **anchor,
-            "linker_construct": construct_name,
             "linker_reach_nm": float(anchor["linker_reach_nm"]) * float(metrics["reach_multiplier"]),
+            "reach_multiplier": float(metrics["reach_multiplier"]),
+            "binding_multiplier": float(metrics["binding_multiplier"]),
         }
         oriented.append(oriented_anchor)
         rows.append(
@@ -148,7 +141,7 @@ def oriented_linker_models(
                 "binding_multiplier": f"{float(metrics['binding_multiplier']):.4f}",
             }
         )
-    return oriented, models, rows
+    return oriented, rows
 
 
 def sparse_score_average(layout: list[Anchor], linker_models: LinkerModels) -> dict[str, float]:
@@ -257,10 +250,10 @@ def main() -> None:
 
     for layout_name, anchors in layouts.items():
         unoriented = sparse_score_average(anchors, base_models)
-        oriented, oriented_models, rows = oriented_linker_models(anchors, base_models, layout_name)
+        oriented, rows = orient_anchors(anchors, layout_name)
         oriented_layouts[layout_name] = oriented
         anchor_rows.extend(rows)
-        oriented_score = sparse_score_average(oriented, oriented_models)
+        oriented_score = sparse_score_average(oriented, base_models)
 
         up_scores = np.asarray([float(row["up_score"]) for row in rows])
         class_counts = {
@@ -15,6 +15,9 @@ Definitions used here:
 The constants below are screening assumptions, not hard experimental laws.
 They make the design search more honest by penalizing patterns that are too
 packed, too edge-heavy, or too overloaded with aptamers.
+
+``batch_buildability_metrics`` scores many layouts in one call, so a layout
+search can use buildability while it runs instead of only afterwards.
 """
 
 from __future__ import annotations
@@ -50,6 +53,9 @@ COMFORTABLE_EDGE_MARGIN_NM = 5.0
 LOCAL_CROWDING_RADIUS_NM = 12.0
 MAX_COMFORTABLE_LOCAL_NEIGHBORS = 4
 MAX_COMFORTABLE_APTAMERS = 24
+# Layouts with more anchors than this (for example repeated-tile fields) use a
+# sorted sweep instead of a dense anchor-by-anchor distance matrix.
+DENSE_NEIGHBOR_MAX_ANCHORS = 512
 
 
 def read_best_capture_scores() -> dict[tuple[str, str], dict[str, str]]:
@@ -60,48 +66,120 @@ def read_best_capture_scores() -> dict[tuple[str, str], dict[str, str]]:
     return {(row["layout"], row["formulation"]): row for row in rows}
 
 
-def pairwise_distances(xy: np.ndarray) -> np.ndarray:
-    delta = xy[:, None, :] - xy[None, :, :]
-    distances = np.sqrt(np.sum(delta * delta, axis=2))
-    np.fill_diagonal(distances, np.inf)
-    return distances
-
-
-def clamp01(value: float) -> float:
-    return max(0.0, min(1.0, value))
+def pad_layouts(layouts: list[list[dict[str, float | str]]]) -> tuple[np.ndarray, np.ndarray]:
+    """Stack layouts into ``(n_layouts, max_anchors, 2)`` coordinates and a matching anchor mask."""
+    max_anchors = max((len(layout) for layout in layouts), default=0)
+    xy = np.zeros((len(layouts), max_anchors, 2))
+    mask = np.zeros((len(layouts), max_anchors), dtype=bool)
+    for i, layout in enumerate(layouts):
+        xy[i, : len(layout)] = [[float(anchor["x_nm"]), float(anchor["y_nm"])] for anchor in layout]
+        mask[i, : len(layout)] = True
+    return xy, mask
+
+
+def dense_neighbor_stats(xy: np.ndarray, mask: np.ndarray, radius_nm: float) -> tuple[np.ndarray, np.ndarray]:
+    """Nearest-neighbour distance and neighbours closer than ``radius_nm`` for padded layouts.
+
+    Both results are ``(n_layouts, max_anchors)``; padded anchors get an
+    infinite distance and zero neighbours.
+    """
+    dx = xy[:, :, None, 0] - xy[:, None, :, 0]
+    dy = xy[:, :, None, 1] - xy[:, None, :, 1]
+    distances = np.sqrt(dx * dx + dy * dy)
+    pairs = mask[:, :, None] & mask[:, None, :] & ~np.eye(xy.shape[1], dtype=bool)
+    distances[~pairs] = np.inf
+    return np.min(distances, axis=2, initial=np.inf), np.sum(distances < radius_nm, axis=2)
+
+
+def sweep_neighbor_stats(xy: np.ndarray, radius_nm: float) -> tuple[np.ndarray, np.ndarray]:
+    """Nearest-neighbour distance and neighbours closer than ``radius_nm`` for one large point set.
+
+    Points are sorted by x and each is compared with its k-th successor for
+    k = 1, 2, ... A pair is measured only while its x gap could still be
+    inside the radius or beat either point's nearest neighbour so far, so a
+    spread-out field costs a few passes over the points instead of n^2 pairs.
+    """
+    order = np.argsort(xy[:, 0], kind="stable")
+    x = xy[order, 0]
+    y = xy[order, 1]
+    nearest = np.full(len(x), np.inf)
+    counts = np.zeros(len(x), dtype=int)
+    for k in range(1, len(x)):
+        gap = x[k:] - x[:-k]
+        first = np.flatnonzero((gap < radius_nm) | (gap < nearest[:-k]) | (gap < nearest[k:]))
+        if len(first) == 0:
+            # Gaps only grow with k, so no later pair can matter either.
+            break
+        second = first + k
+        dx = x[first] - x[second]
+        dy = y[first] - y[second]
+        distances = np.sqrt(dx * dx + dy * dy)
+        nearest[first] = np.minimum(nearest[first], distances)
+        nearest[second] = np.minimum(nearest[second], distances)
+        counts[first] += distances < radius_nm
+        counts[second] += distances < radius_nm
+    out_nearest = np.empty_like(nearest)
+    out_counts = np.empty_like(counts)
+    out_nearest[order] = nearest
+    out_counts[order] = counts
+    return out_nearest, out_counts
+
+
+def batch_buildability_metrics(xy: np.ndarray, mask: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """``buildability_metrics`` for padded ``(n_layouts, max_anchors, 2)`` coordinates, one array per key."""
+    xy = np.asarray(xy, dtype=float)
+    mask = np.ones(xy.shape[:2], dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    aptamer_count = np.sum(mask, axis=1)
+    if np.any(aptamer_count == 0):
+        raise ValueError("Cannot score the buildability of a layout without anchors")
+
+    if xy.shape[1] <= DENSE_NEIGHBOR_MAX_ANCHORS:
+        nearest, local_neighbor_counts = dense_neighbor_stats(xy, mask, LOCAL_CROWDING_RADIUS_NM)
+    else:
+        nearest = np.full(mask.shape, np.inf)
+        local_neighbor_counts = np.zeros(mask.shape, dtype=int)
+        for i in range(len(xy)):
+            nearest[i, mask[i]], local_neighbor_counts[i, mask[i]] = sweep_neighbor_stats(
+                xy[i, mask[i]], LOCAL_CROWDING_RADIUS_NM
+            )
 
+    edge_margins = np.where(
+        mask,
+        np.minimum(TILE_WIDTH_NM / 2.0 - np.abs(xy[:, :, 0]), TILE_HEIGHT_NM / 2.0 - np.abs(xy[:, :, 1])),
+        np.inf,
+    )
 
-def buildability_metrics(layout: list[dict[str, float | str]]) -> dict[str, float]:
-    xy = np.asarray([[float(anchor["x_nm"]), float(anchor["y_nm"])] for anchor in layout])
-    distances = pairwise_distances(xy)
-    nearest = np.min(distances, axis=1)
+    hard_spacing_violations = np.sum(nearest < HARD_MIN_SPACING_NM, axis=1)
+    crowding_violations = np.sum(nearest < COMFORTABLE_SPACING_NM, axis=1)
+    edge_violations = np.sum(edge_margins < COMFORTABLE_EDGE_MARGIN_NM, axis=1)
+    max_local_neighbors = np.max(local_neighbor_counts, axis=1)
+
+    min_spacing = np.min(nearest, axis=1)
+    # Padded anchors sort to the end (infinite distance), so the median of the
+    # real anchors sits at the same positions as in an unpadded layout.
+    ordered = np.sort(nearest, axis=1)
+    rows = np.arange(len(xy))
+    median_spacing = np.where(
+        aptamer_count % 2 == 1,
+        ordered[rows, aptamer_count // 2],
+        (ordered[rows, (aptamer_count - 1) // 2] + ordered[rows, aptamer_count // 2]) / 2.0,
+    )
+    min_edge_margin = np.min(edge_margins, axis=1)
 
-    edge_margins = np.minimum(
-        TILE_WIDTH_NM / 2.0 - np.abs(xy[:, 0]),
-        TILE_HEIGHT_NM / 2.0 - np.abs(xy[:, 1]),
+    spacing_score = np.clip(
+        (median_spacing - HARD_MIN_SPACING_NM) / (COMFORTABLE_SPACING_NM - HARD_MIN_SPACING_NM), 0.0, 1.0
     )
-    local_neighbor_counts = np.sum(distances < LOCAL_CROWDING_RADIUS_NM, axis=1)
-
-    hard_spacing_violations = int(np.sum(nearest < HARD_MIN_SPACING_NM))
-    crowding_violations = int(np.sum(nearest < COMFORTABLE_SPACING_NM))
-    edge_violations = int(np.sum(edge_margins < COMFORTABLE_EDGE_MARGIN_NM))
-    max_local_neighbors = int(np.max(local_neighbor_counts))
-
-    min_spacing = float(np.min(nearest))
-    median_spacing = float(np.median(nearest))
-    min_edge_margin = float(np.min(edge_margins))
-    aptamer_count = len(layout)
-
-    spacing_score = clamp01((median_spacing - HARD_MIN_SPACING_NM) / (COMFORTABLE_SPACING_NM - HARD_MIN_SPACING_NM))
-    if hard_spacing_violations:
-        spacing_score *= 0.65 ** hard_spacing_violations
-
-    edge_score = clamp01(min_edge_margin / COMFORTABLE_EDGE_MARGIN_NM)
-    local_score = clamp01(
-        1.0 - max(0, max_local_neighbors - MAX_COMFORTABLE_LOCAL_NEIGHBORS)
-        / MAX_COMFORTABLE_LOCAL_NEIGHBORS
+    # Python's float power, to match the single-layout score bit for bit.
+    spacing_score = spacing_score * np.asarray([0.65 ** int(count) for count in hard_spacing_violations])
+
+    edge_score = np.clip(min_edge_margin / COMFORTABLE_EDGE_MARGIN_NM, 0.0, 1.0)
+    local_score = np.clip(
+        1.0 - np.maximum(0, max_local_neighbors - MAX_COMFORTABLE_LOCAL_NEIGHBORS)
+        / MAX_COMFORTABLE_LOCAL_NEIGHBORS,
+        0.0,
+        1.0,
     )
-    count_score = clamp01(1.0 - max(0, aptamer_count - MAX_COMFORTABLE_APTAMERS) / 12.0)
+    count_score = np.clip(1.0 - np.maximum(0, aptamer_count - MAX_COMFORTABLE_APTAMERS) / 12.0, 0.0, 1.0)
 
     # Weighted average: spacing matters most because crowding is the most direct
     # way to make aptamers interfere with each other on a small tile.
@@ -113,14 +191,14 @@ def buildability_metrics(layout: list[dict[str, float | str]]) -> dict[str, floa
     )
 
     return {
-        "aptamer_count": float(aptamer_count),
+        "aptamer_count": aptamer_count.astype(float),
         "min_spacing_nm": min_spacing,
         "median_nearest_spacing_nm": median_spacing,
-        "hard_spacing_violations": float(hard_spacing_violations),
-        "crowding_violations": float(crowding_violations),
+        "hard_spacing_violations": hard_spacing_violations.astype(float),
+        "crowding_violations": crowding_violations.astype(float),
         "min_edge_margin_nm": min_edge_margin,
-        "edge_violations": float(edge_violations),
-        "max_local_neighbors": float(max_local_neighbors),
+        "edge_violations": edge_violations.astype(float),
+        "max_local_neighbors": max_local_neighbors.astype(float),
         "spacing_score": spacing_score,
         "local_crowding_score": local_score,
         "edge_score": edge_score,
@@ -129,6 +207,10 @@ def buildability_metrics(layout: list[dict[str, float | str]]) -> dict[str, floa
     }
 
 
+def buildability_metrics(layout: list[dict[str, float | str]]) -> dict[str, float]:
+    return {key: float(values[0]) for key, values in batch_buildability_metrics(*pad_layouts([layout])).items()}
+
+
 def fmt(value: float) -> str:
     if math.isclose(value, round(value)):
         return str(int(round(value)))
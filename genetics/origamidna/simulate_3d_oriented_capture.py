@@ -16,10 +16,15 @@ Definitions:
 This is still a coarse model. It is not a full oxDNA molecular simulation, but
 it is a real 3D geometry screen: receptors must be close enough and in the
 right direction from the aptamer.
+
+All anchor/receptor pairs of every offset and receptor realization are scored
+as one array, so ``--full-resolution`` can afford the 2D screen's lateral step
+and binding-trial count.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 import math
@@ -32,15 +37,17 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bipartite_matching import batch_max_bipartite_matches
 from ev_population_generator import receptor_points
+import score_ev_capture_geometry as scg
 from score_ev_capture_geometry import (
     EV_SURFACE_CLEARANCE_NM,
     RNG_SEED,
+    LinkerModels,
+    anchor_reach_probabilities,
     load_linker_models,
-    max_bipartite_matches,
-    reach_probability,
 )
-from score_lattice_orientation import REGISTER_COUNT, HELIX_STAGGER_RADIANS
+from score_lattice_orientation import orientation_metrics
 
 ROOT = Path(__file__).resolve().parent
 IN_ORIENTED = ROOT / "orientation_optimized_mapped_layouts.csv"
@@ -66,7 +73,6 @@ MIN_DIRECTIONAL_PROBABILITY = 0.08
 SEED = RNG_SEED + 909
 
 Anchor = dict[str, float | str]
-LinkerModels = dict[str, tuple[np.ndarray, np.ndarray]]
 
 
 def read_orientation_optimized_layouts() -> dict[str, list[Anchor]]:
@@ -90,38 +96,42 @@ def read_orientation_optimized_layouts() -> dict[str, list[Anchor]]:
     return dict(layouts)
 
 
+def anchor_directions(anchors: list[Anchor]) -> np.ndarray:
+    """Simple 3D direction vectors for aptamer attachment sites, shaped ``(n_anchors, 3)``."""
+    # The register phase is the one the lattice orientation screen uses.
+    phase = np.asarray([float(orientation_metrics(anchor)["phase_radians"]) for anchor in anchors])
+    # Treat each helix as running along x; the surface normal rotates in y/z.
+    vectors = np.column_stack((np.zeros(len(anchors)), np.sin(phase), np.cos(phase)))
+    # Linkers are flexible, so a poor register can bend upward somewhat, but it
+    # starts at a disadvantage.
+    vectors[:, 2] = np.where(vectors[:, 2] < 0, vectors[:, 2] * 0.35, vectors[:, 2])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
 def direction_vector(anchor: Anchor) -> np.ndarray:
     """Return a simple 3D direction vector for an aptamer attachment site."""
-    helix_id = int(anchor["helix_id"])
-    base_index = int(anchor["base_index"])
-    phase = (
-        2.0 * math.pi * ((base_index % REGISTER_COUNT) / REGISTER_COUNT)
-        + HELIX_STAGGER_RADIANS * (helix_id % 2)
-    )
-    # Treat each helix as running along x; the surface normal rotates in y/z.
-    vector = np.array([0.0, math.sin(phase), math.cos(phase)], dtype=float)
-    if vector[2] < 0:
-        # Linkers are flexible, so a poor register can bend upward somewhat,
-        # but it starts at a disadvantage.
-        vector[2] *= 0.35
-    vector /= np.linalg.norm(vector)
-    return vector
-
-
-def angular_factor(anchor_to_receptor: np.ndarray, direction: np.ndarray) -> float:
-    distance = float(np.linalg.norm(anchor_to_receptor))
-    if distance <= 1e-9:
-        return 1.0
-    cos_angle = float(np.dot(anchor_to_receptor / distance, direction))
+    return anchor_directions([anchor])[0]
+
+
+def angular_factors(vectors: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """Directional binding factor for a ``(..., n_anchors, n_receptors, 3)`` tensor of anchor-to-receptor vectors.
+
+    1 inside the reach cone, ``MIN_DIRECTIONAL_PROBABILITY`` beyond the soft
+    outer angle, and linear in the cosine in between.
+    """
     cos_inner = math.cos(math.radians(REACH_CONE_HALF_ANGLE_DEG))
     cos_outer = math.cos(math.radians(SOFT_OUTER_ANGLE_DEG))
-    if cos_angle >= cos_inner:
-        return 1.0
-    if cos_angle <= cos_outer:
-        return MIN_DIRECTIONAL_PROBABILITY
-    return MIN_DIRECTIONAL_PROBABILITY + (1.0 - MIN_DIRECTIONAL_PROBABILITY) * (
+    # Dot products go through matmul, which rounds like a per-pair np.dot and
+    # so keeps earlier results; a plain sum over the last axis does not.
+    rows = vectors[..., None, :]
+    distances = np.sqrt((rows @ vectors[..., :, None])[..., 0, 0])
+    safe = np.where(distances <= 1e-9, 1.0, distances)
+    cos_angle = (rows / safe[..., None, None] @ directions[:, None, :, None])[..., 0, 0]
+    ramp = MIN_DIRECTIONAL_PROBABILITY + (1.0 - MIN_DIRECTIONAL_PROBABILITY) * (
         (cos_angle - cos_outer) / (cos_inner - cos_outer)
     )
+    factors = np.where(cos_angle >= cos_inner, 1.0, np.where(cos_angle <= cos_outer, MIN_DIRECTIONAL_PROBABILITY, ramp))
+    return np.where(distances <= 1e-9, 1.0, factors)
 
 
 def probability_matrix(
@@ -129,47 +139,15 @@ def probability_matrix(
     receptors: np.ndarray,
     linker_models: LinkerModels,
 ) -> np.ndarray:
-    probabilities = np.zeros((len(anchors), len(receptors)), dtype=float)
-    for i, anchor in enumerate(anchors):
-        anchor_xyz = np.array(
-            [float(anchor["x_nm"]), float(anchor["y_nm"]), float(anchor["z_nm"])],
-            dtype=float,
-        )
-        direction = direction_vector(anchor)
-        for j, receptor_xyz in enumerate(receptors):
-            vector = receptor_xyz - anchor_xyz
-            distance = float(np.linalg.norm(vector))
-            reach = reach_probability(linker_models, str(anchor["linker_construct"]), distance)
-            probabilities[i, j] = reach * angular_factor(vector, direction)
-    return probabilities
-
+    """Reach times angular factor for every anchor and receptor.
 
-def contact_metrics_3d(
-    anchors: list[Anchor],
-    receptor_body: np.ndarray,
-    ev_radius_nm: float,
-    offset_x_nm: float,
-    offset_y_nm: float,
-    linker_models: LinkerModels,
-    rng: np.random.Generator,
-) -> tuple[float, float, float, float, float]:
-    center = np.array(
-        [offset_x_nm, offset_y_nm, ev_radius_nm + EV_SURFACE_CLEARANCE_NM],
-        dtype=float,
-    )
-    receptors = receptor_body + center
-    probabilities = probability_matrix(anchors, receptors, linker_models)
-    possible_contacts = float(max_bipartite_matches(probabilities > 0.05))
-    sampled = np.empty(N_BINDING_TRIALS, dtype=float)
-    for trial in range(N_BINDING_TRIALS):
-        sampled[trial] = max_bipartite_matches(rng.random(probabilities.shape) < probabilities)
-    return (
-        float(np.mean(sampled)),
-        possible_contacts,
-        float(np.mean(sampled >= 1)),
-        float(np.mean(sampled >= 2)),
-        float(np.mean(sampled >= 3)),
-    )
+    ``receptors`` is ``(n_receptors, 3)`` or a stack ``(..., n_receptors, 3)``;
+    the result is ``(..., n_anchors, n_receptors)``.
+    """
+    anchor_xyz = np.asarray([[float(a["x_nm"]), float(a["y_nm"]), float(a["z_nm"])] for a in anchors], dtype=float)
+    vectors = receptors[..., None, :, :] - anchor_xyz[:, None, :]
+    reach = anchor_reach_probabilities(anchors, linker_models, np.linalg.norm(vectors, axis=-1))
+    return reach * angular_factors(vectors, anchor_directions(anchors))
 
 
 def score_layout_3d(
@@ -177,34 +155,41 @@ def score_layout_3d(
     receptor_count: int,
     linker_models: LinkerModels,
     rng: np.random.Generator,
+    lateral_step_nm: float | None = None,
+    n_binding_trials: int | None = None,
 ) -> dict[str, float]:
+    """Score one layout over every lateral offset and receptor realization in one batch.
+
+    Receptor patterns and binding-trial uniforms are drawn in the same order
+    a per-offset loop would draw them, so results do not depend on the
+    batching. Probabilities and matchings are then computed for the
+    whole stack at once.
+    """
+    if lateral_step_nm is None:
+        lateral_step_nm = LATERAL_STEP_NM
+    if n_binding_trials is None:
+        n_binding_trials = N_BINDING_TRIALS
     ev_radius = EV_DIAMETER_NM / 2.0
-    offsets = np.arange(-LATERAL_SCAN_NM, LATERAL_SCAN_NM + 0.001, LATERAL_STEP_NM)
-    mean_contacts = []
-    possible_contacts = []
-    p1_values = []
-    p2_values = []
-    p3_values = []
-
+    offsets = np.arange(-LATERAL_SCAN_NM, LATERAL_SCAN_NM + 0.001, lateral_step_nm)
+    bodies = []
+    centers = []
+    draws = []
     for ox in offsets:
         for oy in offsets:
             for _ in range(N_RECEPTOR_REALIZATIONS):
                 pattern = str(rng.choice(RECEPTOR_PATTERNS, p=PATTERN_PROBABILITIES))
-                receptor_body = receptor_points(pattern, receptor_count, ev_radius, rng)
-                mean_c, possible_c, p1, p2, p3 = contact_metrics_3d(
-                    anchors,
-                    receptor_body,
-                    ev_radius,
-                    float(ox),
-                    float(oy),
-                    linker_models,
-                    rng,
-                )
-                mean_contacts.append(mean_c)
-                possible_contacts.append(possible_c)
-                p1_values.append(p1)
-                p2_values.append(p2)
-                p3_values.append(p3)
+                bodies.append(receptor_points(pattern, receptor_count, ev_radius, rng))
+                centers.append([float(ox), float(oy), ev_radius + EV_SURFACE_CLEARANCE_NM])
+                draws.append(rng.random((n_binding_trials, len(anchors), receptor_count)))
+
+    receptors = np.asarray(bodies) + np.asarray(centers)[:, None, :]
+    probabilities = probability_matrix(anchors, receptors, linker_models)
+    possible_contacts = batch_max_bipartite_matches(probabilities > 0.05).astype(float)
+    sampled = batch_max_bipartite_matches(np.asarray(draws) < probabilities[:, None, :, :]).astype(float)
+    mean_contacts = np.mean(sampled, axis=1)
+    p1_values = np.mean(sampled >= 1, axis=1)
+    p2_values = np.mean(sampled >= 2, axis=1)
+    p3_values = np.mean(sampled >= 3, axis=1)
 
     mean_contact_value = float(np.mean(mean_contacts))
     p1 = float(np.mean(p1_values))
@@ -284,7 +269,20 @@ def plot_layouts(layouts: dict[str, list[Anchor]]) -> None:
     plt.close(fig)
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--full-resolution",
+        action="store_true",
+        help="use the 2D geometry screen's lateral step and binding-trial count",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
+    lateral_step_nm = scg.LATERAL_STEP_NM if args.full_resolution else LATERAL_STEP_NM
+    n_binding_trials = scg.N_BINDING_TRIALS if args.full_resolution else N_BINDING_TRIALS
     rng = np.random.default_rng(SEED)
     linker_models = load_linker_models()
     layouts = read_orientation_optimized_layouts()
@@ -293,7 +291,9 @@ def main() -> None:
     for layout_name, anchors in layouts.items():
         up_count = sum(str(anchor["orientation_class"]) == "up_facing" for anchor in anchors)
         for receptor_count in RECEPTOR_COUNTS:
-            metrics = score_layout_3d(anchors, receptor_count, linker_models, rng)
+            metrics = score_layout_3d(
+                anchors, receptor_count, linker_models, rng, lateral_step_nm, n_binding_trials
+            )
             rows.append(
                 {
                     "layout": layout_name,
@@ -352,9 +352,9 @@ def main() -> None:
             "soft_outer_angle_degrees": SOFT_OUTER_ANGLE_DEG,
             "receptor_counts": RECEPTOR_COUNTS,
             "lateral_scan_nm": LATERAL_SCAN_NM,
-            "lateral_step_nm": LATERAL_STEP_NM,
+            "lateral_step_nm": lateral_step_nm,
             "receptor_realizations_per_offset": N_RECEPTOR_REALIZATIONS,
-            "binding_trials_per_realization": N_BINDING_TRIALS,
+            "binding_trials_per_realization": n_binding_trials,
         },
         "best_by_receptor_count": best_by_count,
         "layout_summary": layout_summary,
@@ -22,7 +22,7 @@ from simulate_ev_capture_dynamics import (
     load_layouts,
     load_linker_models,
     random_control_layout,
-    simulate_trajectory,
+    simulate_ensemble,
     with_linker,
 )
 
@@ -162,47 +162,42 @@ def main() -> None:
     results: list[dict[str, object]] = []
     for receptor_count in RECEPTOR_COUNTS:
         print(f"Simulating 73 nm EV with {receptor_count} CD133 receptors", flush=True)
-        for trajectory_index in range(TRAJECTORIES_PER_CASE):
-            for case_label, anchors, activity in designed_cases:
-                result = simulate_trajectory(
+        batch = []
+        for case_label, anchors, activity in designed_cases + [scrambled_case]:
+            batch.extend(
+                simulate_ensemble(
                     case_label,
                     anchors,
                     linker_models,
                     EV_DIAMETER_NM,
                     f"count_{receptor_count}",
                     activity,
+                    TRAJECTORIES_PER_CASE,
                     rng,
                     fixed_receptor_count=receptor_count,
                 )
-                result["fixed_receptor_count"] = receptor_count
-                results.append(result)
-
-            random_anchors = random_layouts[trajectory_index % RANDOM_CONTROL_REPLICATES]
-            result = simulate_trajectory(
-                "random_24",
-                random_anchors,
-                linker_models,
-                EV_DIAMETER_NM,
-                f"count_{receptor_count}",
-                1.0,
-                rng,
-                fixed_receptor_count=receptor_count,
             )
-            result["fixed_receptor_count"] = receptor_count
-            results.append(result)
-
-            result = simulate_trajectory(
-                scrambled_case[0],
-                scrambled_case[1],
-                linker_models,
-                EV_DIAMETER_NM,
-                f"count_{receptor_count}",
-                scrambled_case[2],
-                rng,
-                fixed_receptor_count=receptor_count,
+        # Trajectory i of the random control uses replicate layout i % replicates.
+        for replicate, random_anchors in enumerate(random_layouts):
+            n_trajectories = len(range(replicate, TRAJECTORIES_PER_CASE, RANDOM_CONTROL_REPLICATES))
+            if n_trajectories == 0:
+                continue
+            batch.extend(
+                simulate_ensemble(
+                    "random_24",
+                    random_anchors,
+                    linker_models,
+                    EV_DIAMETER_NM,
+                    f"count_{receptor_count}",
+                    1.0,
+                    n_trajectories,
+                    rng,
+                    fixed_receptor_count=receptor_count,
+                )
             )
+        for result in batch:
             result["fixed_receptor_count"] = receptor_count
-            results.append(result)
+        results.extend(batch)
 
     rows = summarize(results)
     write_trajectory_csv(results)
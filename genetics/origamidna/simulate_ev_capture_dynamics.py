@@ -10,13 +10,17 @@ over time.
 The model is phenomenological: the rates below are not fitted kinetic
 constants. The purpose is to compare relative dynamic stability for the current
 lead design and matched controls under the same assumptions.
+
+With ``--adaptive`` each case draws trajectories in batches until the 95% CI
+half-width of its capture probability reaches the target, instead of running a
+fixed ``TRAJECTORIES_PER_CASE``.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
-import math
 from collections import defaultdict
 from pathlib import Path
 from typing import Union
@@ -27,13 +31,15 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from adaptive_sampling import AdaptiveEstimate, StoppingRule, sample_until
+from capture_dynamics import CaptureScenario, simulate_capture
 from score_ev_capture_geometry import (
     CD133_DENSITIES,
     RNG_SEED,
+    LinkerModels,
     load_layouts,
     load_linker_models,
     random_lower_hemisphere,
-    reach_probability,
     receptor_count,
 )
 
@@ -64,9 +70,12 @@ D_BOUND_FLOOR_FRACTION = 0.10
 K_ON_PER_STEP = 0.18
 K_OFF_PER_S = 0.12
 RNG_DYNAMIC_SEED = RNG_SEED + 303
+ADAPTIVE_CI_HALF_WIDTH = 0.08
+ADAPTIVE_BATCH_TRAJECTORIES = RANDOM_CONTROL_REPLICATES
+ADAPTIVE_MIN_BATCHES = 2
+ADAPTIVE_MAX_BATCHES = 16
 
 Anchor = dict[str, Union[float, str]]
-LinkerModels = dict[str, tuple[np.ndarray, np.ndarray]]
 
 
 def with_linker(anchors: list[Anchor], construct: str) -> list[Anchor]:
@@ -101,136 +110,38 @@ def anchor_array(anchors: list[Anchor]) -> np.ndarray:
     )
 
 
-def try_form_bonds(
-    distances: np.ndarray,
-    anchors: list[Anchor],
-    linker_models: LinkerModels,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    binding_activity: float,
-    rng: np.random.Generator,
-) -> None:
-    if binding_activity <= 0.0:
-        return
-
-    free_anchor_indices = np.flatnonzero(anchor_to_receptor == -1)
-    free_receptor_indices = np.flatnonzero(receptor_to_anchor == -1)
-    if len(free_anchor_indices) == 0 or len(free_receptor_indices) == 0:
-        return
-
-    sub_distances = distances[np.ix_(free_anchor_indices, free_receptor_indices)]
-    probabilities = np.zeros_like(sub_distances)
-    for local_i, anchor_index in enumerate(free_anchor_indices):
-        construct = str(anchors[int(anchor_index)]["linker_construct"])
-        probabilities[local_i, :] = [
-            binding_activity * K_ON_PER_STEP * reach_probability(linker_models, construct, float(d))
-            for d in sub_distances[local_i, :]
-        ]
-
-    candidate_pairs = np.argwhere(rng.random(probabilities.shape) < probabilities)
-    if len(candidate_pairs) == 0:
-        return
-
-    rng.shuffle(candidate_pairs)
-    for local_anchor, local_receptor in candidate_pairs:
-        anchor_index = int(free_anchor_indices[local_anchor])
-        receptor_index = int(free_receptor_indices[local_receptor])
-        if anchor_to_receptor[anchor_index] == -1 and receptor_to_anchor[receptor_index] == -1:
-            anchor_to_receptor[anchor_index] = receptor_index
-            receptor_to_anchor[receptor_index] = anchor_index
+def capture_scenario(binding_activity: float) -> CaptureScenario:
+    # Built at call time so scripts that patch this module's settings
+    # (for example the clinical 73 nm run) are honored.
+    return CaptureScenario(
+        n_steps=N_STEPS,
+        dt_seconds=DT_SECONDS,
+        diffusion_nm2_per_s=D_FREE_NM2_PER_S,
+        bound_floor_fraction=D_BOUND_FLOOR_FRACTION,
+        k_on_per_step=K_ON_PER_STEP,
+        k_off_per_s=K_OFF_PER_S,
+        binding_activity=binding_activity,
+        capture_threshold=CAPTURE_CONTACT_THRESHOLD,
+        strong_threshold=STRONG_CONTACT_THRESHOLD,
+        capture_dwell_seconds=CAPTURE_DWELL_SECONDS,
+        surface_clearance_nm=EV_SURFACE_CLEARANCE_NM,
+        initial_gap_nm=INITIAL_GAP_NM,
+        max_gap_nm=MAX_GAP_NM,
+        start_half_width_nm=(LATERAL_START_NM, LATERAL_START_NM),
+        escape_radius_nm=LATERAL_ESCAPE_NM,
+    )
 
 
-def break_bonds(
-    distances: np.ndarray,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    p_off = 1.0 - math.exp(-K_OFF_PER_S * DT_SECONDS)
-    for anchor_index, receptor_index in enumerate(anchor_to_receptor):
-        if receptor_index == -1:
-            continue
-        distance = distances[anchor_index, receptor_index]
-        strained = distance > 14.0
-        if strained or rng.random() < p_off:
-            anchor_to_receptor[anchor_index] = -1
-            receptor_to_anchor[receptor_index] = -1
-
-
-def simulate_trajectory(
+def trajectory_result(
     case_label: str,
-    anchors: list[Anchor],
-    linker_models: LinkerModels,
     ev_diameter_nm: float,
     density_name: str,
     binding_activity: float,
-    rng: np.random.Generator,
-    fixed_receptor_count: int | None = None,
+    n_receptors: int,
+    ever_captured: bool,
+    contacts_trace: list[int],
+    captured_trace: list[int],
 ) -> dict[str, object]:
-    radius = ev_diameter_nm / 2.0
-    n_receptors = (
-        max(1, int(fixed_receptor_count))
-        if fixed_receptor_count is not None
-        else receptor_count(radius, CD133_DENSITIES[density_name])
-    )
-    receptor_body = random_lower_hemisphere(n_receptors, radius, rng)
-    anchor_xyz = anchor_array(anchors)
-
-    center = np.array(
-        [
-            rng.uniform(-LATERAL_START_NM, LATERAL_START_NM),
-            rng.uniform(-LATERAL_START_NM, LATERAL_START_NM),
-            radius + EV_SURFACE_CLEARANCE_NM + INITIAL_GAP_NM,
-        ],
-        dtype=float,
-    )
-    min_center_z = radius + EV_SURFACE_CLEARANCE_NM
-    max_center_z = radius + EV_SURFACE_CLEARANCE_NM + MAX_GAP_NM
-    anchor_to_receptor = np.full(len(anchors), -1, dtype=int)
-    receptor_to_anchor = np.full(n_receptors, -1, dtype=int)
-
-    contacts_trace: list[int] = []
-    captured_trace: list[int] = []
-    consecutive_capture_steps = 0
-    required_capture_steps = max(1, int(round(CAPTURE_DWELL_SECONDS / DT_SECONDS)))
-    ever_captured = False
-
-    for _ in range(N_STEPS):
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        mobility_scale = max(D_BOUND_FLOOR_FRACTION, 1.0 / (1.0 + 0.75 * n_contacts))
-        step_sigma = math.sqrt(2.0 * D_FREE_NM2_PER_S * mobility_scale * DT_SECONDS)
-        center[:2] += rng.normal(0.0, step_sigma, size=2)
-        center[2] += rng.normal(0.0, step_sigma * 0.45)
-        center[2] -= 0.035 * n_contacts
-        center[2] = float(np.clip(center[2], min_center_z, max_center_z))
-
-        if np.linalg.norm(center[:2]) > LATERAL_ESCAPE_NM:
-            # Keep escaped particles in the bookkeeping with no new capture.
-            center[:2] *= LATERAL_ESCAPE_NM / np.linalg.norm(center[:2])
-
-        receptors = receptor_body + center
-        distances = np.linalg.norm(anchor_xyz[:, None, :] - receptors[None, :, :], axis=2)
-        break_bonds(distances, anchor_to_receptor, receptor_to_anchor, rng)
-        try_form_bonds(
-            distances,
-            anchors,
-            linker_models,
-            anchor_to_receptor,
-            receptor_to_anchor,
-            binding_activity,
-            rng,
-        )
-
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        contacts_trace.append(n_contacts)
-        if n_contacts >= CAPTURE_CONTACT_THRESHOLD:
-            consecutive_capture_steps += 1
-        else:
-            consecutive_capture_steps = 0
-        captured_now = consecutive_capture_steps >= required_capture_steps
-        ever_captured = ever_captured or captured_now
-        captured_trace.append(int(captured_now))
-
     contacts = np.asarray(contacts_trace, dtype=float)
     captured = np.asarray(captured_trace, dtype=float)
     return {
@@ -250,6 +161,91 @@ def simulate_trajectory(
     }
 
 
+def simulate_ensemble(
+    case_label: str,
+    anchors: list[Anchor],
+    linker_models: LinkerModels,
+    ev_diameter_nm: float,
+    density_name: str,
+    binding_activity: float,
+    n_trajectories: int,
+    rng: np.random.Generator,
+    fixed_receptor_count: int | None = None,
+) -> list[dict[str, object]]:
+    """Advance ``n_trajectories`` independent EVs in lockstep over the same tile."""
+    radius = ev_diameter_nm / 2.0
+    n_receptors = (
+        max(1, int(fixed_receptor_count))
+        if fixed_receptor_count is not None
+        else receptor_count(radius, CD133_DENSITIES[density_name])
+    )
+    receptor_bodies = random_lower_hemisphere((n_trajectories, n_receptors), radius, rng)
+    result = simulate_capture(
+        anchors,
+        linker_models,
+        receptor_bodies,
+        ev_diameter_nm,
+        capture_scenario(binding_activity),
+        rng,
+    )
+    return [
+        trajectory_result(
+            case_label,
+            ev_diameter_nm,
+            density_name,
+            binding_activity,
+            n_receptors,
+            bool(result.ever_captured[i]),
+            result.contacts[i].tolist(),
+            result.captured[i].astype(int).tolist(),
+        )
+        for i in range(n_trajectories)
+    ]
+
+
+def simulate_case_adaptive(
+    case_label: str,
+    case_layouts: list[tuple[list[Anchor], float]],
+    linker_models: LinkerModels,
+    ev_diameter_nm: float,
+    density_name: str,
+    rule: StoppingRule,
+    rng: np.random.Generator,
+) -> tuple[list[dict[str, object]], AdaptiveEstimate]:
+    """Draw trajectories in batches until the capture-probability CI is narrow enough.
+
+    Trajectory ``i`` of a case uses ``case_layouts[i % len(case_layouts)]``, as
+    in the fixed-count run, so replicate control layouts stay balanced.
+    """
+    results: list[dict[str, object]] = []
+
+    def draw(batch_index: int) -> np.ndarray:
+        start = batch_index * rule.batch_size
+        layout_index = np.arange(start, start + rule.batch_size) % len(case_layouts)
+        batch: list[dict[str, object]] = []
+        for index, n_trajectories in enumerate(np.bincount(layout_index, minlength=len(case_layouts))):
+            if n_trajectories == 0:
+                continue
+            anchors, activity = case_layouts[index]
+            batch.extend(
+                simulate_ensemble(
+                    case_label,
+                    anchors,
+                    linker_models,
+                    ev_diameter_nm,
+                    density_name,
+                    activity,
+                    int(n_trajectories),
+                    rng,
+                )
+            )
+        results.extend(batch)
+        return np.asarray([result["ever_captured"] for result in batch])
+
+    estimate = sample_until(draw, rule)
+    return results, estimate
+
+
 def summarize(results: list[dict[str, object]]) -> list[dict[str, str]]:
     grouped: dict[tuple[str, float, str], list[dict[str, object]]] = defaultdict(list)
     for result in results:
@@ -342,7 +338,28 @@ def plot_contact_traces(results: list[dict[str, object]]) -> None:
     plt.close(fig)
 
 
+def adaptive_stopping_rule(half_width: float = ADAPTIVE_CI_HALF_WIDTH) -> StoppingRule:
+    return StoppingRule(
+        half_width=half_width,
+        batch_size=ADAPTIVE_BATCH_TRAJECTORIES,
+        min_batches=ADAPTIVE_MIN_BATCHES,
+        max_batches=ADAPTIVE_MAX_BATCHES,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="simulate each case until its capture-probability CI half-width reaches --ci-half-width",
+    )
+    parser.add_argument("--ci-half-width", type=float, default=ADAPTIVE_CI_HALF_WIDTH)
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     rng = np.random.default_rng(RNG_DYNAMIC_SEED)
     layouts = load_layouts()
     linker_models = load_linker_models()
@@ -360,48 +377,61 @@ def main() -> None:
         cases.append((f"random_24_polyT30_rep{i:02d}", control, 1.0))
 
     results: list[dict[str, object]] = []
+    estimates: dict[tuple[str, float, str], AdaptiveEstimate] = {}
+    rule = adaptive_stopping_rule(args.ci_half_width) if args.adaptive else None
     for diameter in EV_DIAMETERS_NM:
         for density in DENSITY_NAMES:
             print(f"Simulating EV={diameter:.0f} density={density}", flush=True)
-            for trajectory_index in range(TRAJECTORIES_PER_CASE):
-                result = simulate_trajectory(
-                    "dense_24_polyT30",
-                    dense_anchors,
-                    linker_models,
-                    diameter,
-                    density,
-                    1.0,
-                    rng,
+            if rule is not None:
+                adaptive_cases = [(case, [(anchors, activity)]) for case, anchors, activity in cases[:2]]
+                adaptive_cases.append(
+                    ("random_24_polyT30", [(anchors, activity) for _, anchors, activity in cases[2:]])
                 )
-                results.append(result)
+                for case, case_layouts in adaptive_cases:
+                    case_results, estimates[(case, diameter, density)] = simulate_case_adaptive(
+                        case, case_layouts, linker_models, diameter, density, rule, rng
+                    )
+                    results.extend(case_results)
+                continue
 
-                result = simulate_trajectory(
-                    "scrambled_dense_24_polyT30",
-                    dense_anchors,
-                    linker_models,
-                    diameter,
-                    density,
-                    0.0,
-                    rng,
+            for case, anchors, activity in cases[:2]:
+                results.extend(
+                    simulate_ensemble(
+                        case,
+                        anchors,
+                        linker_models,
+                        diameter,
+                        density,
+                        activity,
+                        TRAJECTORIES_PER_CASE,
+                        rng,
+                    )
                 )
-                results.append(result)
 
-                random_case, random_anchors, random_activity = cases[
-                    2 + (trajectory_index % RANDOM_CONTROL_REPLICATES)
-                ]
-                result = simulate_trajectory(
+            # Trajectory i of the random control uses replicate layout i % 12.
+            for replicate, (random_case, random_anchors, random_activity) in enumerate(cases[2:]):
+                n_trajectories = len(range(replicate, TRAJECTORIES_PER_CASE, RANDOM_CONTROL_REPLICATES))
+                if n_trajectories == 0:
+                    continue
+                for result in simulate_ensemble(
                     random_case,
                     random_anchors,
                     linker_models,
                     diameter,
                     density,
                     random_activity,
+                    n_trajectories,
                     rng,
-                )
-                result["case"] = "random_24_polyT30"
-                results.append(result)
+                ):
+                    result["case"] = "random_24_polyT30"
+                    results.append(result)
 
     summary_rows = summarize(results)
+    for row in summary_rows:
+        estimate = estimates.get((row["case"], float(row["ev_diameter_nm"]), row["cd133_density"]))
+        if estimate is not None:
+            row["capture_probability_ci_half_width"] = f"{estimate.half_width:.4f}"
+            row["sampling_status"] = estimate.status
     write_trajectory_csv(results)
     write_summary_csv(summary_rows)
     plot_contact_traces(results)
@@ -440,6 +470,17 @@ def main() -> None:
             "Scrambled controls preserve the same geometry but set receptor-specific binding activity to zero.",
         ],
     }
+    if rule is not None:
+        summary["adaptive_sampling"] = {
+            "sample": "0/1 capture outcome of one trajectory",
+            "target_ci_half_width": rule.half_width,
+            "confidence": 0.95,
+            "batch_trajectories": rule.batch_size,
+            "min_batches": rule.min_batches,
+            "max_batches": rule.max_batches,
+            "total_trajectories": len(results),
+            "fixed_design_trajectories": len(summary_rows) * TRAJECTORIES_PER_CASE,
+        }
     OUT_JSON.write_text(json.dumps(summary, indent=2) + "\n", encoding="ascii")
 
     print(f"Wrote {OUT_TRAJ_CSV.name}")
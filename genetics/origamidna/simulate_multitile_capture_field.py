@@ -11,7 +11,6 @@ from __future__ import annotations
 
 import csv
 import json
-import math
 from pathlib import Path
 from typing import Union
 
@@ -21,12 +20,14 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
+from capture_dynamics import CaptureScenario, simulate_capture
 from clinical_layouts import clinical_candidate_layouts
-from ev_population_generator import generate_population
-from score_ev_capture_geometry import load_layouts, load_linker_models, reach_probability
+from ev_population_generator import ensure_population_store, load_population_store, read_store_metadata
+from ragged_receptors import population_receptors
+from score_ev_capture_geometry import load_layouts, load_linker_models
 
 ROOT = Path(__file__).resolve().parent
-POPULATION_FILE = ROOT / "ev_population_optimization_run.npz"
+POPULATION_STORE = ROOT / "ev_population_optimization_run.popstore"
 OUT_SUMMARY_CSV = ROOT / "multitile_capture_field_summary.csv"
 OUT_LAYOUTS_CSV = ROOT / "multitile_capture_field_layouts.csv"
 OUT_JSON = ROOT / "multitile_capture_field_summary.json"
@@ -97,137 +98,71 @@ def build_field(
     return anchors
 
 
-def anchor_array(anchors: list[Anchor]) -> np.ndarray:
-    return np.asarray(
-        [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in anchors],
-        dtype=float,
-    )
-
-
 def field_bounds(cols: int, rows: int, spacing_x_nm: float, spacing_y_nm: float) -> tuple[float, float]:
     width = spacing_x_nm * max(cols - 1, 0) + 90.0
     height = spacing_y_nm * max(rows - 1, 0) + 60.0
     return width, height
 
 
-def break_bonds(
-    distances: np.ndarray,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    p_off = 1.0 - math.exp(-K_OFF_PER_S * DT_SECONDS)
-    for anchor_index, receptor_index in enumerate(anchor_to_receptor):
-        if receptor_index == -1:
-            continue
-        if distances[anchor_index, receptor_index] > 14.0 or rng.random() < p_off:
-            anchor_to_receptor[anchor_index] = -1
-            receptor_to_anchor[receptor_index] = -1
-
-
-def try_form_bonds(
-    distances: np.ndarray,
-    anchors: list[Anchor],
-    linker_models,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    free_anchor_indices = np.flatnonzero(anchor_to_receptor == -1)
-    free_receptor_indices = np.flatnonzero(receptor_to_anchor == -1)
-    if len(free_anchor_indices) == 0 or len(free_receptor_indices) == 0:
-        return
-    sub_distances = distances[np.ix_(free_anchor_indices, free_receptor_indices)]
-    probabilities = np.zeros_like(sub_distances)
-    for local_i, anchor_index in enumerate(free_anchor_indices):
-        construct = str(anchors[int(anchor_index)]["linker_construct"])
-        probabilities[local_i, :] = [
-            K_ON_PER_STEP * reach_probability(linker_models, construct, float(distance))
-            for distance in sub_distances[local_i, :]
-        ]
-    candidate_pairs = np.argwhere(rng.random(probabilities.shape) < probabilities)
-    if len(candidate_pairs) == 0:
-        return
-    rng.shuffle(candidate_pairs)
-    for local_anchor, local_receptor in candidate_pairs:
-        anchor_index = int(free_anchor_indices[local_anchor])
-        receptor_index = int(free_receptor_indices[local_receptor])
-        if anchor_to_receptor[anchor_index] == -1 and receptor_to_anchor[receptor_index] == -1:
-            anchor_to_receptor[anchor_index] = receptor_index
-            receptor_to_anchor[receptor_index] = anchor_index
-
-
-def simulate_one_ev(
+def capture_scenario(field_width_nm: float, field_height_nm: float) -> CaptureScenario:
+    # Start somewhere over the field. This models an EV that has entered the
+    # capture region, not the whole journey from a cell.
+    half_width = (field_width_nm / 2.0, field_height_nm / 2.0)
+    return CaptureScenario(
+        n_steps=N_STEPS,
+        dt_seconds=DT_SECONDS,
+        diffusion_nm2_per_s=D_FREE_NM2_PER_S,
+        bound_floor_fraction=D_BOUND_FLOOR_FRACTION,
+        k_on_per_step=K_ON_PER_STEP,
+        k_off_per_s=K_OFF_PER_S,
+        capture_threshold=CAPTURE_THRESHOLD,
+        strong_threshold=STRONG_THRESHOLD,
+        capture_dwell_seconds=CAPTURE_DWELL_SECONDS,
+        surface_clearance_nm=SURFACE_CLEARANCE_NM,
+        initial_gap_nm=INITIAL_GAP_NM,
+        max_gap_nm=MAX_GAP_NM,
+        start_half_width_nm=half_width,
+        escape_radius_nm=None,
+        field_half_width_nm=half_width,
+    )
+
+
+def simulate_population(
     anchors: list[Anchor],
     linker_models,
-    receptor_body: np.ndarray,
-    diameter_nm: float,
+    population,
     field_width_nm: float,
     field_height_nm: float,
     rng: np.random.Generator,
-) -> dict[str, float]:
-    radius = diameter_nm / 2.0
-    anchor_xyz = anchor_array(anchors)
-    # Start somewhere over the field. This models an EV that has entered the
-    # capture region, not the whole journey from a cell.
-    center = np.array(
-        [
-            rng.uniform(-field_width_nm / 2.0, field_width_nm / 2.0),
-            rng.uniform(-field_height_nm / 2.0, field_height_nm / 2.0),
-            radius + SURFACE_CLEARANCE_NM + INITIAL_GAP_NM,
-        ],
-        dtype=float,
+) -> list[dict[str, float]]:
+    """Run one trajectory per population EV over the field, all EVs advancing together."""
+    receptor_bodies = population_receptors(population).padded()
+    result = simulate_capture(
+        anchors,
+        linker_models,
+        receptor_bodies,
+        np.asarray(population["diameter_nm"], dtype=float),
+        capture_scenario(field_width_nm, field_height_nm),
+        rng,
     )
-    min_z = radius + SURFACE_CLEARANCE_NM
-    max_z = radius + SURFACE_CLEARANCE_NM + MAX_GAP_NM
-    anchor_to_receptor = np.full(len(anchors), -1, dtype=int)
-    receptor_to_anchor = np.full(len(receptor_body), -1, dtype=int)
-    required_steps = max(1, int(round(CAPTURE_DWELL_SECONDS / DT_SECONDS)))
-    consecutive = 0
-    ever_captured = False
-    contacts = []
-
-    for _ in range(N_STEPS):
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        mobility = max(D_BOUND_FLOOR_FRACTION, 1.0 / (1.0 + 0.75 * n_contacts))
-        sigma = math.sqrt(2.0 * D_FREE_NM2_PER_S * mobility * DT_SECONDS)
-        center[:2] += rng.normal(0.0, sigma, size=2)
-        center[2] += rng.normal(0.0, sigma * 0.45)
-        center[2] -= 0.035 * n_contacts
-        center[2] = float(np.clip(center[2], min_z, max_z))
-        center[0] = float(np.clip(center[0], -field_width_nm / 2.0, field_width_nm / 2.0))
-        center[1] = float(np.clip(center[1], -field_height_nm / 2.0, field_height_nm / 2.0))
-
-        receptors = receptor_body + center
-        distances = np.linalg.norm(anchor_xyz[:, None, :] - receptors[None, :, :], axis=2)
-        break_bonds(distances, anchor_to_receptor, receptor_to_anchor, rng)
-        try_form_bonds(distances, anchors, linker_models, anchor_to_receptor, receptor_to_anchor, rng)
-
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        contacts.append(n_contacts)
-        consecutive = consecutive + 1 if n_contacts >= CAPTURE_THRESHOLD else 0
-        ever_captured = ever_captured or consecutive >= required_steps
-
-    contacts_arr = np.asarray(contacts, dtype=float)
-    return {
-        "ever_captured": float(ever_captured),
-        "mean_contacts": float(np.mean(contacts_arr)),
-        "max_contacts": float(np.max(contacts_arr)),
-        "strong_fraction": float(np.mean(contacts_arr >= STRONG_THRESHOLD)),
-    }
+    return [
+        {
+            "ever_captured": float(captured),
+            "mean_contacts": float(mean_contacts),
+            "max_contacts": float(max_contacts),
+            "strong_fraction": float(strong_fraction),
+        }
+        for captured, mean_contacts, max_contacts, strong_fraction in zip(
+            result.ever_captured, result.mean_contacts, result.max_contacts, result.strong_fraction
+        )
+    ]
 
 
-def ensure_population() -> np.lib.npyio.NpzFile:
-    if not POPULATION_FILE.exists():
-        records, receptor_array = generate_population(N_POPULATION_EVS, RNG_SEED)
-        np.savez_compressed(
-            POPULATION_FILE,
-            receptor_points=receptor_array,
-            diameter_nm=np.asarray([r.diameter_nm for r in records], dtype=float),
-            receptor_count=np.asarray([r.receptor_count for r in records], dtype=int),
-            pattern=np.asarray([r.pattern for r in records]),
-        )
-    return np.load(POPULATION_FILE)
+def ensure_population() -> dict[str, np.ndarray]:
+    # Reuse the optimizer's run population when it exists; otherwise make one.
+    if read_store_metadata(POPULATION_STORE) is None:
+        return ensure_population_store(POPULATION_STORE, N_POPULATION_EVS, RNG_SEED)
+    return load_population_store(POPULATION_STORE)
 
 
 def field_configs() -> list[dict[str, object]]:
@@ -317,14 +252,8 @@ def main() -> None:
         field_name = f"{unit_name}_{cols}x{rows_count}_{int(spacing)}nm"
         field_layouts[field_name] = field
 
-        per_ev = []
         config_rng = np.random.default_rng(RNG_SEED + index)
-        for ev_index, diameter in enumerate(population["diameter_nm"]):
-            receptor_count = int(population["receptor_count"][ev_index])
-            receptor_body = population["receptor_points"][ev_index, :receptor_count, :]
-            per_ev.append(
-                simulate_one_ev(field, linker_models, receptor_body, float(diameter), width, height, config_rng)
-            )
+        per_ev = simulate_population(field, linker_models, population, width, height, config_rng)
         rows.append(
             {
                 "field": field_name,
@@ -360,7 +289,7 @@ def main() -> None:
     summary = {
         "model": "repeated moderate-density DNA-origami capture tile field",
         "rng_seed": RNG_SEED,
-        "population_file": POPULATION_FILE.name,
+        "population_file": POPULATION_STORE.name,
         "capture_definition": "at least one aptamer/CD133 contact sustained for 1 second",
         "best_field": rows[0],
         "top_10_fields": rows[:10],
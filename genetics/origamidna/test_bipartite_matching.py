@@ -0,0 +1,61 @@
+"""Regression checks for the sparse minimum-cost assignment."""
+
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+
+from bipartite_matching import min_cost_assignment
+
+
+def brute_force(candidates: list[list[tuple[int, float]]]) -> tuple[int, float]:
+    """(assigned count, total cost) of the best assignment by enumeration."""
+    best = (0, 0.0)
+    options = [[(-1, 0.0)] + row for row in candidates]
+    for combo in itertools.product(*options):
+        used = [v for v, _ in combo if v >= 0]
+        if len(used) != len(set(used)):
+            continue
+        key = (len(used), sum(cost for _, cost in combo))
+        if key[0] > best[0] or (key[0] == best[0] and key[1] < best[1]):
+            best = key
+    return best
+
+
+def assignment_value(candidates: list[list[tuple[int, float]]], assigned: list[int]) -> tuple[int, float]:
+    used = [v for v in assigned if v >= 0]
+    assert len(used) == len(set(used))
+    return len(used), sum(dict(candidates[u])[v] for u, v in enumerate(assigned) if v >= 0)
+
+
+def test_round_off_does_not_reopen_settled_nodes() -> None:
+    # Mixed-magnitude costs once made Dijkstra re-settle a node and loop forever.
+    candidates = [
+        [(2, 2.0), (1, 2.0), (0, 1.0)],
+        [(2, -1.0), (1, -7.820173430212352)],
+        [(2, 0.0), (0, -1.0), (1, 5.370939486959755)],
+        [(1, -0.051535009934009425), (0, -6.346262476765282)],
+    ]
+    count, cost = assignment_value(candidates, min_cost_assignment(candidates, 3))
+    best_count, best_cost = brute_force(candidates)
+    assert count == best_count
+    assert np.isclose(cost, best_cost)
+
+
+def test_matches_brute_force_on_mixed_costs() -> None:
+    rng = np.random.default_rng(20261018)
+    for _ in range(500):
+        n_left = int(rng.integers(1, 6))
+        n_right = int(rng.integers(1, 6))
+        candidates = []
+        for _ in range(n_left):
+            rights = rng.choice(n_right, size=int(rng.integers(0, n_right + 1)), replace=False)
+            # Lattice-style costs: squared shift minus a weighted up-score.
+            candidates.append(
+                [(int(v), float(rng.uniform(0.0, 6.0) ** 2 - 64.0 * rng.random())) for v in rights]
+            )
+        count, cost = assignment_value(candidates, min_cost_assignment(candidates, n_right))
+        best_count, best_cost = brute_force(candidates)
+        assert count == best_count
+        assert np.isclose(cost, best_cost)
@@ -5,17 +5,19 @@ from __future__ import annotations
 
 import csv
 import json
-import math
 from collections import defaultdict
 from pathlib import Path
 from typing import Union
 
 import numpy as np
 
-from score_ev_capture_geometry import load_linker_models, reach_probability
+from capture_dynamics import CaptureResult, CaptureScenario, simulate_capture
+from ev_population_generator import load_population_store
+from ragged_receptors import population_receptors
+from score_ev_capture_geometry import load_linker_models
 
 ROOT = Path(__file__).resolve().parent
-IN_POPULATION = ROOT / "ev_population_optimization_run.npz"
+IN_POPULATION = ROOT / "ev_population_optimization_run.popstore"
 IN_LAYOUTS = ROOT / "population_optimized_layouts.csv"
 IN_SCORES = ROOT / "population_layout_scores.csv"
 OUT_CSV = ROOT / "population_layout_dynamics_validation.csv"
@@ -64,127 +66,68 @@ def load_layouts(names: list[str]) -> dict[str, list[Anchor]]:
     return dict(layouts)
 
 
-def anchor_array(anchors: list[Anchor]) -> np.ndarray:
-    return np.asarray(
-        [[float(anchor["x_nm"]), float(anchor["y_nm"]), 0.0] for anchor in anchors],
-        dtype=float,
+def capture_scenario() -> CaptureScenario:
+    return CaptureScenario(
+        n_steps=N_STEPS,
+        dt_seconds=DT_SECONDS,
+        diffusion_nm2_per_s=D_FREE_NM2_PER_S,
+        bound_floor_fraction=D_BOUND_FLOOR_FRACTION,
+        k_on_per_step=K_ON_PER_STEP,
+        k_off_per_s=K_OFF_PER_S,
+        capture_threshold=CAPTURE_THRESHOLD,
+        strong_threshold=STRONG_THRESHOLD,
+        capture_dwell_seconds=CAPTURE_DWELL_SECONDS,
+        surface_clearance_nm=SURFACE_CLEARANCE_NM,
+        initial_gap_nm=INITIAL_GAP_NM,
+        max_gap_nm=MAX_GAP_NM,
+        start_half_width_nm=(LATERAL_START_NM, LATERAL_START_NM),
+        escape_radius_nm=LATERAL_ESCAPE_NM,
     )
 
 
-def try_form_bonds(
-    distances: np.ndarray,
-    anchors: list[Anchor],
-    linker_models,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    free_anchor_indices = np.flatnonzero(anchor_to_receptor == -1)
-    free_receptor_indices = np.flatnonzero(receptor_to_anchor == -1)
-    if len(free_anchor_indices) == 0 or len(free_receptor_indices) == 0:
-        return
-    sub_distances = distances[np.ix_(free_anchor_indices, free_receptor_indices)]
-    probabilities = np.zeros_like(sub_distances)
-    for local_i, anchor_index in enumerate(free_anchor_indices):
-        construct = str(anchors[int(anchor_index)]["linker_construct"])
-        probabilities[local_i, :] = [
-            K_ON_PER_STEP * reach_probability(linker_models, construct, float(distance))
-            for distance in sub_distances[local_i, :]
-        ]
-    candidate_pairs = np.argwhere(rng.random(probabilities.shape) < probabilities)
-    if len(candidate_pairs) == 0:
-        return
-    rng.shuffle(candidate_pairs)
-    for local_anchor, local_receptor in candidate_pairs:
-        anchor_index = int(free_anchor_indices[local_anchor])
-        receptor_index = int(free_receptor_indices[local_receptor])
-        if anchor_to_receptor[anchor_index] == -1 and receptor_to_anchor[receptor_index] == -1:
-            anchor_to_receptor[anchor_index] = receptor_index
-            receptor_to_anchor[receptor_index] = anchor_index
-
-
-def break_bonds(
-    distances: np.ndarray,
-    anchor_to_receptor: np.ndarray,
-    receptor_to_anchor: np.ndarray,
-    rng: np.random.Generator,
-) -> None:
-    p_off = 1.0 - math.exp(-K_OFF_PER_S * DT_SECONDS)
-    for anchor_index, receptor_index in enumerate(anchor_to_receptor):
-        if receptor_index == -1:
-            continue
-        if distances[anchor_index, receptor_index] > 14.0 or rng.random() < p_off:
-            anchor_to_receptor[anchor_index] = -1
-            receptor_to_anchor[receptor_index] = -1
+def per_ev_results(result: CaptureResult) -> list[dict[str, float]]:
+    return [
+        {
+            "ever_captured": float(captured),
+            "mean_contacts": float(mean_contacts),
+            "mean_max_contacts": float(max_contacts),
+            "strong_fraction": float(strong_fraction),
+        }
+        for captured, mean_contacts, max_contacts, strong_fraction in zip(
+            result.ever_captured, result.mean_contacts, result.max_contacts, result.strong_fraction
+        )
+    ]
 
 
-def simulate_one(
+def simulate_population(
     anchors: list[Anchor],
     linker_models,
-    receptor_body: np.ndarray,
-    diameter_nm: float,
+    population,
     rng: np.random.Generator,
-) -> dict[str, float]:
-    radius = diameter_nm / 2.0
-    anchor_xyz = anchor_array(anchors)
-    center = np.array(
-        [
-            rng.uniform(-LATERAL_START_NM, LATERAL_START_NM),
-            rng.uniform(-LATERAL_START_NM, LATERAL_START_NM),
-            radius + SURFACE_CLEARANCE_NM + INITIAL_GAP_NM,
-        ],
-        dtype=float,
+) -> list[dict[str, float]]:
+    """Run one trajectory per population EV, all EVs advancing together."""
+    receptor_bodies = population_receptors(population).padded()
+    result = simulate_capture(
+        anchors,
+        linker_models,
+        receptor_bodies,
+        np.asarray(population["diameter_nm"], dtype=float),
+        capture_scenario(),
+        rng,
     )
-    min_z = radius + SURFACE_CLEARANCE_NM
-    max_z = radius + SURFACE_CLEARANCE_NM + MAX_GAP_NM
-    anchor_to_receptor = np.full(len(anchors), -1, dtype=int)
-    receptor_to_anchor = np.full(len(receptor_body), -1, dtype=int)
-    required_steps = max(1, int(round(CAPTURE_DWELL_SECONDS / DT_SECONDS)))
-    consecutive = 0
-    ever_captured = False
-    contacts = []
-    for _ in range(N_STEPS):
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        mobility = max(D_BOUND_FLOOR_FRACTION, 1.0 / (1.0 + 0.75 * n_contacts))
-        sigma = math.sqrt(2.0 * D_FREE_NM2_PER_S * mobility * DT_SECONDS)
-        center[:2] += rng.normal(0.0, sigma, size=2)
-        center[2] += rng.normal(0.0, sigma * 0.45)
-        center[2] -= 0.035 * n_contacts
-        center[2] = float(np.clip(center[2], min_z, max_z))
-        lateral_norm = np.linalg.norm(center[:2])
-        if lateral_norm > LATERAL_ESCAPE_NM:
-            center[:2] *= LATERAL_ESCAPE_NM / lateral_norm
-        receptors = receptor_body + center
-        distances = np.linalg.norm(anchor_xyz[:, None, :] - receptors[None, :, :], axis=2)
-        break_bonds(distances, anchor_to_receptor, receptor_to_anchor, rng)
-        try_form_bonds(distances, anchors, linker_models, anchor_to_receptor, receptor_to_anchor, rng)
-        n_contacts = int(np.count_nonzero(anchor_to_receptor != -1))
-        contacts.append(n_contacts)
-        consecutive = consecutive + 1 if n_contacts >= CAPTURE_THRESHOLD else 0
-        ever_captured = ever_captured or consecutive >= required_steps
-    contacts_arr = np.asarray(contacts, dtype=float)
-    return {
-        "ever_captured": float(ever_captured),
-        "mean_contacts": float(np.mean(contacts_arr)),
-        "mean_max_contacts": float(np.max(contacts_arr)),
-        "strong_fraction": float(np.mean(contacts_arr >= STRONG_THRESHOLD)),
-    }
+    return per_ev_results(result)
 
 
 def main() -> None:
     names = load_top_layout_names()
     layouts = load_layouts(names)
-    population = np.load(IN_POPULATION)
+    population = load_population_store(IN_POPULATION)
     linker_models = load_linker_models()
     rows = []
     for name in names:
         rng = np.random.default_rng(RNG_SEED + len(rows))
         anchors = layouts[name]
-        per_ev = []
-        for ev_index, diameter in enumerate(population["diameter_nm"]):
-            receptor_count = int(population["receptor_count"][ev_index])
-            receptor_body = population["receptor_points"][ev_index, :receptor_count, :]
-            per_ev.append(simulate_one(anchors, linker_models, receptor_body, float(diameter), rng))
+        per_ev = simulate_population(anchors, linker_models, population, rng)
         rows.append(
             {
                 "layout": name,